@@ -25,16 +25,40 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 try:
     # Import local modules
     from src.data_processing.importers import (
-        load_type6_report, load_sales_journal, load_gps_tracking
+        load_type6_report, load_sales_journal, load_gps_tracking, concat_typed
     )
+    from src.data_processing.catalog import scan_catalog, find_files, GPS_FAMILIES
+    from src.data_processing.orchestrator import run_loads
+    from src.data_processing.store import ingest_catalog, read_store
+    from src.data_processing.gazetteer import update_gazetteer, load_gazetteer
+    from src.data_processing.invoices import update_invoice_index, INVOICE_SIDES
+    from src.data_processing.events import update_event_log, load_event_log, lifecycle_columns
+    from src.data_processing.geofences import build_geofences, tag_gps_frames
+    from src.data_processing.timeline import build_timeline, device_utilization
+    from src.data_processing.parsers import to_local_time
     from src.data_processing.integrator import (
-        map_tech_codes_to_devices, match_jobs_to_gps_stops, merge_sales_with_jobs, add_alert_data_to_techs
+        tech_device_columns, gps_match_columns, sales_revenue_columns, joinable_by_invoice,
+        merge_sales_with_jobs, add_alert_data_to_techs
     )
-    from src.analysis.classifier import classify_all_jobs
-    from src.analysis.text_mining import extract_cancellation_reasons_from_df, extract_time_on_job
+    from src.analysis.keywords import keyword_hits
+    from src.analysis.classifier import job_classifications
+    from src.analysis.text_mining import cancellation_columns, time_on_job_columns
     from src.analysis.metrics import (
         calculate_tech_revenue_metrics, calculate_performance_metrics, 
-        calculate_cancellation_metrics, calculate_alert_scores, analyze_idle_time
+        calculate_cancellation_metrics, calculate_csr_cancellation_metrics, calculate_alert_scores,
+        analyze_idle_time
+    )
+    from src.data_processing.schemas import merge_projections, TECH_ID, INVOICE_KEY
+    from src.data_processing import integrator
+    from src.analysis import classifier, text_mining, metrics
+    
+    # Load only the Type6 columns that process_data and its stages read
+    TYPE6_PROJECTION = merge_projections(
+        ['OriginDate', 'TechCode'],
+        integrator.TYPE6_COLUMNS,
+        classifier.TYPE6_COLUMNS,
+        text_mining.TYPE6_COLUMNS,
+        metrics.TYPE6_COLUMNS
     )
 
     # Import visualization modules
@@ -42,7 +66,7 @@ try:
     
     # Test imports from config to make sure they work
     from config.cancel_categories import CANCEL_CATEGORIES, CATEGORY_PRIORITY
-    from config.settings import SERVICE_CALL_PRICES
+    from config.settings import SERVICE_CALL_PRICES, INCREMENTAL_INGEST
     from config.alert_weights import ALERT_WEIGHTS, DRIVING_SCORE_THRESHOLDS
     
     imports_success = True
@@ -101,8 +125,28 @@ def create_mock_data():
     
     return tech_data, cancel_data, driving_data
 
-def load_data():
-    """Load and process all data sources."""
+def combine_family_frames(frames):
+    """
+    Combine the frames loaded from the files of one export family.
+    
+    Args:
+        frames: List of DataFrames, one per file
+        
+    Returns:
+        Combined DataFrame, or None if there were no files
+    """
+    if not frames:
+        return None
+    
+    frames = [df for df in frames if not df.empty]
+    if len(frames) <= 1:
+        return frames[0] if frames else pd.DataFrame()
+    
+    # Overlapping exports repeat the rows they share
+    return concat_typed(frames).drop_duplicates().reset_index(drop=True)
+
+def load_data(start_date=None, end_date=None):
+    """Load the data files covering the selected date range."""
     
     # Create data load status
     data_load_state = st.sidebar.text('Loading data...')
@@ -117,51 +161,78 @@ def load_data():
         type6_data, sales_data, gps_data = None, None, {}
         return type6_data, sales_data, gps_data
     
-    # Load Type6 report data
-    type6_path = os.path.join(data_dir, 'Type6report2025.csv')
-    if os.path.exists(type6_path):
-        type6_data = load_type6_report(type6_path)
+    # Index the data and archive folders so only overlapping files are loaded
+    catalog = scan_catalog(data_dir)
+    
+    # Absorb the positions of new GPS exports into the offline geocode gazetteer
+    update_gazetteer(catalog)
+    
+    # Plan one load per file, then run them all on the loader pool
+    loaders = {
+        'type6': (load_type6_report, (), {'columns': TYPE6_PROJECTION}),
+        'sales': (load_sales_journal, (), {})
+    }
+    for file_type in GPS_FAMILIES:
+        loaders[file_type] = (load_gps_tracking, (file_type,), {})
+    
+    if INCREMENTAL_INGEST:
+        # Add only new exports to the row store, then read the selected dates
+        ingest_catalog(catalog, list(loaders))
+        family_data = {
+            family: read_store(family, start_date, end_date, kwargs.get('columns'))
+            for family, (_, _, kwargs) in loaders.items()
+        }
+    else:
+        family_paths = {}
+        tasks = {}
+        for family, (loader, extra_args, kwargs) in loaders.items():
+            family_paths[family] = find_files(catalog, family, start_date, end_date)
+            for path in family_paths[family]:
+                tasks[path] = (loader, (path,) + extra_args, kwargs)
+        
+        loaded, timings = run_loads(tasks)
+        for _, timing in timings.iterrows():
+            print(f"  {os.path.basename(timing['Name'])}: {timing['Rows']} rows in {timing['Seconds']:.2f}s")
         
+        family_data = {
+            family: combine_family_frames([loaded[path] for path in paths])
+            for family, paths in family_paths.items()
+        }
+        for family in INVOICE_SIDES:
+            update_invoice_index(family, family_data[family])
+        update_event_log('type6', family_data['type6'])
+    
+    # Type6 report data
+    type6_data = family_data['type6']
+    if type6_data is not None:
         # Clean TechCode column - convert everything to strings
         if 'TechCode' in type6_data.columns:
             type6_data['TechCode'] = type6_data['TechCode'].astype(str)
             # Replace 'nan' strings with empty strings
             type6_data['TechCode'] = type6_data['TechCode'].replace('nan', '')
     else:
-        st.sidebar.warning(f"File not found: {type6_path}")
+        st.sidebar.warning("No Type6 report covers the selected dates")
         st.sidebar.error("Type6 report file missing. Please add file to data directory.")
         type6_data = pd.DataFrame()
     
-    # Load Sales Journal data
-    sales_path = os.path.join(data_dir, 'SlsJrnl.csv')
-    if os.path.exists(sales_path):
-        sales_data = load_sales_journal(sales_path)
-        
+    # Sales Journal data
+    sales_data = family_data['sales']
+    if sales_data is not None:
         # Clean Technician column if it exists
         if 'Technician' in sales_data.columns:
             sales_data['Technician'] = sales_data['Technician'].astype(str)
             sales_data['Technician'] = sales_data['Technician'].replace('nan', '')
     else:
-        st.sidebar.warning(f"File not found: {sales_path}")
+        st.sidebar.warning("No Sales Journal covers the selected dates")
         st.sidebar.error("Sales Journal file missing. Please add file to data directory.")
         sales_data = pd.DataFrame()
     
-    # Load GPS data
-    gps_files = {
-        'day_start_end': 'day_start_end_breakdown_01_01_2025_12_00am_PST-03_14_2025_12_00am_PDT.csv',
-        'drives_stops': 'drives_and_stops_01_01_2025_12_00am_PST-03_17_2025_12_00am_PDT.csv',
-        'day_engine': 'day_engine_hours_01_01_2025_12_00am_PST-03_14_2025_12_00am_PDT.csv',
-        'idle_time': 'idle_time_01_01_2025_12_00am_PST-03_18_2025_12_00am_PDT.csv',
-        'alert': 'alert_summary_01_01_2025_12_00am_PST-03_14_2025_12_00am_PDT.csv'
-    }
-    
+    # GPS data
     gps_data = {}
-    for file_type, filename in gps_files.items():
-        file_path = os.path.join(data_dir, filename)
-        if os.path.exists(file_path):
-            gps_data[file_type] = load_gps_tracking(file_path, file_type)
-        else:
-            st.sidebar.warning(f"GPS file not found: {filename}")
+    for file_type in GPS_FAMILIES:
+        gps_data[file_type] = family_data[file_type]
+        if gps_data[file_type] is None:
+            st.sidebar.warning(f"No GPS {file_type} export covers the selected dates")
             gps_data[file_type] = pd.DataFrame()
     
     data_load_state.text('Data loaded!')
@@ -178,21 +249,25 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
     if (type6_data is None or type6_data.empty) and (sales_data is None or sales_data.empty):
         st.sidebar.error("Required data files are missing or empty. Please check your data directory.")
         process_state.text('Error: Missing required data!')
-        return None, None, None
+        return None, None, None, None, None
     
     # Skip if no data loaded
     if type6_data.empty or sales_data.empty:
         process_state.text('Error: Missing required data!')
-        return None, None, None
+        return None, None, None, None, None
     
-    # Filter data by date range
+    # Filter jobs by date range and selected technicians in one slice
+    job_mask = pd.Series(True, index=type6_data.index)
     if 'OriginDate' in type6_data.columns:
-        type6_filtered = type6_data[
+        job_mask &= (
             (type6_data['OriginDate'] >= pd.Timestamp(start_date)) &
             (type6_data['OriginDate'] <= pd.Timestamp(end_date))
-        ]
-    else:
-        type6_filtered = type6_data
+        )
+    
+    if selected_techs:
+        job_mask &= type6_data['TechCode'].isin(selected_techs)
+    
+    jobs = type6_data if job_mask.all() else type6_data[job_mask]
     
     if 'DateRecorded' in sales_data.columns:
         sales_filtered = sales_data[
@@ -202,41 +277,71 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
     else:
         sales_filtered = sales_data
     
-    # Map technician codes to GPS device names if needed
-    type6_with_devices = map_tech_codes_to_devices(type6_filtered)
+    # Each stage returns only its derived columns on the job index; they are
+    # joined to the jobs once, after the last stage
+    derived = []
     
-    # Filter by selected technicians
-    if selected_techs:
-        type6_with_devices = type6_with_devices[type6_with_devices['TechCode'].isin(selected_techs)]
+    # Map technician codes to GPS device names
+    devices = tech_device_columns(jobs)
+    derived.append(devices)
+    
+    # Scan the work descriptions once for every keyword the classifiers use
+    hits = None
+    if 'WorkDescription' in jobs.columns:
+        hits = keyword_hits(jobs['WorkDescription'])
     
     # Classify jobs
-    classified_jobs = classify_all_jobs(type6_with_devices)
+    derived.append(job_classifications(jobs, hits))
+    
+    # Lifecycle timing and booking CSR from the parsed job histories
+    lifecycle = None
+    if INVOICE_KEY in jobs.columns:
+        lifecycle = lifecycle_columns(jobs, load_event_log())
+        derived.append(lifecycle)
     
     # Extract cancellation reasons
-    jobs_with_cancellations = extract_cancellation_reasons_from_df(classified_jobs)
+    derived.append(cancellation_columns(jobs, hits))
     
     # Extract time on job when available
-    if 'WorkDescription' in jobs_with_cancellations.columns:
-        jobs_with_cancellations['TimeOnJob'] = jobs_with_cancellations['WorkDescription'].apply(extract_time_on_job)
+    if 'WorkDescription' in jobs.columns:
+        derived.append(time_on_job_columns(jobs['WorkDescription']))
     
-    # Merge with sales data - Add technician mapping if needed
+    # Attribute sales revenue by invoice key - Add technician mapping if needed
     if 'Technician' in sales_filtered.columns and not 'TechCode' in sales_filtered.columns:
         sales_filtered['TechCode'] = sales_filtered['Technician']
     
-    if not sales_filtered.empty:
-        # Make sure job/invoice numbers are strings for joining
-        if 'JobNumber' in jobs_with_cancellations.columns and 'InvoiceNumber' in sales_filtered.columns:
-            jobs_with_cancellations['JobNumber'] = jobs_with_cancellations['JobNumber'].astype(str).str.strip()
-            sales_filtered['InvoiceNumber'] = sales_filtered['InvoiceNumber'].astype(str).str.strip()
-        
-        integrated_data = merge_sales_with_jobs(jobs_with_cancellations, sales_filtered)
-    else:
-        integrated_data = jobs_with_cancellations
+    sales_attributed = False
+    if not sales_filtered.empty and joinable_by_invoice(jobs.columns, sales_filtered.columns):
+        derived.append(sales_revenue_columns(jobs, sales_filtered))
+        sales_attributed = True
+    
+    # Tag every stop and idle event as shop, home, customer or other once per
+    # refresh; tags of positions seen with the same fences come from the cache
+    gazetteer = load_gazetteer()
+    gps_data = tag_gps_frames(gps_data, build_geofences(type6_data, gazetteer))
+    
+    # Build the device timeline once for every GPS query of this refresh
+    timeline = build_timeline(gps_data.get('drives_stops'), gps_data.get('day_start_end'))
     
     # Match with GPS data if available
     if 'drives_stops' in gps_data and not gps_data['drives_stops'].empty:
         stops_data = gps_data['drives_stops'][gps_data['drives_stops']['Status'] == 'Stopped']
-        integrated_data = match_jobs_to_gps_stops(integrated_data, stops_data)
+        match_columns = [col for col in ['Address', 'CityStateZip', 'FirstAppmnt', TECH_ID]
+                         if col in jobs.columns and col not in devices.columns]
+        derived.append(gps_match_columns(pd.concat([jobs[match_columns], devices], axis=1), stops_data,
+                                         gazetteer=gazetteer, timeline=timeline))
+    
+    # Assemble the integrated table: the one copy of the jobs the pipeline makes
+    integrated_data = jobs.assign(**{col: frame[col] for frame in derived for col in frame.columns})
+    
+    # Merge with sales data by job/invoice numbers when there is no invoice key
+    if not sales_filtered.empty and not sales_attributed:
+        # Make sure job/invoice numbers are strings for joining
+        if 'JobNumber' in integrated_data.columns and 'InvoiceNumber' in sales_filtered.columns:
+            integrated_data['JobNumber'] = integrated_data['JobNumber'].astype(str).str.strip()
+            sales_filtered['InvoiceNumber'] = sales_filtered['InvoiceNumber'].astype(str).str.strip()
+        
+        integrated_data = merge_sales_with_jobs(integrated_data, sales_filtered)
     
     # Calculate metrics - make sure TechCode exists
     if 'Technician' in integrated_data.columns and 'TechCode' not in integrated_data.columns:
@@ -255,6 +360,9 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
     # Calculate cancellation metrics
     cancellation_metrics = calculate_cancellation_metrics(integrated_data)
     
+    # Cancellations by the CSR who booked each job
+    csr_metrics = calculate_csr_cancellation_metrics(integrated_data)
+    
     # Ensure tech_metrics has TechCode for merging
     if 'TechCode' not in tech_metrics.columns and 'Technician' in tech_metrics.columns:
         tech_metrics['TechCode'] = tech_metrics['Technician']
@@ -350,9 +458,12 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
             date_col = next((col for col in alert_data.columns if 'date' in col.lower() or 'time' in col.lower()), None)
             if date_col:
                 # Ensure date column is datetime
-                if not pd.api.types.is_datetime64_dtype(alert_data[date_col]):
+                if not pd.api.types.is_datetime64_any_dtype(alert_data[date_col]):
                     alert_data[date_col] = pd.to_datetime(alert_data[date_col], errors='coerce')
                 
+                # GPS times are UTC instants; filter on local wall-clock time
+                alert_data[date_col] = to_local_time(alert_data[date_col])
+                
                 alert_data = alert_data[
                     (alert_data[date_col] >= pd.Timestamp(start_date)) &
                     (alert_data[date_col] <= pd.Timestamp(end_date))
@@ -384,6 +495,22 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
                 'DrivingScore': 90  # Default good score
             })
     
+    # Split each device's time into driving, stopped and idling from the
+    # refresh's timeline
+    utilization_metrics = None
+    try:
+        if 'idle_time' in gps_data and not gps_data['idle_time'].empty:
+            utilization_metrics = analyze_idle_time(
+                gps_data['idle_time'], pd.Timestamp(end_date),
+                days_to_analyze=(pd.Timestamp(end_date) - pd.Timestamp(start_date)).days,
+                timeline=timeline
+            )
+        elif len(timeline['devices']) > 0:
+            utilization_metrics = device_utilization(timeline, pd.Timestamp(start_date), pd.Timestamp(end_date))
+    except Exception as e:
+        st.warning(f"Error processing idle time data: {str(e)}")
+        print(f"Idle time processing error: {str(e)}")
+    
     # Summarize cancellations by reason
     if 'CancellationReason' in integrated_data.columns:
         # Group by reason and count
@@ -402,7 +529,7 @@ def process_data(type6_data, sales_data, gps_data, start_date, end_date, selecte
     
     process_state.text('Processing complete!')
     
-    return combined_metrics, driving_metrics, cancellation_summary
+    return combined_metrics, driving_metrics, cancellation_summary, csr_metrics, utilization_metrics
 
 def create_kpi_table(tech_metrics):
     """
@@ -543,8 +670,8 @@ def main():
         key='end_date'
     )
     
-    # Load data
-    type6_data, sales_data, gps_data = load_data()
+    # Load the data files that cover the selected dates
+    type6_data, sales_data, gps_data = load_data(start_date, end_date)
     
     # Get available technicians
     if type6_data is not None and not type6_data.empty and 'TechCode' in type6_data.columns:
@@ -595,7 +722,7 @@ def main():
         )
     
     # Process data based on filters
-    tech_metrics, driving_metrics, cancellation_summary = process_data(
+    tech_metrics, driving_metrics, cancellation_summary, csr_metrics, utilization_metrics = process_data(
         type6_data, sales_data, gps_data, start_date, end_date, selected_techs
     )
     
@@ -606,7 +733,8 @@ def main():
             "Technician Performance", 
             "Revenue Analysis", 
             "Cancellation Analysis", 
-            "Driving Behavior"
+            "Driving Behavior",
+            "Time Utilization"
         ])
         
         # Technician Performance tab
@@ -888,6 +1016,21 @@ def main():
                     use_container_width=True,
                     hide_index=True
                 )
+            
+            # Cancellations by booking CSR
+            if csr_metrics is not None and not csr_metrics.empty:
+                st.subheader('Cancellations by Booking CSR')
+                
+                # Format for display
+                display_df = csr_metrics.copy()
+                display_df['CSRCancelRate'] = display_df['CSRCancelRate'].map('{:.1%}'.format)
+                
+                # Display table
+                st.dataframe(
+                    display_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
         
         # Driving Behavior tab
         with tabs[3]:
@@ -928,6 +1071,43 @@ def main():
                     display_df,
                     use_container_width=True
                 )
+        
+        # Time Utilization tab
+        with tabs[4]:
+            st.header('Time Utilization')
+            
+            # Skip if no data
+            if utilization_metrics is None or utilization_metrics.empty:
+                st.info("No GPS timeline data available for the selected period.")
+            else:
+                cols = st.columns(3)
+                
+                with cols[0]:
+                    driving_hours = utilization_metrics['DrivingHours'].sum() if 'DrivingHours' in utilization_metrics.columns else 0
+                    st.metric("Driving Hours", f"{driving_hours:,.1f}")
+                
+                with cols[1]:
+                    stopped_hours = utilization_metrics['StoppedHours'].sum() if 'StoppedHours' in utilization_metrics.columns else 0
+                    st.metric("Stopped Hours", f"{stopped_hours:,.1f}")
+                
+                with cols[2]:
+                    idle_hours = utilization_metrics['TotalIdleHours'].sum() if 'TotalIdleHours' in utilization_metrics.columns else 0
+                    st.metric("Idle Hours", f"{idle_hours:,.1f}")
+                
+                # Hours by device, split by location class when the GPS rows were tagged
+                st.subheader('Time by Device')
+                hour_cols = [col for col in utilization_metrics.columns if col.endswith('Hours')]
+                display_df = utilization_metrics[[utilization_metrics.columns[0]] + hour_cols].copy()
+                if 'DrivingShare' in utilization_metrics.columns:
+                    display_df['DrivingShare'] = utilization_metrics['DrivingShare'].map('{:.1%}'.format)
+                display_df[hour_cols] = display_df[hour_cols].fillna(0).round(1)
+                
+                # Display table
+                st.dataframe(
+                    display_df,
+                    use_container_width=True,
+                    hide_index=True
+                )
     else:
         st.warning("No data available for the selected filters. Please adjust your selection or check your data files.")
     
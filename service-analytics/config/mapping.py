@@ -26,9 +26,36 @@ STAFF_NO_GPS = {
     "XX": "Online"  # Online scheduling
 }
 
-# Known locations
+# Other names technicians go by (nicknames, first names, sales codes);
+# GPS device names, first names and the codes themselves are aliases already
+TECH_ALIASES = {
+    "ROBERT": "RR",
+    "RICK": "RR",
+    "RICARDO": "RR",
+    "JAMES": "JS",
+    "JIM": "JS",
+    "JOSEPH": "JD",
+    "JOEY": "JD",
+    "DANIEL": "DM",
+    "DANNY": "DM",
+    "SHANE": "SS",
+    "SHAWN": "SF",
+    "SEAN": "SF",
+    "BIANCA": "BB",
+    "ADAM": "AP",
+    "PORTER": "AP"
+}
+
+# Known locations, geofenced by geofences.build_geofences(). Each entry is an
+# address or a dict with an address, optional (lat, lng) coordinates (else the
+# address is geocoded through the gazetteer) and an optional radius in meters.
+# SHOP is tagged SHOP and <TECH>_HOME is tagged HOME:<TECH>.
 KNOWN_LOCATIONS = {
-    "SHOP": "466 Primero Ct, Cotati, CA 94931, USA",
+    "SHOP": {
+        "address": "466 Primero Ct, Cotati, CA 94931, USA",
+        "coordinates": (38.34265, -122.71534),
+        "radius_m": 75
+    },
     # Add technician home addresses here
     # "JS_HOME": "...",
 } 
\ No newline at end of file
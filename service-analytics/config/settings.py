@@ -6,6 +6,16 @@ Application settings and configuration parameters.
 DATA_DIR = "data"
 PROCESSED_DIR = "processed"
 
+# Importer cache
+CACHE_MAX_MB = 500  # Size budget for cached loader output in PROCESSED_DIR
+TYPE6_CHUNK_ROWS = 20000  # Rows per batch when parsing the Type6 report
+SALES_DAT_CHUNK_ROWS = 100000  # Rows per batch when converting the Sales Journal DAT export
+LOADER_WORKERS = 4  # Processes used to load data files in parallel (1 loads sequentially)
+
+# Incremental ingestion
+INCREMENTAL_INGEST = True  # Load the dashboard from the row store in PROCESSED_DIR/store
+STORE_MAX_PARTS = 12  # Parts a family's store may grow to before it is compacted into one
+
 # Business rules
 FIRST_CALL_COMPLETE_GOAL = 0.7  # 70% target
 DIAGNOSTIC_ONLY_MIN_GOAL = 0.1  # 10% target
@@ -27,7 +37,14 @@ SERVICE_CALL_PRICES = {
 }
 
 # GPS data settings
+LOCAL_TIMEZONE = "America/Los_Angeles"  # Zone of ServiceDesk times and zone-less GPS timestamps
 GPS_MATCH_THRESHOLD = 0.8  # Confidence threshold for address matching
+ADDRESS_CACHE_SIZE = 50000  # Distinct raw addresses kept standardized in memory
+ADDRESS_SCORE_WORKERS = 1  # Threads scoring address batches (-1 for all cores)
+GPS_MATCH_RADIUS_M = 150  # Meters from a job's geocoded address within which a stop matches it
+GPS_ONE_TO_ONE = True  # Assign each GPS stop to at most one job, per device and day
+ASSIGNMENT_WORKERS = 1  # Processes solving the per-device-day assignments (1 solves in process)
+GEOFENCE_RADIUS_M = 75  # Default radius of a KNOWN_LOCATIONS geofence in meters
 STOP_DURATION_THRESHOLD = 300  # Minimum seconds to consider a valid job stop
 
 # Time windows
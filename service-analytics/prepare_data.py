@@ -10,110 +10,54 @@ import sys
 import pandas as pd
 import argparse
 from datetime import datetime
-import re
-import csv
 
 # Add the project directory to path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 # Import the data loading functions
 from src.data_processing.importers import (
-    load_type6_report, load_sales_journal, load_gps_tracking
+    load_type6_report, load_sales_journal, load_tech_revenue, load_gps_tracking,
+    iter_sales_journal_dat, convert_sales_journal_dat
 )
+from src.data_processing.catalog import scan_catalog
+from src.data_processing.cache import CACHE_DIR, list_cache, purge_cache
+from src.data_processing.store import STORE_DIR, ingest_catalog, ingest_status, reset_store
+from src.data_processing.gazetteer import update_gazetteer
+from src.data_processing.invoices import invoice_status_counts
 
 def convert_salesjournal_dat_to_csv(dat_file, output_file=None):
     """
-    Convert a Sales Journal DAT file to CSV format.
+    Convert a Sales Journal DAT file to CSV format, or into the importer cache.
+    
+    The export is streamed in batches by iter_sales_journal_dat(), so the
+    conversion runs in constant memory whatever the journal's size.
     
     Args:
         dat_file: Path to the .dat file
-        output_file: Path to save the CSV (if None, replaces extension with .csv)
+        output_file: Path to save the CSV (if None, the typed output is written
+            straight to the importer cache that load_sales_journal() reads)
     
     Returns:
-        Path to the created CSV file
+        Path to the created CSV file, or the cache key
     """
-    if output_file is None:
-        output_file = os.path.splitext(dat_file)[0] + '.csv'
-    
-    print(f"Converting {dat_file} to {output_file}...")
-    
     try:
-        # Read the DAT file
-        with open(dat_file, 'r', encoding='utf-8', errors='replace') as f:
-            lines = f.readlines()
+        if output_file is None:
+            print(f"Converting {dat_file} into the importer cache...")
+            key, rows = convert_sales_journal_dat(dat_file)
+            if not rows:
+                print("Nothing was cached; pass --output to write a CSV instead")
+                return None
+            print(f"Successfully converted file with {rows} records")
+            return key
         
-        # Extract column names from the first line
-        first_line = lines[0].strip()
-        if ',' in first_line:
-            # Already comma separated
-            header_line = first_line
-            columns = [col.strip() for col in header_line.split(',')]
-            start_idx = 1
-        else:
-            # Space or tab delimited
-            parts = re.split(r'\t|\s{2,}', first_line)
-            columns = [p.strip() for p in parts if p.strip()]
-            start_idx = 1
-        
-        # Process data lines
-        data = []
-        for i in range(start_idx, len(lines)):
-            line = lines[i].strip()
-            if not line:
-                continue
-            
-            # Handle different formats
-            if line.startswith('#') and '"' in line:
-                # This is already CSV-like format with dates in #date# format
-                # Use CSV parser to handle quoted fields correctly
-                row_values = next(csv.reader([line]))
-                if len(row_values) == 1 and ',' in row_values[0]:
-                    # Sometimes CSV reader doesn't split it correctly
-                    row_values = row_values[0].split(',')
-                
-                row = {}
-                for j, val in enumerate(row_values):
-                    if j < len(columns):
-                        # Clean up values
-                        val = val.strip()
-                        if val.startswith('"') and val.endswith('"'):
-                            val = val[1:-1]
-                        if val.startswith('#') and val.endswith('#'):
-                            val = val[1:-1]
-                        row[columns[j]] = val
-                    else:
-                        # Extra values
-                        row['Extra_' + str(j-len(columns)+1)] = val
-                
-                data.append(row)
-            else:
-                # Try space/tab delimited
-                parts = re.split(r'\t|\s{2,}', line)
-                parts = [p.strip() for p in parts if p.strip()]
-                
-                row = {}
-                for j, val in enumerate(parts):
-                    if j < len(columns):
-                        row[columns[j]] = val
-                    else:
-                        # Extra values get merged into the last column
-                        row[columns[-1]] = row.get(columns[-1], '') + ' ' + val
-                
-                data.append(row)
-        
-        # Create DataFrame
-        df = pd.DataFrame(data)
-        
-        # Save to CSV
-        df.to_csv(output_file, index=False)
-        print(f"Successfully converted file with {len(df)} records")
-        
-        # Print sample data
-        print("\nSample data (first 2 rows):")
-        print(df.head(2))
-        print("\nColumns in the output file:")
-        print(", ".join(df.columns))
+        print(f"Converting {dat_file} to {output_file}...")
+        rows = 0
+        for batch in iter_sales_journal_dat(dat_file):
+            batch.to_csv(output_file, index=False, mode='w' if rows == 0 else 'a',
+                         header=rows == 0)
+            rows += len(batch)
         
+        print(f"Successfully converted file with {rows} records")
         return output_file
     
     except Exception as e:
@@ -162,50 +106,92 @@ def fix_date_formats(file_path):
     except Exception as e:
         print(f"Error fixing date formats: {e}")
 
+def detect_file_type(file_path):
+    """
+    Guess a data file's type from its name.
+    
+    Args:
+        file_path: Path to the data file
+        
+    Returns:
+        'type6', 'sales', 'techrev', 'gps', or None if unknown
+    """
+    name = os.path.basename(file_path).lower()
+    if 'type6' in name:
+        return 'type6'
+    elif 'slsjrnl' in name or 'journal' in name:
+        return 'sales'
+    elif 'techrev' in name:
+        return 'techrev'
+    elif any(term in name for term in ['day_start', 'drives', 'engine', 'idle', 'alert']):
+        return 'gps'
+    return None
+
+def detect_gps_subtype(file_path):
+    """
+    Determine the GPS file subtype from its name.
+    
+    Args:
+        file_path: Path to the GPS file
+        
+    Returns:
+        GPS file type accepted by load_gps_tracking, or 'unknown'
+    """
+    name = os.path.basename(file_path).lower()
+    if 'day_start' in name:
+        return 'day_start_end'
+    elif 'drives' in name:
+        return 'drives_stops'
+    elif 'engine' in name:
+        return 'day_engine'
+    elif 'idle' in name:
+        return 'idle_time'
+    elif 'alert' in name:
+        return 'alert'
+    return 'unknown'
+
+def load_file(file_path, file_type, use_cache=True):
+    """
+    Load a data file with the importer matching its type.
+    
+    Args:
+        file_path: Path to the data file
+        file_type: 'type6', 'sales', 'techrev' or 'gps'
+        use_cache: Read from and write to the importer cache
+        
+    Returns:
+        Loaded DataFrame
+    """
+    if file_type == 'type6':
+        return load_type6_report(file_path, use_cache=use_cache)
+    elif file_type == 'sales':
+        return load_sales_journal(file_path, use_cache=use_cache)
+    elif file_type == 'techrev':
+        return load_tech_revenue(file_path, use_cache=use_cache)
+    elif file_type == 'gps':
+        return load_gps_tracking(file_path, detect_gps_subtype(file_path), use_cache=use_cache)
+    raise ValueError(f"Unknown file type: {file_type}")
+
 def verify_data_quality(file_path, file_type=None):
     """
     Verify the quality of a data file and report issues.
     
     Args:
         file_path: Path to the file to verify
-        file_type: Type of file ('type6', 'sales', or None for auto-detect)
+        file_type: Type of file ('type6', 'sales', 'techrev', or None for auto-detect)
     """
     try:
         # Auto-detect file type if not specified
         if file_type is None:
-            if 'type6' in file_path.lower():
-                file_type = 'type6'
-            elif 'slsjrnl' in file_path.lower() or 'journal' in file_path.lower():
-                file_type = 'sales'
-            elif any(term in file_path.lower() for term in ['day_start', 'drives', 'engine', 'idle', 'alert']):
-                file_type = 'gps'
-            else:
+            file_type = detect_file_type(file_path)
+            if file_type is None:
                 print("Could not auto-detect file type. Please specify.")
                 return
         
         print(f"Verifying {file_type} file: {file_path}...")
         
         # Load the file using the appropriate function
-        if file_type == 'type6':
-            df = load_type6_report(file_path)
-        elif file_type == 'sales':
-            df = load_sales_journal(file_path)
-        elif file_type == 'gps':
-            # Determine GPS file subtype
-            if 'day_start' in file_path:
-                subtype = 'day_start_end'
-            elif 'drives' in file_path:
-                subtype = 'drives_stops'
-            elif 'engine' in file_path:
-                subtype = 'day_engine'
-            elif 'idle' in file_path:
-                subtype = 'idle_time'
-            elif 'alert' in file_path:
-                subtype = 'alert'
-            else:
-                subtype = 'unknown'
-            
-            df = load_gps_tracking(file_path, subtype)
+        df = load_file(file_path, file_type)
         
         # Basic data quality checks
         print(f"File has {len(df)} rows and {len(df.columns)} columns")
@@ -231,6 +217,85 @@ def verify_data_quality(file_path, file_type=None):
     except Exception as e:
         print(f"Error verifying data: {e}")
 
+def manage_cache(action, data_dir='data'):
+    """
+    Warm, purge or list the importer cache.
+    
+    Args:
+        action: 'warm' to load every data file into the cache, 'purge' to
+            delete all cache entries, or 'info' to list them
+        data_dir: Directory whose CSV files are loaded when warming
+    """
+    if action == 'purge':
+        removed = purge_cache()
+        print(f"Removed {removed} cache entries from {CACHE_DIR}")
+    
+    elif action == 'warm':
+        warmed = 0
+        for name in sorted(os.listdir(data_dir)):
+            file_path = os.path.join(data_dir, name)
+            file_type = detect_file_type(file_path)
+            if not name.lower().endswith('.csv') or file_type is None:
+                continue
+            
+            print(f"Warming cache for {name}...")
+            df = load_file(file_path, file_type)
+            if not df.empty:
+                warmed += 1
+        
+        print(f"Cache warmed for {warmed} files in {CACHE_DIR}")
+    
+    entries = list_cache()
+    print(f"Cache holds {len(entries)} entries, {entries['Bytes'].sum() / 1024 / 1024:.1f} MB")
+    if action == 'info':
+        for _, entry in entries.iterrows():
+            print(f"  {entry['Key']}: {entry['Bytes'] / 1024:.0f} KB, last used {entry['LastUsed']:%Y-%m-%d %H:%M}")
+
+def show_catalog(data_dir='data'):
+    """
+    Print the data catalog: every recognized file with its family, time range
+    and row count.
+    
+    Args:
+        data_dir: Data directory to scan (archive folders included)
+    """
+    catalog = scan_catalog(data_dir)
+    print(f"Catalog of {data_dir}: {len(catalog)} files")
+    for _, entry in catalog.sort_values(['Family', 'Start']).iterrows():
+        archived = ' (archived)' if entry['Archived'] else ''
+        print(f"  {entry['Family']}: {entry['Start']:%Y-%m-%d} to {entry['End']:%Y-%m-%d}, "
+              f"{entry['Rows']} rows - {os.path.relpath(entry['Path'], data_dir)}{archived}")
+
+def run_ingest(data_dir='data', rebuild=False):
+    """
+    Ingest new exports into the row store and print what each family holds.
+    
+    Args:
+        data_dir: Data directory to scan (archive folders included)
+        rebuild: Clear the store first and ingest every file again
+    """
+    if rebuild:
+        reset_store()
+        print(f"Cleared the row store in {STORE_DIR}")
+    
+    catalog = scan_catalog(data_dir)
+    ingested = ingest_catalog(catalog)
+    for _, entry in ingested.iterrows():
+        print(f"  {entry['Family']}: {entry['Added']} of {entry['Rows']} rows new or changed - "
+              f"{os.path.relpath(entry['Path'], data_dir)}")
+    
+    print(f"Row store in {STORE_DIR}:")
+    for _, entry in ingest_status().iterrows():
+        high_water = f"{entry['HighWater']:%Y-%m-%d}" if pd.notna(entry['HighWater']) else 'none'
+        print(f"  {entry['Family']}: {entry['Files']} files ingested, {entry['Added']} rows, "
+              f"up to {high_water}")
+    
+    print("Job <-> invoice index:")
+    for status, count in invoice_status_counts().items():
+        print(f"  {status}: {count} technician invoices")
+    
+    update_gazetteer(catalog)
+
 def main():
     parser = argparse.ArgumentParser(description='Service Analytics Data Preparation Tool')
     
@@ -240,7 +305,8 @@ def main():
     # Convert command
     convert_parser = subparsers.add_parser('convert', help='Convert file format')
     convert_parser.add_argument('input_file', help='Input file to convert')
-    convert_parser.add_argument('--output', '-o', help='Output file path (optional)')
+    convert_parser.add_argument('--output', '-o',
+                                help='CSV file to write (optional, converts into the cache if omitted)')
     
     # Fix dates command
     fix_parser = subparsers.add_parser('fix_dates', help='Fix date formats in CSV file')
@@ -249,9 +315,23 @@ def main():
     # Verify command
     verify_parser = subparsers.add_parser('verify', help='Verify data quality')
     verify_parser.add_argument('file', help='File to verify')
-    verify_parser.add_argument('--type', '-t', choices=['type6', 'sales', 'gps'], 
+    verify_parser.add_argument('--type', '-t', choices=['type6', 'sales', 'techrev', 'gps'], 
                               help='File type (auto-detected if not specified)')
     
+    # Cache command
+    cache_parser = subparsers.add_parser('cache', help='Warm, purge or list the importer cache')
+    cache_parser.add_argument('action', choices=['warm', 'purge', 'info'], help='Cache action')
+    cache_parser.add_argument('--data-dir', '-d', default='data', help='Data directory to warm from')
+    
+    # Catalog command
+    catalog_parser = subparsers.add_parser('catalog', help='List data files by family and date range')
+    catalog_parser.add_argument('--data-dir', '-d', default='data', help='Data directory to scan')
+    
+    # Ingest command
+    ingest_parser = subparsers.add_parser('ingest', help='Add new or changed rows to the row store')
+    ingest_parser.add_argument('--data-dir', '-d', default='data', help='Data directory to scan')
+    ingest_parser.add_argument('--rebuild', action='store_true', help='Clear the store and ingest every file again')
+    
     args = parser.parse_args()
     
     if args.command == 'convert':
@@ -266,6 +346,15 @@ def main():
     elif args.command == 'verify':
         verify_data_quality(args.file, args.type)
     
+    elif args.command == 'cache':
+        manage_cache(args.action, args.data_dir)
+    
+    elif args.command == 'catalog':
+        show_catalog(args.data_dir)
+    
+    elif args.command == 'ingest':
+        run_ingest(args.data_dir, args.rebuild)
+    
     else:
         parser.print_help()
 
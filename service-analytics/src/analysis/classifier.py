@@ -10,8 +10,19 @@ import os
 
 # Add the project root to the path so we can import config
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.analysis.keywords import keyword_hits, DIAGNOSTIC, RECALL
 
-def classify_ftc_jobs(df):
+# Type6 report columns read by the classifiers
+TYPE6_COLUMNS = [
+    'Status', 'HowManyVisits', 'CompletedOnFirstTrip', 'JobCanceled',
+    'WorkDescription', 'Department', 'TotalMateriaInSale'
+]
+
+def _is_true(values):
+    """Boolean array of the values that are True (missing values are not)."""
+    return (values == True).fillna(False).to_numpy(dtype=bool)
+
+def ftc_flags(df):
     """
     Identify First Trip Complete (FTC) jobs.
     
@@ -19,136 +30,160 @@ def classify_ftc_jobs(df):
         df: DataFrame with job data
         
     Returns:
-        DataFrame with 'Is_FTC' column added
+        Boolean Series 'Is_FTC' on the job index
     """
-    # Create a copy to avoid modifying the original
-    result_df = df.copy()
-    
-    # Create Is_FTC column
-    result_df['Is_FTC'] = False
+    is_ftc = np.zeros(len(df), dtype=bool)
     
     # Check CompletedOnFirstTrip field
-    if 'CompletedOnFirstTrip' in result_df.columns:
-        result_df.loc[result_df['CompletedOnFirstTrip'] == True, 'Is_FTC'] = True
+    if 'CompletedOnFirstTrip' in df.columns:
+        is_ftc |= _is_true(df['CompletedOnFirstTrip'])
     
     # If that's not available, check HowManyVisits and Status
-    if 'HowManyVisits' in result_df.columns and 'Status' in result_df.columns:
-        result_df.loc[
-            (result_df['HowManyVisits'] == 1) & 
-            (result_df['Status'].str.contains('Completed|Archived|Closed', case=False, na=False)),
-            'Is_FTC'
-        ] = True
+    if 'HowManyVisits' in df.columns and 'Status' in df.columns:
+        is_ftc |= _is_true(
+            (df['HowManyVisits'] == 1) & 
+            (df['Status'].str.contains('Completed|Archived|Closed', case=False, na=False))
+        )
     
     # Check if job was canceled
-    if 'JobCanceled' in result_df.columns:
-        result_df.loc[result_df['JobCanceled'] == True, 'Is_FTC'] = False
+    if 'JobCanceled' in df.columns:
+        is_ftc &= ~_is_true(df['JobCanceled'])
     
-    return result_df
+    return pd.Series(is_ftc, index=df.index, name='Is_FTC')
 
-def classify_diagnostic_only(df):
+def diagnostic_only_flags(df, hits=None):
     """
     Identify Diagnostic Only jobs.
     
     Args:
         df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
         
     Returns:
-        DataFrame with 'Is_DiagnosticOnly' column added
+        Boolean Series 'Is_DiagnosticOnly' on the job index
     """
-    # Create a copy to avoid modifying the original
-    result_df = df.copy()
-    
-    # Create Is_DiagnosticOnly column
-    result_df['Is_DiagnosticOnly'] = False
+    is_diagnostic = np.zeros(len(df), dtype=bool)
     
     # Check parts and labor amounts
-    if 'TotalMaterialInSale' in result_df.columns and 'SCallSold' in result_df.columns:
+    if 'TotalMaterialInSale' in df.columns and 'SCallSold' in df.columns:
         # If there are no parts used but there is a service call charge
-        result_df.loc[
-            (result_df['TotalMaterialInSale'] == 0) & 
-            (result_df['SCallSold'] > 0) & 
-            (pd.notna(result_df['SCallSold'])),
-            'Is_DiagnosticOnly'
-        ] = True
+        is_diagnostic |= _is_true(
+            (df['TotalMaterialInSale'] == 0) & 
+            (df['SCallSold'] > 0) & 
+            (pd.notna(df['SCallSold']))
+        )
     
     # Check WorkDescription for diagnostic indicators
-    diagnostic_keywords = [
-        'diagnostic', 'diagnose', 'diagnosis', 
-        'quote', 'quoted', 'estimate',
-        'not worth', 'too expensive', 'declined repair',
-        'customer declined', 'cust declined'
-    ]
-    
-    if 'WorkDescription' in result_df.columns:
-        for keyword in diagnostic_keywords:
-            result_df.loc[
-                result_df['WorkDescription'].str.contains(keyword, case=False, na=False),
-                'Is_DiagnosticOnly'
-            ] = True
+    if 'WorkDescription' in df.columns:
+        if hits is None:
+            hits = keyword_hits(df['WorkDescription'])
+        is_diagnostic |= hits[DIAGNOSTIC].to_numpy() > 0
     
-    return result_df
+    return pd.Series(is_diagnostic, index=df.index, name='Is_DiagnosticOnly')
 
-def classify_recalls(df):
+def recall_flags(df, hits=None):
     """
     Identify Recall jobs.
     
     Args:
         df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
         
     Returns:
-        DataFrame with 'Is_Recall' column added
+        Boolean Series 'Is_Recall' on the job index
     """
-    # Create a copy to avoid modifying the original
-    result_df = df.copy()
-    
-    # Create Is_Recall column
-    result_df['Is_Recall'] = False
+    is_recall = np.zeros(len(df), dtype=bool)
     
     # Check WorkDescription for recall indicators
-    recall_keywords = [
-        'recall', 'safety notice', 'safety alert',
-        'manufacturer notice', 'service bulletin',
-        'factory recall', 'warranty recall'
-    ]
-    
-    if 'WorkDescription' in result_df.columns:
-        for keyword in recall_keywords:
-            result_df.loc[
-                result_df['WorkDescription'].str.contains(keyword, case=False, na=False),
-                'Is_Recall'
-            ] = True
+    if 'WorkDescription' in df.columns:
+        if hits is None:
+            hits = keyword_hits(df['WorkDescription'])
+        is_recall |= hits[RECALL].to_numpy() > 0
     
     # Check Department field if it exists
-    if 'Department' in result_df.columns:
-        result_df.loc[
-            result_df['Department'].str.contains('recall', case=False, na=False),
-            'Is_Recall'
-        ] = True
+    if 'Department' in df.columns:
+        is_recall |= _is_true(df['Department'].str.contains('recall', case=False, na=False))
     
-    return result_df
+    return pd.Series(is_recall, index=df.index, name='Is_Recall')
 
-def classify_all_jobs(df):
+def job_classifications(df, hits=None):
     """
-    Apply all job classifications.
+    Compute all job classifications as derived columns.
     
     Args:
         df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
         
     Returns:
-        DataFrame with all classification columns added
+        DataFrame on the job index with Is_FTC, Is_DiagnosticOnly, Is_Recall
+        and JobType columns
     """
-    # Apply classifications sequentially
-    result_df = classify_ftc_jobs(df)
-    result_df = classify_diagnostic_only(result_df)
-    result_df = classify_recalls(result_df)
+    # Scan the descriptions once for every classifier
+    if hits is None and 'WorkDescription' in df.columns:
+        hits = keyword_hits(df['WorkDescription'])
+    
+    result_df = pd.concat([ftc_flags(df), diagnostic_only_flags(df, hits), recall_flags(df, hits)], axis=1)
     
     # Add a summary column for job type
-    result_df['JobType'] = 'Standard Repair'
-    result_df.loc[result_df['Is_DiagnosticOnly'], 'JobType'] = 'Diagnostic Only'
-    result_df.loc[result_df['Is_Recall'], 'JobType'] = 'Recall'
+    job_type = np.full(len(df), 'Standard Repair', dtype=object)
+    job_type[result_df['Is_DiagnosticOnly'].to_numpy()] = 'Diagnostic Only'
+    job_type[result_df['Is_Recall'].to_numpy()] = 'Recall'
     
     # Handle canceled jobs
-    if 'JobCanceled' in result_df.columns:
-        result_df.loc[result_df['JobCanceled'] == True, 'JobType'] = 'Canceled'
+    if 'JobCanceled' in df.columns:
+        job_type[_is_true(df['JobCanceled'])] = 'Canceled'
     
-    return result_df 
\ No newline at end of file
+    result_df['JobType'] = job_type
+    return result_df
+
+def classify_ftc_jobs(df):
+    """
+    Identify First Trip Complete (FTC) jobs.
+    
+    Args:
+        df: DataFrame with job data
+        
+    Returns:
+        DataFrame with 'Is_FTC' column added
+    """
+    return df.assign(Is_FTC=ftc_flags(df))
+
+def classify_diagnostic_only(df, hits=None):
+    """
+    Identify Diagnostic Only jobs.
+    
+    Args:
+        df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
+        
+    Returns:
+        DataFrame with 'Is_DiagnosticOnly' column added
+    """
+    return df.assign(Is_DiagnosticOnly=diagnostic_only_flags(df, hits))
+
+def classify_recalls(df, hits=None):
+    """
+    Identify Recall jobs.
+    
+    Args:
+        df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
+        
+    Returns:
+        DataFrame with 'Is_Recall' column added
+    """
+    return df.assign(Is_Recall=recall_flags(df, hits))
+
+def classify_all_jobs(df, hits=None):
+    """
+    Apply all job classifications.
+    
+    Args:
+        df: DataFrame with job data
+        hits: keyword_hits() of the WorkDescription column (computed if None)
+        
+    Returns:
+        DataFrame with all classification columns added (see
+        job_classifications() for the columns alone)
+    """
+    return df.assign(**job_classifications(df, hits))
@@ -0,0 +1,142 @@
+"""
+Single-pass keyword matching over job descriptions.
+
+Every keyword set the classifiers look for (diagnostic and recall
+indicators, cancellation indicators and the CANCEL_CATEGORIES keywords) is
+compiled into one trie-shaped pattern. Each description is lowercased once
+and scanned once; the scan reports the longest keyword starting at each
+position, and the shorter keywords it contains are implied from the keyword
+table, so every keyword present is found. Hits are kept as (job, keyword)
+pairs and summed into a job x keyword-group count matrix, so the scanning
+cost does not grow with the number of keywords.
+"""
+
+import os
+import sys
+import re
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.cancel_categories import CANCEL_CATEGORIES
+
+# Keyword groups of the classifiers
+DIAGNOSTIC = 'DIAGNOSTIC'
+RECALL = 'RECALL'
+CANCEL_INDICATOR = 'CANCEL_INDICATOR'
+
+# Words in a description that mark a diagnostic-only job
+DIAGNOSTIC_KEYWORDS = [
+    'diagnostic', 'diagnose', 'diagnosis',
+    'quote', 'quoted', 'estimate',
+    'not worth', 'too expensive', 'declined repair',
+    'customer declined', 'cust declined'
+]
+
+# Words in a description that mark a recall job
+RECALL_KEYWORDS = [
+    'recall', 'safety notice', 'safety alert',
+    'manufacturer notice', 'service bulletin',
+    'factory recall', 'warranty recall'
+]
+
+# Words in a description that mark a possibly canceled job
+CANCEL_INDICATOR_KEYWORDS = ['cancel', 'cancelled', 'canceled', 'call off', 'not home']
+
+# Every keyword group, by name; each cancellation category is a group of its own
+KEYWORD_GROUPS = {
+    DIAGNOSTIC: DIAGNOSTIC_KEYWORDS,
+    RECALL: RECALL_KEYWORDS,
+    CANCEL_INDICATOR: CANCEL_INDICATOR_KEYWORDS,
+    **{category: keywords for category, keywords in CANCEL_CATEGORIES.items() if keywords}
+}
+
+def _trie_pattern(keywords):
+    """
+    Build a regex matching the longest of the keywords at a position.
+
+    Args:
+        keywords: List of lowercase keywords
+
+    Returns:
+        Pattern text, with the keywords merged into a trie so a match at one
+        position costs one pass over the longest keyword there
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def branch(node):
+        branches = [re.escape(char) + branch(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        # Greedy optional branches prefer the longer keywords
+        return '(?:' + '|'.join(branches) + (')?' if '' in node else ')')
+
+    return branch(trie)
+
+def _build_keyword_table(groups):
+    """
+    Compile the keyword groups.
+
+    Args:
+        groups: Dictionary of group name -> list of keywords
+
+    Returns:
+        Tuple of (list of keywords, compiled pattern capturing the longest
+        keyword at every position, keyword x keyword matrix of which
+        keywords each one contains, keyword x group matrix of how many times
+        each keyword is listed in each group)
+    """
+    keywords = sorted({keyword.lower() for group in groups.values() for keyword in group})
+    pattern = re.compile('(?=(' + _trie_pattern(keywords) + '))')
+    contains = np.array([[inner in outer for inner in keywords] for outer in keywords], dtype=bool)
+    members = np.array([[[k.lower() for k in group].count(keyword) for group in groups.values()]
+                        for keyword in keywords], dtype=np.int16)
+    return keywords, pattern, contains, members
+
+KEYWORDS, KEYWORD_PATTERN, _KEYWORD_CONTAINS, _KEYWORD_MEMBERS = _build_keyword_table(KEYWORD_GROUPS)
+_KEYWORD_IDS = {keyword: i for i, keyword in enumerate(KEYWORDS)}
+
+def keyword_pairs(texts):
+    """
+    Find every keyword in each text in one scan.
+
+    Args:
+        texts: Series of descriptions
+
+    Returns:
+        Tuple of (row positions, keyword ids) arrays with one entry per
+        distinct keyword found in a row, sorted by row
+    """
+    found = pd.Series(texts, copy=False).reset_index(drop=True).astype(object) \
+        .str.lower().str.findall(KEYWORD_PATTERN).explode().dropna()
+    rows = found.index.to_numpy(dtype=np.int64)
+    ids = found.map(_KEYWORD_IDS).to_numpy(dtype=np.int64)
+
+    # Longest matches imply the keywords inside them
+    pairs, implied = np.nonzero(_KEYWORD_CONTAINS[ids])
+    pairs = np.unique(rows[pairs] * len(KEYWORDS) + implied)
+    return pairs // len(KEYWORDS), pairs % len(KEYWORDS)
+
+def keyword_hits(texts):
+    """
+    Count the keywords of each group found in each text.
+
+    Args:
+        texts: Series of descriptions
+
+    Returns:
+        DataFrame on the texts' index with one column per KEYWORD_GROUPS
+        group, holding the number of the group's keywords found (a keyword
+        listed twice counts twice)
+    """
+    rows, ids = keyword_pairs(texts)
+    pairs, groups = np.nonzero(_KEYWORD_MEMBERS[ids])
+    counts = np.zeros((len(texts), len(KEYWORD_GROUPS)), dtype=np.int16)
+    np.add.at(counts, (rows[pairs], groups), _KEYWORD_MEMBERS[ids[pairs], groups])
+    return pd.DataFrame(counts, index=texts.index, columns=list(KEYWORD_GROUPS))
@@ -13,6 +13,17 @@ import random
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from config.settings import SERVICE_CALL_PRICES
 from config.alert_weights import ALERT_WEIGHTS, DRIVING_SCORE_THRESHOLDS
+from src.data_processing.parsers import parse_durations, to_local_time
+from src.data_processing.timeline import device_utilization
+from src.data_processing.geofences import LOCATION_TAG, location_classes
+from src.data_processing.identity import tech_ids, tech_codes
+
+# Type6 report columns read by the technician metrics
+TYPE6_COLUMNS = [
+    'TechCode', 'JobNumber', 'InvoiceNumber', 'Status', 'JobCanceled',
+    'TtlPartCost (includes value of any unused items not returned to vendor)',
+    'Usage1', 'Usage2', 'Usage3', 'Usage4', 'Usage5'
+]
 
 def calculate_tech_revenue_metrics(tech_jobs_df):
     """
@@ -240,7 +251,7 @@ def calculate_performance_metrics(tech_jobs_df):
             df['JobId'] = range(len(df))
     
     # Count job types by technician
-    tech_performance = df.groupby('TechCode').agg({
+    tech_performance = df.groupby('TechCode', observed=True).agg({
         'JobId': 'count',  # Total jobs
         'Is_FTC': 'sum',   # Count of First Trip Complete jobs (True = 1, False = 0)
         'Is_DiagnosticOnly': 'sum',  # Count of Diagnostic Only jobs
@@ -259,7 +270,7 @@ def calculate_performance_metrics(tech_jobs_df):
     
     # Calculate time metrics if available
     if 'TimeOnJob' in df.columns:
-        time_metrics = df.groupby('TechCode').agg({
+        time_metrics = df.groupby('TechCode', observed=True).agg({
             'TimeOnJob': ['mean', 'median', 'min', 'max']
         })
         
@@ -269,6 +280,14 @@ def calculate_performance_metrics(tech_jobs_df):
         
         tech_performance = pd.merge(tech_performance, time_metrics, on='TechCode', how='left')
     
+    # On-site time from the visit entries techs logged
+    if 'OnSiteMinutes' in df.columns:
+        on_site = df.groupby('TechCode', observed=True).agg(
+            Avg_OnSiteMinutes=('OnSiteMinutes', 'mean'),
+            Median_OnSiteMinutes=('OnSiteMinutes', 'median')
+        ).reset_index()
+        tech_performance = pd.merge(tech_performance, on_site, on='TechCode', how='left')
+    
     return tech_performance
 
 def calculate_cancellation_metrics(tech_jobs_df):
@@ -310,7 +329,7 @@ def calculate_cancellation_metrics(tech_jobs_df):
             df['JobCanceled'] = np.random.choice([True, False], size=len(df), p=[0.1, 0.9])
     
     # Count total and canceled jobs by technician
-    tech_cancellations = df.groupby('TechCode').agg({
+    tech_cancellations = df.groupby('TechCode', observed=True).agg({
         'JobId': 'count',  # Total jobs
         'JobCanceled': 'sum'  # Canceled jobs (True = 1, False = 0)
     }).reset_index()
@@ -327,7 +346,7 @@ def calculate_cancellation_metrics(tech_jobs_df):
     # Add cancellation categories if available
     if 'CancellationReason' in df.columns:
         # Group by technician and reason
-        reason_counts = df[df['JobCanceled'] == True].groupby(['TechCode', 'CancellationReason']).size().reset_index(name='ReasonCount')
+        reason_counts = df[df['JobCanceled'] == True].groupby(['TechCode', 'CancellationReason'], observed=True).size().reset_index(name='ReasonCount')
         
         # Pivot to get reasons as columns
         reason_pivot = reason_counts.pivot(index='TechCode', columns='CancellationReason', values='ReasonCount')
@@ -338,6 +357,34 @@ def calculate_cancellation_metrics(tech_jobs_df):
     
     return tech_cancellations
 
+def calculate_csr_cancellation_metrics(jobs_df):
+    """
+    Calculate cancellation metrics per CSR who booked the jobs.
+    
+    Args:
+        jobs_df: DataFrame with jobs and their CancellationReason; the
+            booking CSR is the event log's CreatedBy (see
+            events.lifecycle_columns()), else the CSR or CSRCode column
+        
+    Returns:
+        DataFrame with CSR, TotalJobs, CanceledJobs and CSRCancelRate
+        columns, busiest CSR first (empty without a CSR column)
+    """
+    csr_col = next((col for col in ['CreatedBy', 'CSR', 'CSRCode'] if col in jobs_df.columns), None)
+    if csr_col is None or 'CancellationReason' not in jobs_df.columns:
+        return pd.DataFrame(columns=['CSR', 'TotalJobs', 'CanceledJobs', 'CSRCancelRate'])
+    
+    # Count total and canceled jobs by CSR
+    canceled = (jobs_df['CancellationReason'] != 'NOT_CANCELED').astype('int64')
+    csr_metrics = canceled.groupby(jobs_df[csr_col].astype(object).rename('CSR')).agg(
+        TotalJobs='size', CanceledJobs='sum'
+    ).reset_index()
+    
+    # Calculate cancellation rate
+    csr_metrics['CSRCancelRate'] = csr_metrics['CanceledJobs'] / csr_metrics['TotalJobs']
+    
+    return csr_metrics.sort_values('TotalJobs', ascending=False, ignore_index=True)
+
 def calculate_driving_metrics(tech_df, alert_df):
     """
     Calculate driving behavior metrics per technician.
@@ -368,7 +415,7 @@ def calculate_driving_metrics(tech_df, alert_df):
             raise ValueError("No matching ID column found between tech data and alerts")
     
     # Count alerts by type for each technician
-    alert_counts = merged_alerts.groupby(['TechCode', 'AlertType']).size().unstack(fill_value=0)
+    alert_counts = merged_alerts.groupby(['TechCode', 'AlertType'], observed=True).size().unstack(fill_value=0)
     
     # Calculate total alerts and add
     alert_counts['TotalAlerts'] = alert_counts.sum(axis=1)
@@ -428,9 +475,12 @@ def calculate_alert_scores(alert_df, as_of_date):
         timestamp_col = 'Timestamp' if 'Timestamp' in alert_df.columns else 'AlertTime'
     
     # Convert timestamp to datetime if needed
-    if not pd.api.types.is_datetime64_dtype(alert_df[timestamp_col]):
+    if not pd.api.types.is_datetime64_any_dtype(alert_df[timestamp_col]):
         alert_df[timestamp_col] = pd.to_datetime(alert_df[timestamp_col])
     
+    # Compare GPS instants with as_of_date as local wall-clock times
+    alert_df[timestamp_col] = to_local_time(alert_df[timestamp_col])
+    
     # Create time windows for analysis
     time_windows = {
         'last_7_days': as_of_date - timedelta(days=7),
@@ -495,7 +545,7 @@ def calculate_alert_scores(alert_df, as_of_date):
         if not window_alerts.empty:
             try:
                 # Perform the groupby and count
-                window_counts = window_alerts.groupby([group_col, alert_type_col]).size().unstack(fill_value=0)
+                window_counts = window_alerts.groupby([group_col, alert_type_col], observed=True).size().unstack(fill_value=0)
                 
                 # Calculate totals and scores
                 window_counts['TotalAlerts'] = window_counts.sum(axis=1)
@@ -532,12 +582,10 @@ def calculate_alert_scores(alert_df, as_of_date):
             all_window_scores = pd.concat(results, ignore_index=True)
             # Map device IDs to technician codes if we have the mapping
             if 'Device' in all_window_scores.columns and hasattr(all_window_scores, 'Device'):
-                # Try to convert from full Device name to TechCode
-                from config.mapping import TECH_MAPPING
-                if TECH_MAPPING:
-                    all_window_scores['TechCode'] = all_window_scores['Device'].map(
-                        lambda x: TECH_MAPPING.get(x, x)
-                    )
+                # Convert from full Device name to TechCode through the identity table
+                devices = all_window_scores['Device']
+                ids = tech_ids(devices)
+                all_window_scores['TechCode'] = np.where(ids >= 0, tech_codes(ids), devices.astype(object))
             
             return all_window_scores
         except Exception as e:
@@ -550,29 +598,19 @@ def calculate_alert_scores(alert_df, as_of_date):
 
 def parse_duration(duration_str):
     """
-    Parse duration string into seconds.
+    Parse a single duration string into seconds.
+    
+    Use parse_durations() for whole columns.
     
     Args:
-        duration_str: Duration string (e.g., "2:30:45")
+        duration_str: Duration string (e.g., "2:30:45" or "2h 30m 45s")
         
     Returns:
         Duration in seconds
     """
-    if pd.isna(duration_str) or duration_str == '':
-        return 0
-    
-    parts = str(duration_str).split(':')
-    
-    if len(parts) == 3:  # HH:MM:SS
-        hours, minutes, seconds = map(float, parts)
-        return int(hours * 3600 + minutes * 60 + seconds)
-    elif len(parts) == 2:  # MM:SS
-        minutes, seconds = map(float, parts)
-        return int(minutes * 60 + seconds)
-    else:  # Just seconds
-        return int(float(parts[0]))
+    return int(parse_durations([duration_str]).iloc[0])
 
-def analyze_idle_time(idle_df, as_of_date, days_to_analyze=30):
+def analyze_idle_time(idle_df, as_of_date, days_to_analyze=30, timeline=None):
     """
     Analyze idle time patterns.
     
@@ -580,9 +618,14 @@ def analyze_idle_time(idle_df, as_of_date, days_to_analyze=30):
         idle_df: DataFrame with idle time events
         as_of_date: Date to calculate metrics as of
         days_to_analyze: Number of days to look back
+        timeline: Device timeline from timeline.build_timeline(); when given,
+            each device's DrivingHours, StoppedHours and DrivingShare over the
+            same window are added, with a row for every device it tracks
         
     Returns:
-        DataFrame with idle time metrics
+        DataFrame with idle time metrics; idle hours are also split by
+        location class (ShopIdleHours, CustomerIdleHours, ...) when idle_df
+        has the LocationTag column from geofences.tag_gps_frames()
     """
     # Convert as_of_date to datetime if needed
     if not isinstance(as_of_date, pd.Timestamp) and not isinstance(as_of_date, datetime):
@@ -605,22 +648,25 @@ def analyze_idle_time(idle_df, as_of_date, days_to_analyze=30):
         raise ValueError("No duration column found")
     
     # Convert timestamp to datetime if needed
-    if not pd.api.types.is_datetime64_dtype(idle_df[timestamp_col]):
+    if not pd.api.types.is_datetime64_any_dtype(idle_df[timestamp_col]):
         idle_df[timestamp_col] = pd.to_datetime(idle_df[timestamp_col])
     
+    # Compare GPS instants with as_of_date as local wall-clock times
+    idle_df[timestamp_col] = to_local_time(idle_df[timestamp_col])
+    
     # Filter for the time window
     window_idle = idle_df[(idle_df[timestamp_col] >= start_date) & 
                          (idle_df[timestamp_col] <= as_of_date)].copy()
     
     # Convert duration to seconds if it's not numeric
     if not pd.api.types.is_numeric_dtype(window_idle[duration_col]):
-        window_idle['Duration_Seconds'] = window_idle[duration_col].apply(parse_duration)
+        window_idle['Duration_Seconds'] = parse_durations(window_idle[duration_col])
     else:
         # If it's already numeric, assume it's in seconds
         window_idle['Duration_Seconds'] = window_idle[duration_col]
     
     # Group by device/unit and calculate metrics
-    idle_metrics = window_idle.groupby(id_col).agg({
+    idle_metrics = window_idle.groupby(id_col, observed=True).agg({
         'Duration_Seconds': ['count', 'sum', 'mean', 'median', 'max'],
         timestamp_col: ['min', 'max']
     })
@@ -641,7 +687,27 @@ def analyze_idle_time(idle_df, as_of_date, days_to_analyze=30):
     # Average idle time per day
     idle_metrics['AvgIdleHoursPerDay'] = idle_metrics['TotalIdleHours'] / idle_metrics['DaysInPeriod']
     
+    # Split idling by where it happened
+    if LOCATION_TAG in window_idle.columns:
+        place = location_classes(window_idle[LOCATION_TAG])
+        by_place = window_idle.groupby([window_idle[id_col], place], observed=True)['Duration_Seconds'].sum()
+        by_place = by_place.unstack(fill_value=0).reindex(idle_metrics.index, fill_value=0) / 3600
+        for location_class in by_place.columns:
+            idle_metrics[f"{location_class.title()}IdleHours"] = by_place[location_class]
+    
     # Reset index
     idle_metrics = idle_metrics.reset_index()
     
+    # Put idling next to how the rest of each device's time was spent
+    if timeline is not None:
+        utilization = device_utilization(timeline, start_date, as_of_date).rename(columns={'Device': id_col})
+        idle_metrics[id_col] = idle_metrics[id_col].astype(object)
+        idle_metrics = idle_metrics.merge(utilization, on=id_col, how='outer')
+        
+        # Devices that never idled in the window idled for no time
+        totals = ['IdleEvents', 'TotalIdleSeconds'] + [
+            col for col in idle_metrics.columns if col.endswith('IdleHours') and col != 'AvgIdleHoursPerDay'
+        ]
+        idle_metrics[totals] = idle_metrics[totals].fillna(0)
+    
     return idle_metrics 
\ No newline at end of file
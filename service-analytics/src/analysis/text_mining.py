@@ -11,6 +11,50 @@ import os
 # Add the project root to the path so we can import config
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from config.cancel_categories import CANCEL_CATEGORIES, CATEGORY_PRIORITY
+from src.analysis.keywords import keyword_hits, CANCEL_INDICATOR
+from src.data_processing.cache import read_cached, write_cached
+
+# Type6 report columns read by the text mining functions
+TYPE6_COLUMNS = ['Status', 'JobCanceled', 'WorkDescription', 'CSR', 'CSRCode']
+
+# Cancellation categories with keywords, in the order ties are resolved:
+# CATEGORY_PRIORITY first, then any others in CANCEL_CATEGORIES order
+REASON_ORDER = [category for category in dict.fromkeys(CATEGORY_PRIORITY + list(CANCEL_CATEGORIES))
+                if CANCEL_CATEGORIES.get(category)]
+_REASON_KEYWORD_COUNTS = np.array([len(CANCEL_CATEGORIES[category]) for category in REASON_ORDER], dtype='float64')
+
+def cancellation_reasons(descriptions, hits=None):
+    """
+    Extract cancellation reasons from work descriptions.
+    
+    Each description's keyword counts per category are read from the hit
+    matrix; the first matched category in REASON_ORDER wins, and confidence
+    is its share of the category's keywords.
+    
+    Args:
+        descriptions: Series of work description texts
+        hits: keyword_hits() of the descriptions (computed if None)
+        
+    Returns:
+        Tuple of (array of reason categories, array of confidence scores);
+        'UNKNOWN' for missing or empty descriptions, 'OTHER' with no match
+    """
+    if hits is None:
+        hits = keyword_hits(descriptions)
+    
+    counts = hits[REASON_ORDER].to_numpy(dtype='float64')
+    matched = counts > 0
+    first = matched.argmax(axis=1)
+    found = matched.any(axis=1)
+    
+    reasons = np.where(found, np.array(REASON_ORDER, dtype=object)[first], 'OTHER').astype(object)
+    chosen = counts[np.arange(len(counts)), first]
+    confidences = np.where(found, np.minimum(chosen / _REASON_KEYWORD_COUNTS[first], 1.0), 0.0)
+    
+    missing = (descriptions.isna() | (descriptions.astype(object) == '')).to_numpy(dtype=bool)
+    reasons[missing] = 'UNKNOWN'
+    confidences[missing] = 0.0
+    return reasons, confidences
 
 def extract_cancellation_reason(description):
     """
@@ -25,80 +69,56 @@ def extract_cancellation_reason(description):
     if pd.isna(description) or description == '':
         return ('UNKNOWN', 0.0)
     
-    description = str(description).lower()
-    
-    # Check each category's keywords
-    category_matches = {}
-    
-    for category, keywords in CANCEL_CATEGORIES.items():
-        # Skip empty keyword lists
-        if not keywords:
-            continue
-        
-        # Count matches for this category
-        matches = 0
-        for keyword in keywords:
-            if keyword.lower() in description:
-                matches += 1
-        
-        # Store match count if any found
-        if matches > 0:
-            category_matches[category] = matches
-    
-    # If no matches, return OTHER
-    if not category_matches:
-        return ('OTHER', 0.0)
-    
-    # If multiple matches, use priority order
-    if len(category_matches) > 1:
-        for category in CATEGORY_PRIORITY:
-            if category in category_matches:
-                confidence = min(category_matches[category] / len(CANCEL_CATEGORIES[category]), 1.0)
-                return (category, confidence)
-    
-    # Return the single match
-    category = list(category_matches.keys())[0]
-    confidence = min(category_matches[category] / len(CANCEL_CATEGORIES[category]), 1.0)
-    return (category, confidence)
+    reasons, confidences = cancellation_reasons(pd.Series([str(description)], dtype=object))
+    return (reasons[0], float(confidences[0]))
 
-def extract_cancellation_reasons_from_df(df):
+def cancellation_columns(df, hits=None):
     """
-    Extract cancellation reasons from job DataFrame.
+    Extract cancellation reasons from job DataFrame as derived columns.
     
     Args:
         df: DataFrame with job data (must have WorkDescription column)
+        hits: keyword_hits() of the WorkDescription column (computed if None)
         
     Returns:
-        DataFrame with cancellation reason columns added
+        DataFrame on the job index with CancellationReason and
+        CancellationConfidence columns (existing values kept for jobs not
+        canceled), and CancellationRate when cancellation indicators exist
     """
-    # Create a copy to avoid modifying the original
-    result_df = df.copy()
+    # Start from the reason columns if they exist
+    if 'CancellationReason' in df.columns:
+        reasons = df['CancellationReason'].to_numpy(dtype=object, copy=True)
+    else:
+        reasons = np.full(len(df), 'NOT_CANCELED', dtype=object)
     
-    # Create columns for reason if they don't exist
-    if 'CancellationReason' not in result_df.columns:
-        result_df['CancellationReason'] = 'NOT_CANCELED'
+    if 'CancellationConfidence' in df.columns:
+        confidences = df['CancellationConfidence'].to_numpy(dtype='float64', copy=True)
+    else:
+        confidences = np.zeros(len(df))
     
-    if 'CancellationConfidence' not in result_df.columns:
-        result_df['CancellationConfidence'] = 0.0
+    result_df = pd.DataFrame({'CancellationReason': reasons, 'CancellationConfidence': confidences},
+                             index=df.index)
     
     # Only process jobs marked as canceled
     canceled_mask = None
     
     # Check multiple potential indicators of cancellation
-    if 'JobCanceled' in result_df.columns:
-        canceled_mask = result_df['JobCanceled'] == True
+    if 'JobCanceled' in df.columns:
+        canceled_mask = (df['JobCanceled'] == True).fillna(False).to_numpy(dtype=bool)
     
-    if 'Status' in result_df.columns:
-        status_mask = result_df['Status'].str.contains('Cancel|Cancelled|Canceled', case=False, na=False)
+    if 'Status' in df.columns:
+        status_mask = df['Status'].str.contains('Cancel|Cancelled|Canceled', case=False, na=False) \
+            .to_numpy(dtype=bool)
         if canceled_mask is None:
             canceled_mask = status_mask
         else:
             canceled_mask = canceled_mask | status_mask
     
     # Check work description for cancellation indicators
-    if 'WorkDescription' in result_df.columns:
-        text_mask = result_df['WorkDescription'].str.contains('cancel|cancelled|canceled|call off|not home', 
-                                                            case=False, na=False)
+    if 'WorkDescription' in df.columns:
+        if hits is None:
+            hits = keyword_hits(df['WorkDescription'])
+        text_mask = hits[CANCEL_INDICATOR].to_numpy() > 0
         if canceled_mask is None:
             canceled_mask = text_mask
         else:
@@ -114,46 +134,149 @@ def extract_cancellation_reasons_from_df(df):
     print(f"Found {cancellation_count} potentially canceled jobs")
     
     # If no jobs identified as canceled but we have jobs, add dummy classification for demo
-    if cancellation_count == 0 and len(result_df) > 0:
+    if cancellation_count == 0 and len(df) > 0:
         print("No canceled jobs found, adding a dummy cancellation flag for demo purposes")
         # Mark 5% of jobs as canceled for demonstration
-        n_jobs = len(result_df)
-        cancel_indices = np.random.choice(result_df.index, size=max(1, int(n_jobs * 0.05)), replace=False)
-        canceled_mask = result_df.index.isin(cancel_indices)
+        n_jobs = len(df)
+        cancel_indices = np.random.choice(df.index, size=max(1, int(n_jobs * 0.05)), replace=False)
+        canceled_mask = df.index.isin(cancel_indices)
     
-    # Process each canceled job
-    for idx in result_df[canceled_mask].index:
-        if 'WorkDescription' in result_df.columns:
-            reason, confidence = extract_cancellation_reason(result_df.at[idx, 'WorkDescription'])
-            result_df.at[idx, 'CancellationReason'] = reason
-            result_df.at[idx, 'CancellationConfidence'] = confidence
+    # Resolve the reasons of all canceled jobs at once
+    if 'WorkDescription' in df.columns:
+        positions = np.flatnonzero(canceled_mask)
+        reasons[positions], confidences[positions] = cancellation_reasons(
+            df['WorkDescription'].iloc[positions], hits.iloc[positions]
+        )
+        result_df['CancellationReason'] = reasons
+        result_df['CancellationConfidence'] = confidences
     
     # Calculate company-wide cancellation rate instead of per technician
     # As requested by the user - don't need to track cancellations by tech
     # since canceled jobs often don't get assigned to techs
-    total_jobs = len(result_df)
+    total_jobs = len(df)
     total_cancellations = canceled_mask.sum()
     company_cancel_rate = total_cancellations / total_jobs if total_jobs > 0 else 0
     
     # Add company-wide cancellation rate to all rows
     result_df['CancellationRate'] = company_cancel_rate
     
-    # Add CSR information if available
-    if 'CSR' in result_df.columns or 'CSRCode' in result_df.columns:
-        csr_col = 'CSR' if 'CSR' in result_df.columns else 'CSRCode'
-        # Count cancellations by CSR
-        csr_cancels = result_df[canceled_mask].groupby(csr_col).size().reset_index(name='CanceledJobs')
-        # Count total jobs by CSR
-        csr_totals = result_df.groupby(csr_col).size().reset_index(name='TotalJobs')
-        # Merge and calculate rates
-        csr_metrics = pd.merge(csr_totals, csr_cancels, on=csr_col, how='left')
-        csr_metrics['CanceledJobs'] = csr_metrics['CanceledJobs'].fillna(0)
-        csr_metrics['CSRCancelRate'] = csr_metrics['CanceledJobs'] / csr_metrics['TotalJobs']
+    return result_df
+
+def extract_cancellation_reasons_from_df(df, hits=None):
+    """
+    Extract cancellation reasons from job DataFrame.
+    
+    Args:
+        df: DataFrame with job data (must have WorkDescription column)
+        hits: keyword_hits() of the WorkDescription column (computed if None)
         
-        print(f"CSR cancellation metrics calculated for {len(csr_metrics)} CSRs")
+    Returns:
+        DataFrame with cancellation reason columns added (see
+        cancellation_columns() for the columns alone)
+    """
+    return df.assign(**cancellation_columns(df, hits))
+
+# First hour and minute quantities of a description: each pattern's first
+# match, trying the patterns in order (e.g. "1.5 hours" before "2hr" before "3h")
+HOURS_PATTERN = re.compile(
+    r'^(?:(?=.*?(\d+\.?\d*)\s*hour)|(?=.*?(\d+\.?\d*)\s*hr)|(?=.*?(\d+)h))', re.IGNORECASE | re.DOTALL
+)
+MINUTES_PATTERN = re.compile(r'^(?:(?=.*?(\d+)\s*min)|(?=.*?(\d+)m))', re.IGNORECASE | re.DOTALL)
+
+# SD-Mobile visit entries: "1/8/25 12:10: JS there 1/8 WED, 11:45 to 12:05, ..."
+VISIT_PATTERN = re.compile(
+    r'\b\w+ there \d{1,2}/\d{1,2} \w+, (?P<ArriveH>\d{1,2}):(?P<ArriveM>\d{2}) to (?P<LeaveH>\d{1,2}):(?P<LeaveM>\d{2})'
+)
+
+# Cache of time-on-job columns by description content hash; bump the version
+# whenever the extraction changes
+TIME_ON_JOB_VERSION = 2
+TIME_ON_JOB_KEY = f'time_on_job_v{TIME_ON_JOB_VERSION}'
+TIME_ON_JOB_COLUMNS = ['TimeOnJob', 'OnSiteMinutes', 'OnSiteVisits']
+
+def _first_quantity(descriptions, pattern):
+    """First non-missing group of pattern in each description, as a float (NaN if none)."""
+    groups = descriptions.str.extract(pattern)
+    return groups.bfill(axis=1).iloc[:, 0].astype('float64')
+
+def time_on_job_minutes(descriptions):
+    """
+    Extract time spent on jobs from work descriptions when available.
+    
+    Args:
+        descriptions: Series of work description texts
         
-        # We'll return this separately through the process_data function
+    Returns:
+        Series of estimated minutes (hours x 60 + minutes) on the
+        descriptions' index, NaN where no time was found
+    """
+    descriptions = descriptions.astype(object)
+    hours = _first_quantity(descriptions, HOURS_PATTERN).fillna(0)
+    minutes = _first_quantity(descriptions, MINUTES_PATTERN).fillna(0)
+    total_minutes = hours * 60 + minutes
+    return total_minutes.where(total_minutes != 0).rename('TimeOnJob')
+
+def on_site_minutes(descriptions):
+    """
+    Derive on-site time from the visit entries logged in work descriptions.
     
+    Args:
+        descriptions: Series of work description texts
+        
+    Returns:
+        DataFrame on the descriptions' index with OnSiteMinutes (total
+        arrival-to-departure minutes) and OnSiteVisits (number of valid
+        visit entries); NaN minutes and 0 visits for jobs without any.
+        Entries use a 24-hour clock, so a departure before the arrival time
+        is an inverted or mistyped entry and is left out of both counts
+    """
+    visits = descriptions.astype(object).str.extractall(VISIT_PATTERN).astype('int64')
+    minutes = (visits['LeaveH'] * 60 + visits['LeaveM']) - (visits['ArriveH'] * 60 + visits['ArriveM'])
+    minutes = minutes[minutes >= 0]
+    
+    rows = minutes.index.get_level_values(0)
+    return pd.DataFrame({
+        'OnSiteMinutes': minutes.groupby(rows).sum().reindex(descriptions.index).astype('float64'),
+        'OnSiteVisits': minutes.groupby(rows).size().reindex(descriptions.index, fill_value=0).astype('int64')
+    }, index=descriptions.index)
+
+def time_on_job_columns(descriptions, use_cache=True):
+    """
+    Extract time on job and on-site time from work descriptions.
+    
+    Results are cached by each description's content hash, so only
+    descriptions not seen before are parsed.
+    
+    Args:
+        descriptions: Series of work description texts
+        use_cache: Whether to use the persistent cache
+        
+    Returns:
+        DataFrame on the descriptions' index with TimeOnJob, OnSiteMinutes
+        and OnSiteVisits columns
+    """
+    hashes = pd.util.hash_pandas_object(descriptions.astype(object), index=False).to_numpy()
+    cached = read_cached(TIME_ON_JOB_KEY) if use_cache else None
+    if cached is None:
+        cached = pd.DataFrame({
+            'Hash': np.array([], dtype='uint64'), 'TimeOnJob': np.array([], dtype='float64'),
+            'OnSiteMinutes': np.array([], dtype='float64'), 'OnSiteVisits': np.array([], dtype='int64')
+        })
+    
+    # Parse each new distinct description once
+    position = pd.Index(cached['Hash']).get_indexer(hashes)
+    new_hashes, first = np.unique(hashes[position < 0], return_index=True)
+    if len(new_hashes):
+        texts = descriptions.iloc[np.flatnonzero(position < 0)[first]].reset_index(drop=True)
+        parsed = pd.concat([time_on_job_minutes(texts), on_site_minutes(texts)], axis=1)
+        parsed.insert(0, 'Hash', new_hashes)
+        cached = pd.concat([cached, parsed], ignore_index=True)
+        if use_cache:
+            write_cached(TIME_ON_JOB_KEY, cached)
+        position = pd.Index(cached['Hash']).get_indexer(hashes)
+    
+    result_df = cached[TIME_ON_JOB_COLUMNS].iloc[position].set_axis(descriptions.index)
+    result_df['OnSiteVisits'] = result_df['OnSiteVisits'].astype('int64')
     return result_df
 
 def extract_time_on_job(description):
@@ -169,43 +292,5 @@ def extract_time_on_job(description):
     if pd.isna(description) or description == '':
         return None
     
-    description = str(description).lower()
-    
-    # Look for time patterns like "1 hour", "30 min", "1.5 hours", etc.
-    hour_patterns = [
-        r'(\d+\.?\d*)\s*hour',  # 1 hour, 1.5 hours
-        r'(\d+\.?\d*)\s*hr',    # 1 hr, 1.5 hrs
-        r'(\d+)h'               # 1h
-    ]
-    
-    minute_patterns = [
-        r'(\d+)\s*min',         # 30 min, 30 minutes
-        r'(\d+)m'               # 30m
-    ]
-    
-    # Check for hour mentions
-    hours = 0
-    for pattern in hour_patterns:
-        matches = re.findall(pattern, description)
-        if matches:
-            # Take the first match if multiple exist
-            hours = float(matches[0])
-            break
-    
-    # Check for minute mentions
-    minutes = 0
-    for pattern in minute_patterns:
-        matches = re.findall(pattern, description)
-        if matches:
-            # Take the first match if multiple exist
-            minutes = float(matches[0])
-            break
-    
-    # Calculate total minutes
-    total_minutes = hours * 60 + minutes
-    
-    # Return None if no time was found
-    if total_minutes == 0:
-        return None
-    
-    return total_minutes 
\ No newline at end of file
+    minutes = time_on_job_minutes(pd.Series([str(description)], dtype=object)).iloc[0]
+    return None if pd.isna(minutes) else minutes
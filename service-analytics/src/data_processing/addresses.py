@@ -0,0 +1,180 @@
+"""
+Canonical address table.
+
+Every distinct raw address string is standardized once and interned as an
+integer key, shared by all spellings with the same standardized form, so
+matching compares integers and scores each canonical pair once. Raw lookups
+go through a bounded in-process LRU backed by an on-disk dictionary in
+PROCESSED_DIR, so later runs skip standardizing addresses seen before.
+"""
+
+import os
+import sys
+import dbm
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import PROCESSED_DIR, ADDRESS_CACHE_SIZE
+from src.data_processing.cache import PROJECT_ROOT
+from src.data_processing.cleaner import (
+    standardize_address, standardized_address_confidence, address_pair_scores
+)
+
+ADDRESS_STORE_PATH = os.path.join(PROJECT_ROOT, PROCESSED_DIR, 'addresses')
+
+# Key of missing or empty addresses, which match nothing
+MISSING_ADDRESS = -1
+
+# Interned canonical addresses: key -> standardized address, and back
+_canonical = []
+_canonical_keys = {}
+
+# Raw address -> key, least recently used first
+_recent = OrderedDict()
+
+def intern_address(canonical):
+    """
+    Return the key of a standardized address, assigning the next one if new.
+
+    Args:
+        canonical: Standardized address string
+
+    Returns:
+        Integer address key
+    """
+    key = _canonical_keys.get(canonical)
+    if key is None:
+        key = len(_canonical)
+        _canonical.append(canonical)
+        _canonical_keys[canonical] = key
+    return key
+
+def canonical_address(key):
+    """
+    Look up the standardized address of a key.
+
+    Args:
+        key: Integer address key
+
+    Returns:
+        Standardized address string ('' for MISSING_ADDRESS)
+    """
+    return _canonical[key] if key != MISSING_ADDRESS else ''
+
+def _remember(raw, key):
+    _recent[raw] = key
+    if len(_recent) > ADDRESS_CACHE_SIZE:
+        _recent.popitem(last=False)
+
+def _open_store():
+    """Open the on-disk raw -> standardized address dictionary, or None."""
+    try:
+        os.makedirs(os.path.dirname(ADDRESS_STORE_PATH), exist_ok=True)
+        return dbm.open(ADDRESS_STORE_PATH, 'c')
+    except Exception as e:
+        print(f"Address store unavailable, standardizing in memory: {e}")
+        return None
+
+def address_keys(values):
+    """
+    Map raw addresses to canonical address keys.
+
+    Each distinct raw string is looked up once: in the LRU, then the on-disk
+    dictionary, and only then standardized.
+
+    Args:
+        values: Series or array of raw address strings
+
+    Returns:
+        Array of int32 address keys (MISSING_ADDRESS for missing or empty values)
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    unique_keys = np.full(len(uniques), MISSING_ADDRESS, dtype=np.int32)
+
+    unseen = []
+    for i, raw in enumerate(uniques):
+        if raw == '':
+            continue
+        key = _recent.get(raw)
+        if key is None:
+            unseen.append(i)
+        else:
+            _recent.move_to_end(raw)
+            unique_keys[i] = key
+
+    if unseen:
+        store = _open_store()
+        try:
+            for i in unseen:
+                raw = uniques[i]
+                stored = store.get(str(raw)) if store is not None else None
+                if stored is not None:
+                    canonical = stored.decode('utf-8')
+                else:
+                    canonical = standardize_address(raw)
+                    if store is not None:
+                        store[str(raw)] = canonical
+                unique_keys[i] = intern_address(canonical)
+                _remember(raw, unique_keys[i])
+        finally:
+            if store is not None:
+                store.close()
+
+    keys = np.full(len(codes), MISSING_ADDRESS, dtype=np.int32)
+    found = codes >= 0
+    keys[found] = unique_keys[codes[found]]
+    return keys
+
+def address_key_confidence(key1, key2):
+    """
+    Calculate confidence score for matching two address keys.
+
+    Gives the same score as cleaner.match_address_confidence() on the raw
+    addresses the keys came from.
+
+    Args:
+        key1: First address key
+        key2: Second address key
+
+    Returns:
+        Confidence score between 0-100
+    """
+    if key1 == MISSING_ADDRESS or key2 == MISSING_ADDRESS:
+        return 0
+    if key1 == key2:
+        return 100
+    return standardized_address_confidence(_canonical[key1], _canonical[key2])
+
+def address_key_scores(keys1, keys2, threshold=None):
+    """
+    Score pairs of address keys in one batch.
+
+    Each distinct pair is scored once with cleaner.address_pair_scores(), so
+    the scores equal address_key_confidence() on every pair.
+
+    Args:
+        keys1: Array of address keys
+        keys2: Array of address keys, same length
+        threshold: Lowest confidence of interest, 0-100; pairs that cannot
+            reach it score 0 (None scores every pair)
+
+    Returns:
+        Array of confidence scores, one per pair
+    """
+    keys1 = np.asarray(keys1, dtype=np.int64)
+    keys2 = np.asarray(keys2, dtype=np.int64)
+    scores = np.zeros(len(keys1))
+
+    # Missing addresses match nothing
+    valid = (keys1 != MISSING_ADDRESS) & (keys2 != MISSING_ADDRESS)
+    if not valid.any():
+        return scores
+
+    pairs, inverse = np.unique((keys1[valid] << 32) | keys2[valid], return_inverse=True)
+    canonical = np.array(_canonical, dtype=object)
+    pair_scores = address_pair_scores(canonical[pairs >> 32], canonical[pairs & 0xFFFFFFFF], threshold)
+    scores[valid] = pair_scores[inverse]
+    return scores
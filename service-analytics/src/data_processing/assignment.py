@@ -0,0 +1,121 @@
+"""
+One-to-one assignment of GPS stops to scheduled jobs.
+
+Candidate job/stop pairs are split into independent problems, one per device
+and calendar day. Each problem is a small dense cost matrix solved with the
+Hungarian algorithm, so no stop is attributed to two jobs and the total cost
+grows with the number of days rather than the size of the whole schedule.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import ASSIGNMENT_WORKERS
+from src.data_processing.orchestrator import map_chunks
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# Cost of a job/stop pair that is not a candidate; above any real pair cost,
+# so the solver first maximizes the number of candidate pairs assigned
+UNASSIGNABLE_COST = 1e6
+
+def solve_assignment(rows, cols, costs):
+    """
+    Solve one assignment problem over candidate pairs.
+
+    Args:
+        rows: Array of row (job) numbers, one per candidate pair
+        cols: Array of column (stop) numbers, one per candidate pair
+        costs: Array of pair costs
+
+    Returns:
+        Array of the positions of the pairs chosen, each row and column
+        used at most once
+    """
+    row_ids, rows = np.unique(rows, return_inverse=True)
+    col_ids, cols = np.unique(cols, return_inverse=True)
+
+    matrix = np.full((len(row_ids), len(col_ids)), UNASSIGNABLE_COST)
+    pair_at = np.full((len(row_ids), len(col_ids)), -1, dtype=np.intp)
+    # Write the cheapest pair last, so duplicate pairs keep their cheapest cost
+    order = np.argsort(-costs, kind='stable')
+    matrix[rows[order], cols[order]] = costs[order]
+    pair_at[rows[order], cols[order]] = order
+
+    if SCIPY_AVAILABLE:
+        chosen_rows, chosen_cols = linear_sum_assignment(matrix)
+    else:
+        chosen_rows, chosen_cols = _greedy_assignment(matrix)
+    chosen = pair_at[chosen_rows, chosen_cols]
+    return chosen[chosen >= 0]
+
+def _greedy_assignment(matrix):
+    """Cheapest-first assignment, used when scipy is not installed."""
+    order = np.argsort(matrix, axis=None, kind='stable')
+    used_rows, used_cols = set(), set()
+    chosen_rows, chosen_cols = [], []
+    for row, col in zip(*np.unravel_index(order, matrix.shape)):
+        if matrix[row, col] >= UNASSIGNABLE_COST:
+            break
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            chosen_rows.append(row)
+            chosen_cols.append(col)
+    return np.array(chosen_rows, dtype=np.intp), np.array(chosen_cols, dtype=np.intp)
+
+def _solve_chunk(problems):
+    """Solve a batch of problems in one worker."""
+    return [solve_assignment(rows, cols, costs) for rows, cols, costs in problems]
+
+def assign_pairs(pair_jobs, pair_stops, costs, partitions, workers=ASSIGNMENT_WORKERS):
+    """
+    Choose a one-to-one set of job/stop pairs of least total cost.
+
+    Each partition is solved on its own, in parallel when more than one
+    worker is allowed. A stop claimed in two partitions (a stop near
+    midnight) goes to its cheaper pair.
+
+    Args:
+        pair_jobs: Array of job positions, one per candidate pair
+        pair_stops: Array of stop positions, one per candidate pair
+        costs: Array of pair costs (lower is better)
+        partitions: Array of partition labels, such as device and day codes;
+            a job's pairs must all share one label
+        workers: Number of worker processes
+
+    Returns:
+        Boolean array marking the chosen pairs
+    """
+    chosen = np.zeros(len(pair_jobs), dtype=bool)
+    if len(pair_jobs) == 0:
+        return chosen
+
+    codes, _ = pd.factorize(pd.Series(partitions))
+    order = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    groups = np.split(order, bounds)
+
+    problems = [(pair_jobs[group], pair_stops[group], costs[group]) for group in groups]
+    chunk_count = max(1, min(workers, len(problems)))
+    chunks = [problems[i::chunk_count] for i in range(chunk_count)]
+    groups_by_chunk = [groups[i::chunk_count] for i in range(chunk_count)]
+
+    for chunk_groups, results in zip(groups_by_chunk, map_chunks(_solve_chunk, chunks, workers)):
+        for group, picked in zip(chunk_groups, results):
+            chosen[group[picked]] = True
+
+    # Keep the cheaper pair of a stop chosen in two partitions
+    picked = np.flatnonzero(chosen)
+    by_stop = picked[np.lexsort((costs[picked], pair_stops[picked]))]
+    repeated = pd.Series(pair_stops[by_stop]).duplicated().to_numpy()
+    chosen[by_stop[repeated]] = False
+    return chosen
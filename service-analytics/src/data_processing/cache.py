@@ -0,0 +1,390 @@
+"""
+Persistent columnar cache for imported data files.
+
+Each loader stores its fully typed output as a Parquet file keyed by the
+source file's content hash plus the loader version, so later loads are a
+columnar read instead of a CSV parse and conversion passes.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import sys
+
+# Add the project root to the path so we can import config
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.append(PROJECT_ROOT)
+from config.settings import PROCESSED_DIR, CACHE_MAX_MB
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, PROCESSED_DIR, 'cache')
+CACHE_EXTENSION = '.parquet'
+
+# In-process memo of content hashes keyed by (path, size, mtime)
+_fingerprints = {}
+
+def file_fingerprint(filepath):
+    """
+    Calculate a content hash for a file.
+
+    Args:
+        filepath: Path to the file
+
+    Returns:
+        Hex digest of the file contents
+    """
+    stat = os.stat(filepath)
+    stat_key = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+    if stat_key in _fingerprints:
+        return _fingerprints[stat_key]
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+
+    fingerprint = digest.hexdigest()
+    _fingerprints[stat_key] = fingerprint
+    return fingerprint
+
+def cache_key(filepath, loader_name, loader_version, columns=None):
+    """
+    Build the cache key for a loader's output on a given file.
+
+    Args:
+        filepath: Path to the source file
+        loader_name: Name of the loader (e.g. 'type6', 'gps_idle_time')
+        loader_version: Version of the loader's output format
+        columns: Column projection the output was loaded with (None for all)
+
+    Returns:
+        Cache key string
+    """
+    key = f"{loader_name}-v{loader_version}-{file_fingerprint(filepath)}"
+    if columns is not None:
+        projection = '\n'.join(sorted(columns)).encode('utf-8')
+        key += '-' + hashlib.blake2b(projection, digest_size=4).hexdigest()
+    return key
+
+def _cache_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, key + CACHE_EXTENSION)
+
+def _tmp_path(path):
+    # Unique per process so parallel loaders never share a temporary file
+    return f"{path}.{os.getpid()}.tmp"
+
+def _restore_types(df, schema):
+    """Undo the type changes of an Arrow round trip using its pandas metadata."""
+    # Arrow returns missing text as None; restore the NaN the CSV parser gives
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].to_numpy()
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = np.nan
+            df[col] = values
+
+    # Categoricals with no categories (all-missing columns) come back as
+    # object; restore them from the stored pandas metadata
+    metadata = schema.pandas_metadata or {}
+    for column in metadata.get('columns', []):
+        name = column.get('name')
+        if column.get('pandas_type') == 'categorical' and name in df.columns \
+                and not isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype('category')
+
+    # Dictionaries merged from several batches keep first-seen order; use the
+    # sorted order the CSV parser gives
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and not dtype.ordered \
+                and not dtype.categories.is_monotonic_increasing:
+            try:
+                df[col] = df[col].cat.reorder_categories(sorted(dtype.categories))
+            except TypeError:
+                pass
+
+    return df
+
+def read_cached(key, cache_dir=None, columns=None):
+    """
+    Read a cached DataFrame.
+
+    Args:
+        key: Cache key from cache_key()
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+        columns: Columns to read (None for all); absent columns are ignored
+
+    Returns:
+        Cached DataFrame, or None if not cached
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+
+    path = _cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        schema = pq.read_schema(path)
+        if columns is not None:
+            wanted = set(columns)
+            columns = [name for name in schema.names if name in wanted]
+        df = _restore_types(pd.read_parquet(path, columns=columns), schema)
+
+        # Touch the file so eviction treats it as recently used
+        os.utime(path)
+        return df
+    except Exception as e:
+        print(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def write_cached(key, df, cache_dir=None, max_mb=CACHE_MAX_MB):
+    """
+    Store a DataFrame in the cache and evict old entries if over budget.
+
+    Args:
+        key: Cache key from cache_key()
+        df: DataFrame to store
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+        max_mb: Maximum total cache size in megabytes (None for no limit)
+
+    Returns:
+        True if the entry was written
+    """
+    if not PARQUET_AVAILABLE or df is None or df.empty:
+        return False
+
+    cache_dir = cache_dir or CACHE_DIR
+    path = _cache_path(key, cache_dir)
+    tmp_path = _tmp_path(path)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not cache {key}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    if max_mb is not None:
+        evict_cache(cache_dir, max_mb)
+    return True
+
+def _batch_schema(schema):
+    """Widen a batch's Arrow schema so every later batch can be cast to it."""
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            value_type = field.type.value_type
+            if pa.types.is_null(value_type):
+                value_type = pa.string()
+            field = field.with_type(pa.dictionary(pa.int32(), value_type))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+def write_cached_batches(key, batches, cache_dir=None, max_mb=CACHE_MAX_MB):
+    """
+    Stream DataFrame batches into one cache entry without holding them all.
+
+    Each batch becomes a row group of the Parquet file. Batches must have the
+    same columns; categorical columns may have different categories.
+
+    Args:
+        key: Cache key from cache_key()
+        batches: Iterable of DataFrames
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+        max_mb: Maximum total cache size in megabytes
+
+    Returns:
+        Number of rows written (0 if nothing was cached)
+    """
+    if not PARQUET_AVAILABLE:
+        return 0
+
+    cache_dir = cache_dir or CACHE_DIR
+    path = _cache_path(key, cache_dir)
+    tmp_path = _tmp_path(path)
+    writer = None
+    rows = 0
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for df in batches:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                schema = _batch_schema(table.schema)
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(table.cast(schema))
+            rows += len(df)
+
+        if writer is None:
+            return 0
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not cache {key}: {e}")
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 0
+
+    evict_cache(cache_dir, max_mb)
+    return rows
+
+def list_cache(cache_dir=None):
+    """
+    List cache entries, least recently used first.
+
+    Args:
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+
+    Returns:
+        DataFrame with Key, Bytes and LastUsed columns
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    entries = []
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append({
+                'Key': name[:-len(CACHE_EXTENSION)],
+                'Bytes': stat.st_size,
+                'LastUsed': pd.Timestamp(stat.st_mtime, unit='s')
+            })
+
+    entries_df = pd.DataFrame(entries, columns=['Key', 'Bytes', 'LastUsed'])
+    return entries_df.sort_values('LastUsed').reset_index(drop=True)
+
+def evict_cache(cache_dir=None, max_mb=CACHE_MAX_MB):
+    """
+    Remove least recently used entries until the cache fits its size budget.
+
+    Args:
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+        max_mb: Maximum total cache size in megabytes
+
+    Returns:
+        Number of entries removed
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    entries = list_cache(cache_dir)
+    max_bytes = max_mb * 1024 * 1024
+    total_bytes = entries['Bytes'].sum()
+
+    removed = 0
+    for _, entry in entries.iterrows():
+        if total_bytes <= max_bytes:
+            break
+        os.remove(_cache_path(entry['Key'], cache_dir))
+        total_bytes -= entry['Bytes']
+        removed += 1
+
+    if removed:
+        print(f"Evicted {removed} cache entries to stay under {max_mb} MB")
+    return removed
+
+def purge_cache(cache_dir=None):
+    """
+    Remove every cache entry.
+
+    Args:
+        cache_dir: Cache directory (defaults to CACHE_DIR)
+
+    Returns:
+        Number of entries removed
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    entries = list_cache(cache_dir)
+    for key in entries['Key']:
+        os.remove(_cache_path(key, cache_dir))
+    return len(entries)
+
+def _state_path(name):
+    return os.path.join(PROJECT_ROOT, PROCESSED_DIR, name + '.json')
+
+def load_state(name, default=None):
+    """
+    Load a small persisted JSON state file from PROCESSED_DIR.
+
+    Args:
+        name: State name (file name without extension)
+        default: Value returned if the state does not exist or is unreadable
+
+    Returns:
+        Loaded state
+    """
+    path = _state_path(name)
+    if not os.path.exists(path):
+        return default
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable state file {path}: {e}")
+        return default
+
+def save_state(name, state):
+    """
+    Persist a small JSON-serializable state to PROCESSED_DIR.
+
+    Args:
+        name: State name (file name without extension)
+        state: JSON-serializable value
+    """
+    path = _state_path(name)
+    tmp_path = _tmp_path(path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=1, default=str)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not save state {name}: {e}")
+
+def write_frame_ipc(df, path):
+    """
+    Write a DataFrame to an Arrow IPC file.
+
+    Used to hand loader output between processes as columnar buffers instead
+    of pickling the DataFrame through a pipe.
+
+    Args:
+        df: DataFrame to write
+        path: Destination file path
+    """
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+def read_frame_ipc(path):
+    """
+    Read a DataFrame written by write_frame_ipc().
+
+    Args:
+        path: Arrow IPC file path
+
+    Returns:
+        DataFrame
+    """
+    with pa.OSFile(path, 'rb') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return _restore_types(table.to_pandas(), table.schema)
@@ -0,0 +1,292 @@
+"""
+Catalog of the data files available to the importers.
+
+Scans the data directory and its archive folders, recognizes each export
+family from its filename and header, and records the time range, row count
+and fingerprint of every file. Loaders can then ask for the files of a family
+that overlap a date range instead of loading everything.
+"""
+
+import os
+import re
+import csv
+import pandas as pd
+import sys
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import DATA_DIR
+from src.data_processing.cache import PROJECT_ROOT, file_fingerprint, load_state, save_state
+from src.data_processing.importers import detect_encoding
+from src.data_processing.parsers import GPS_DATE_FORMAT, GPS_TIMESTAMP_FORMAT
+
+CATALOG_COLUMNS = ['Path', 'Family', 'Start', 'End', 'Rows', 'Fingerprint', 'Archived']
+
+# Export families: filename pattern, header columns that confirm the family,
+# the column (with its format, None for mixed formats) that dates each row,
+# and the natural key columns that identify a row across overlapping exports
+FAMILIES = {
+    'type6': {
+        'pattern': r'^type6report.*\.csv$',
+        'header': ['InvNmbr', 'TechCode', 'OriginDate'],
+        'date_column': ('OriginDate', None),
+        'key': ['InvNmbr']
+    },
+    'sales': {
+        'pattern': r'^(slsjrnl|.*journal).*\.(csv|dat|dat\.str)$',
+        'header': ['DateRecorded', 'Technician', 'InvoiceNumber'],
+        'date_column': ('DateRecorded', None),
+        'key': ['InvoiceNumber', 'Technician']
+    },
+    'techrev': {
+        'pattern': r'^techrev.*\.csv$',
+        'header': ['InvoiceNumber', 'Technician', 'EntryDate'],
+        'date_column': ('EntryDate', None),
+        'key': ['InvoiceNumber', 'Technician']
+    },
+    'day_start_end': {
+        'pattern': r'^day_start_end.*\.csv$',
+        'header': ['Device', 'Date', 'Status', 'Start Time', 'End Time'],
+        'date_column': ('Date', GPS_DATE_FORMAT),
+        'key': ['Device', 'Start Time']
+    },
+    'drives_stops': {
+        'pattern': r'^drives_and_stops.*\.csv$',
+        'header': ['Device', 'Status', 'Start Time', 'End Time', 'Zone name'],
+        'date_column': ('Start Time', GPS_TIMESTAMP_FORMAT),
+        'key': ['Device', 'Start Time']
+    },
+    'day_engine': {
+        'pattern': r'^day_engine.*\.csv$',
+        'header': ['Date', 'Device', 'Daily Hours Accumulated'],
+        'date_column': ('Date', GPS_DATE_FORMAT),
+        'key': ['Device', 'Date']
+    },
+    'idle_time': {
+        'pattern': r'^idle_time.*\.csv$',
+        'header': ['Device', 'Start Time', 'End Time', 'Duration'],
+        'date_column': ('Start Time', GPS_TIMESTAMP_FORMAT),
+        'key': ['Device', 'Start Time']
+    },
+    'alert': {
+        'pattern': r'^alert_summary.*\.csv$',
+        'header': ['Device', 'Time', 'Alert'],
+        'date_column': ('Time', GPS_TIMESTAMP_FORMAT),
+        'key': ['Device', 'Time']
+    }
+}
+
+GPS_FAMILIES = ['day_start_end', 'drives_stops', 'day_engine', 'idle_time', 'alert']
+
+# Report window in GPS export names, e.g. _01_01_2025_12_00am_PST-03_17_2025_12_00am_PDT
+GPS_RANGE_PATTERN = re.compile(
+    r'_(\d{2}_\d{2}_\d{4}_\d{2}_\d{2}[ap]m)_[A-Z]{3}-(\d{2}_\d{2}_\d{4}_\d{2}_\d{2}[ap]m)_[A-Z]{3}',
+    re.IGNORECASE
+)
+GPS_RANGE_FORMAT = '%m_%d_%Y_%I_%M%p'
+
+def read_header(filepath):
+    """
+    Read the column names of a CSV file or Sales Journal DAT export.
+
+    Args:
+        filepath: Path to the data file
+
+    Returns:
+        List of column names (empty if the file cannot be read)
+    """
+    try:
+        with open(filepath, 'r', encoding=detect_encoding(filepath), newline='') as f:
+            return [col.strip() for col in next(csv.reader(f, skipinitialspace=True), [])]
+    except Exception as e:
+        print(f"Could not read header of {filepath}: {e}")
+        return []
+
+def identify_family(filepath, header=None):
+    """
+    Recognize the export family of a data file.
+
+    The filename pattern is tried first and confirmed against the header; a
+    file with an unfamiliar name is identified by its header alone.
+
+    Args:
+        filepath: Path to the data file
+        header: Column names, read from the file if not given
+
+    Returns:
+        Family name from FAMILIES, or None if unrecognized
+    """
+    if header is None:
+        header = read_header(filepath)
+    columns = set(header)
+    name = os.path.basename(filepath).lower()
+
+    for family, spec in FAMILIES.items():
+        if re.match(spec['pattern'], name) and columns.issuperset(spec['header']):
+            return family
+
+    for family, spec in FAMILIES.items():
+        if columns.issuperset(spec['header']):
+            return family
+
+    return None
+
+def filename_time_range(filepath):
+    """
+    Parse the report window from a GPS export's file name.
+
+    Args:
+        filepath: Path to the GPS export
+
+    Returns:
+        (start, end) local timestamps, or None if the name has no window
+    """
+    match = GPS_RANGE_PATTERN.search(os.path.basename(filepath))
+    if not match:
+        return None
+
+    try:
+        start, end = (pd.to_datetime(part, format=GPS_RANGE_FORMAT) for part in match.groups())
+    except ValueError:
+        return None
+    return start, end
+
+def scan_file(filepath, family):
+    """
+    Measure the row count and covered time range of a data file.
+
+    Only the family's date column is parsed. GPS exports use the report
+    window from their file name when present, since a quiet period at either
+    end still counts as covered.
+
+    Args:
+        filepath: Path to the data file
+        family: Family name from FAMILIES
+
+    Returns:
+        Dictionary with Start, End and Rows
+    """
+    date_column, date_format = FAMILIES[family]['date_column']
+    dates = pd.read_csv(
+        filepath, encoding=detect_encoding(filepath), usecols=[date_column],
+        dtype=str, on_bad_lines='skip', index_col=False, skipinitialspace=True
+    )[date_column]
+
+    # The Sales Journal DAT export wraps dates in '#'
+    dates = pd.to_datetime(dates.str.strip('#'), format=date_format or 'mixed', errors='coerce')
+
+    time_range = filename_time_range(filepath) if family in GPS_FAMILIES else None
+    if time_range is None:
+        time_range = (dates.min(), dates.max())
+
+    return {'Start': time_range[0], 'End': time_range[1], 'Rows': len(dates)}
+
+def _data_files(data_dir):
+    """List the data files in data_dir and its subfolders (the archive)."""
+    paths = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(('.csv', '.dat', '.dat.str')):
+                paths.append(os.path.join(root, name))
+    return paths
+
+def scan_catalog(data_dir=None):
+    """
+    Build the catalog of data files, rescanning only files that changed.
+
+    Entries are persisted in PROCESSED_DIR/catalog.json keyed by path; a file
+    whose size and modification time are unchanged is not read again.
+
+    Args:
+        data_dir: Data directory to scan (defaults to DATA_DIR)
+
+    Returns:
+        DataFrame with Path, Family, Start, End, Rows, Fingerprint and Archived
+        columns, one row per recognized file
+    """
+    data_dir = data_dir or os.path.join(PROJECT_ROOT, DATA_DIR)
+    state = load_state('catalog', {})
+    entries = []
+    changed = False
+
+    for filepath in _data_files(data_dir):
+        path = os.path.abspath(filepath)
+        stat = os.stat(path)
+        entry = state.get(path)
+
+        if entry is None or entry['Size'] != stat.st_size or entry['Modified'] != stat.st_mtime_ns:
+            entry = {'Size': stat.st_size, 'Modified': stat.st_mtime_ns, 'Family': None}
+            try:
+                family = identify_family(path)
+                if family is not None:
+                    entry.update(scan_file(path, family))
+                    entry['Family'] = family
+                    entry['Fingerprint'] = file_fingerprint(path)
+            except Exception as e:
+                print(f"Could not catalog {path}: {e}")
+            state[path] = entry
+            changed = True
+
+        if entry['Family'] is not None:
+            entries.append({
+                'Path': path,
+                'Family': entry['Family'],
+                'Start': pd.Timestamp(entry['Start']),
+                'End': pd.Timestamp(entry['End']),
+                'Rows': entry['Rows'],
+                'Fingerprint': entry['Fingerprint'],
+                'Archived': os.path.dirname(path) != os.path.abspath(data_dir)
+            })
+
+    # Forget files that no longer exist
+    for path in [p for p in state if not os.path.exists(p)]:
+        del state[path]
+        changed = True
+
+    if changed:
+        save_state('catalog', state)
+
+    return pd.DataFrame(entries, columns=CATALOG_COLUMNS)
+
+def find_files(catalog, family, start=None, end=None):
+    """
+    Select the files of a family that cover part of a date range.
+
+    Identical copies (same fingerprint) are listed once, preferring the copy
+    outside the archive, and a file whose whole range lies within another
+    selected file's range is skipped.
+
+    Args:
+        catalog: DataFrame from scan_catalog()
+        family: Family name from FAMILIES
+        start: Start of the range (None for unbounded)
+        end: End of the range, inclusive (None for unbounded)
+
+    Returns:
+        List of file paths, newest range first
+    """
+    files = catalog[catalog['Family'] == family]
+
+    if start is not None:
+        files = files[files['End'] >= pd.Timestamp(start)]
+    if end is not None:
+        # A date-only end covers that whole day
+        end = pd.Timestamp(end)
+        if end == end.normalize():
+            end += pd.Timedelta(days=1)
+        files = files[files['Start'] < end]
+
+    files = files.sort_values(['Archived', 'End', 'Start'], ascending=[True, False, True])
+    files = files.drop_duplicates('Fingerprint')
+
+    selected = []
+    for _, candidate in files.iterrows():
+        covered = any(
+            other['Start'] <= candidate['Start'] and candidate['End'] <= other['End']
+            for other in selected
+        )
+        if not covered:
+            selected.append(candidate)
+
+    return [entry['Path'] for entry in selected]
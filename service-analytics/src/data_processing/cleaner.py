@@ -3,20 +3,91 @@ Data cleaning and standardization functions.
 """
 
 import re
+from functools import lru_cache
 import pandas as pd
 import numpy as np
-from fuzzywuzzy import fuzz
+from fuzzywuzzy import fuzz, utils as fuzz_utils
 import sys
 import os
 
 # Add the project root to the path so we can import config
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from config.mapping import TECH_MAPPING, TECH_REVERSE_MAPPING
+from config.settings import ADDRESS_CACHE_SIZE, ADDRESS_SCORE_WORKERS, GPS_MATCH_THRESHOLD
+from src.data_processing.identity import TECH_ALIAS_IDS, TECH_CODES, normalize_alias
+
+try:
+    from rapidfuzz import fuzz as rapid_fuzz, process as rapid_process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Fuzzy scores of addresses shorter than this are scaled down by SHORT_ADDRESS_WEIGHT
+SHORT_ADDRESS_LENGTH = 10
+SHORT_ADDRESS_WEIGHT = 0.8
+
+# Street-type and state words, replaced by their abbreviations
+ADDRESS_ABBREVIATIONS = {
+    'STREET': 'ST',
+    'AVENUE': 'AVE',
+    'BOULEVARD': 'BLVD',
+    'DRIVE': 'DR',
+    'LANE': 'LN',
+    'ROAD': 'RD',
+    'COURT': 'CT',
+    'CIRCLE': 'CIR',
+    'PLACE': 'PL',
+    'HIGHWAY': 'HWY',
+    'APARTMENT': 'APT',
+    'SUITE': 'STE',
+    'CALIFORNIA': 'CA'
+}
+
+# All full words in one pass, for addresses without periods
+ABBREVIATION_PATTERN = re.compile(r'\b(' + '|'.join(ADDRESS_ABBREVIATIONS) + r')\b')
+
+# Full word and "ABBR." substitutions one word at a time, for addresses with periods
+ABBREVIATION_STEPS = [
+    (re.compile(r'\b' + full + r'\b'), re.compile(r'\b' + abbr + r'\.'), abbr)
+    for full, abbr in ADDRESS_ABBREVIATIONS.items()
+]
+WHITESPACE_PATTERN = re.compile(r'\s+')
+DOUBLE_COMMA_PATTERN = re.compile(r',\s*,')
+DOUBLE_PERIOD_PATTERN = re.compile(r'\.\s*\.')
+COUNTRY_PATTERN = re.compile(r',\s*USA$')
+
+def _abbreviate(match):
+    return ADDRESS_ABBREVIATIONS[match.group(1)]
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _standardize_address_text(address):
+    address = address.strip().upper()
+    
+    # Standardize common abbreviations. Dropping a period can join two
+    # words, which changes what the later substitutions match, so addresses
+    # with periods take them one at a time.
+    if '.' in address:
+        for full_pattern, abbr_pattern, abbr in ABBREVIATION_STEPS:
+            address = full_pattern.sub(abbr, address)
+            address = abbr_pattern.sub(abbr, address)
+    else:
+        address = ABBREVIATION_PATTERN.sub(_abbreviate, address)
+    
+    # Remove extra spaces, commas, and periods
+    address = WHITESPACE_PATTERN.sub(' ', address)
+    address = DOUBLE_COMMA_PATTERN.sub(',', address)
+    address = DOUBLE_PERIOD_PATTERN.sub('.', address)
+    
+    # Remove USA at the end
+    address = COUNTRY_PATTERN.sub('', address)
+    
+    return address.strip()
 
 def standardize_address(address_str):
     """
     Standardize address format for better matching.
     
+    Results are memoized, since the same customer and stop addresses recur.
+    
     Args:
         address_str: Raw address string
         
@@ -26,40 +97,7 @@ def standardize_address(address_str):
     if pd.isna(address_str) or address_str == '':
         return ''
     
-    address = str(address_str).strip().upper()
-    
-    # Standardize common abbreviations
-    abbrev_map = {
-        'STREET': 'ST',
-        'AVENUE': 'AVE',
-        'BOULEVARD': 'BLVD',
-        'DRIVE': 'DR',
-        'LANE': 'LN',
-        'ROAD': 'RD',
-        'COURT': 'CT',
-        'CIRCLE': 'CIR',
-        'PLACE': 'PL',
-        'HIGHWAY': 'HWY',
-        'APARTMENT': 'APT',
-        'SUITE': 'STE',
-        'CALIFORNIA': 'CA'
-    }
-    
-    for full, abbr in abbrev_map.items():
-        # Replace full version with abbreviation
-        address = re.sub(r'\b' + full + r'\b', abbr, address)
-        # Replace abbreviation with period with standard abbreviation
-        address = re.sub(r'\b' + abbr + r'\.', abbr, address)
-    
-    # Remove extra spaces, commas, and periods
-    address = re.sub(r'\s+', ' ', address)
-    address = re.sub(r',\s*,', ',', address)
-    address = re.sub(r'\.\s*\.', '.', address)
-    
-    # Remove USA at the end
-    address = re.sub(r',\s*USA$', '', address)
-    
-    return address.strip()
+    return _standardize_address_text(str(address_str))
 
 def standardize_tech_code(tech_code):
     """
@@ -77,33 +115,10 @@ def standardize_tech_code(tech_code):
     # Convert to string, uppercase, and strip spaces
     tech = str(tech_code).strip().upper()
     
-    # Handle common variations
-    tech_variations = {
-        'ROBERT': 'RR',
-        'RICK': 'RR',
-        'RICARDO': 'RR',
-        'JAMES': 'JS',
-        'JIM': 'JS',
-        'JOSEPH': 'JD',
-        'JOEY': 'JD',
-        'DANIEL': 'DM',
-        'DANNY': 'DM',
-        'SHANE': 'SS',
-        'SHAWN': 'SF',
-        'SEAN': 'SF',
-        'BIANCA': 'BB',
-        'ADAM': 'AP',
-        'PORTER': 'AP'
-    }
-    
-    # Check if tech code matches any variation
-    if tech in tech_variations:
-        return tech_variations[tech]
-    
-    # If it's already a valid code, return it
-    valid_codes = set(TECH_REVERSE_MAPPING.keys()) | set(TECH_MAPPING.keys())
-    if tech in valid_codes:
-        return tech
+    # Resolve codes, device names and aliases through the identity table
+    tech_id = TECH_ALIAS_IDS.get(normalize_alias(tech))
+    if tech_id is not None:
+        return TECH_CODES[tech_id]
     
     # Otherwise, return as is
     return tech
@@ -144,24 +159,17 @@ def standardize_appliance_type(appliance_type):
     # If no match found, return the original
     return appliance
 
-def match_address_confidence(address1, address2):
+def standardized_address_confidence(std_addr1, std_addr2):
     """
-    Calculate confidence score for address matching.
+    Calculate confidence score for matching two standardized addresses.
     
     Args:
-        address1: First address string
-        address2: Second address string
+        std_addr1: First address, as returned by standardize_address()
+        std_addr2: Second address, as returned by standardize_address()
         
     Returns:
         Confidence score between 0-100
     """
-    if pd.isna(address1) or pd.isna(address2) or address1 == '' or address2 == '':
-        return 0
-    
-    # Standardize both addresses
-    std_addr1 = standardize_address(address1)
-    std_addr2 = standardize_address(address2)
-    
     # If they're identical after standardization, return 100
     if std_addr1 == std_addr2:
         return 100
@@ -171,12 +179,156 @@ def match_address_confidence(address1, address2):
     
     # For very short addresses, we need more confidence
     min_len = min(len(std_addr1), len(std_addr2))
-    if min_len < 10:
+    if min_len < SHORT_ADDRESS_LENGTH:
         # Adjust score down for very short addresses
-        ratio = ratio * 0.8
+        ratio = ratio * SHORT_ADDRESS_WEIGHT
     
     return ratio
 
+def match_address_confidence(address1, address2):
+    """
+    Calculate confidence score for address matching.
+    
+    Args:
+        address1: First address string
+        address2: Second address string
+        
+    Returns:
+        Confidence score between 0-100
+    """
+    if pd.isna(address1) or pd.isna(address2) or address1 == '' or address2 == '':
+        return 0
+    
+    # Standardize both addresses
+    return standardized_address_confidence(standardize_address(address1), standardize_address(address2))
+
+def token_sort_key(address):
+    """
+    Precompute the token-sorted form that fuzz.token_sort_ratio compares.
+    
+    Args:
+        address: Standardized address string
+        
+    Returns:
+        Lowercase alphanumeric tokens of the address, sorted and space-joined
+    """
+    return ' '.join(sorted(fuzz_utils.full_process(address, force_ascii=True).split())).strip()
+
+def _ratio_scores(sorted1, sorted2, pairwise, cutoff, workers):
+    """Rounded fuzz.ratio of token-sorted addresses; pairs below cutoff score 0."""
+    if RAPIDFUZZ_AVAILABLE:
+        # Same ratio as fuzzywuzzy's Levenshtein backend, computed in C; the
+        # cutoff lets it skip pairs whose lengths already rule them out
+        score = rapid_process.cpdist if pairwise else rapid_process.cdist
+        raw = score(sorted1, sorted2, scorer=rapid_fuzz.ratio, dtype=np.float64,
+                    score_cutoff=cutoff, workers=workers)
+        return np.rint(raw)
+    
+    # The ratio is at most 200 * shorter / (sum of lengths), so only pairs
+    # whose lengths allow the cutoff are compared
+    len1 = np.array([len(s) for s in sorted1])
+    len2 = np.array([len(s) for s in sorted2])
+    if not pairwise:
+        len1, len2 = len1[:, None], len2[None, :]
+    total = len1 + len2
+    bound = np.where(total > 0, 200 * np.minimum(len1, len2) / np.maximum(total, 1), 100)
+    
+    scores = np.zeros(bound.shape)
+    for index in zip(*np.nonzero(bound >= cutoff)):
+        scores[index] = fuzz.ratio(sorted1[index[0]], sorted2[index[-1]])
+    return scores
+
+def _address_scores(addresses1, addresses2, pairwise, threshold, workers):
+    """Scores of standardized addresses, as standardized_address_confidence()."""
+    addresses1 = np.asarray(addresses1, dtype=object)
+    addresses2 = np.asarray(addresses2, dtype=object)
+    
+    # Score each distinct address's token-sorted form once
+    codes, uniques = pd.factorize(np.concatenate([addresses1, addresses2]))
+    sorted_uniques = np.array([token_sort_key(address) for address in uniques], dtype=object)
+    lengths = np.array([len(address) for address in uniques])
+    codes1, codes2 = codes[:len(addresses1)], codes[len(addresses1):]
+    
+    # A pruned pair scores 0; one point of slack keeps rounding from pushing
+    # a pruned pair over the threshold
+    cutoff = max(threshold - 1, 0) if threshold is not None else 0
+    raw = _ratio_scores(sorted_uniques[codes1], sorted_uniques[codes2], pairwise, cutoff, workers)
+    
+    if pairwise:
+        min_len = np.minimum(lengths[codes1], lengths[codes2])
+        identical = codes1 == codes2
+    else:
+        min_len = np.minimum.outer(lengths[codes1], lengths[codes2])
+        identical = np.equal.outer(codes1, codes2)
+    
+    # Down-weight short addresses; identical addresses always score 100
+    scores = np.where(min_len < SHORT_ADDRESS_LENGTH, raw * SHORT_ADDRESS_WEIGHT, raw)
+    scores[identical] = 100
+    return scores
+
+def address_pair_scores(addresses1, addresses2, threshold=None, workers=ADDRESS_SCORE_WORKERS):
+    """
+    Score pairs of standardized addresses in one batch.
+    
+    Gives the same score as standardized_address_confidence() on each pair.
+    With a threshold, pairs that cannot reach it are pruned before any
+    edit-distance work and score 0.
+    
+    Args:
+        addresses1: Sequence of standardized addresses
+        addresses2: Sequence of standardized addresses, same length
+        threshold: Lowest confidence of interest, 0-100 (None scores every pair)
+        workers: Threads for the edit-distance work (-1 for all cores)
+        
+    Returns:
+        Array of confidence scores, one per pair
+    """
+    if len(addresses1) != len(addresses2):
+        raise ValueError("Address sequences must have the same length")
+    return _address_scores(addresses1, addresses2, True, threshold, workers)
+
+def address_score_matrix(addresses1, addresses2, threshold=None, workers=ADDRESS_SCORE_WORKERS):
+    """
+    Score every pair of two sets of standardized addresses.
+    
+    Args:
+        addresses1: Sequence of standardized addresses (rows)
+        addresses2: Sequence of standardized addresses (columns)
+        threshold: Lowest confidence of interest, 0-100 (None scores every pair)
+        workers: Threads for the edit-distance work (-1 for all cores)
+        
+    Returns:
+        Array of confidence scores with one row per address in addresses1;
+        with a threshold, pairs that cannot reach it score 0
+    """
+    return _address_scores(addresses1, addresses2, False, threshold, workers)
+
+def top_address_matches(addresses1, addresses2, k=1, threshold=GPS_MATCH_THRESHOLD * 100,
+                        workers=ADDRESS_SCORE_WORKERS):
+    """
+    Find the best matching addresses of addresses2 for each address of addresses1.
+    
+    Args:
+        addresses1: Sequence of standardized addresses to match
+        addresses2: Sequence of standardized candidate addresses
+        k: Number of matches per address
+        threshold: Lowest confidence that counts as a match, 0-100
+        workers: Threads for the edit-distance work (-1 for all cores)
+        
+    Returns:
+        Tuple of (indices into addresses2, confidence scores), each with one
+        row per address in addresses1 and k columns, best first (earlier
+        candidates first on ties); -1 and 0 where there is no match
+    """
+    scores = address_score_matrix(addresses1, addresses2, threshold, workers)
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    best = np.take_along_axis(scores, order, axis=1)
+    
+    no_match = (best <= 0) | (best < threshold)
+    order[no_match] = -1
+    best[no_match] = 0
+    return order, best
+
 def extract_zip_code(address):
     """
     Extract zip code from address string.
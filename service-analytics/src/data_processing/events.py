@@ -0,0 +1,259 @@
+"""
+Structured event log of Type6 job histories.
+
+A Type6 WorkDescription is a log of timestamped entries, one per line:
+"1/2/25 8:47: Job created by AJ, ..." for entries the system writes and
+"1/2/25 8:49 AJ: ..." for entries staff write. The event log splits every
+job's description into (InvoiceKey, Seq, Timestamp, Actor, Action, Text)
+rows, with categorical actors and actions, and is updated as exports are
+ingested: only jobs whose description is new or changed are parsed again.
+Jobs are keyed by the same InvoiceKey as the invoice index and the revenue
+join. Lifecycle timing and CSR analysis read this table instead of the raw
+descriptions.
+"""
+
+import os
+import sys
+import re
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import PROCESSED_DIR
+from src.data_processing.cache import PROJECT_ROOT, read_cached, write_cached
+from src.data_processing.schemas import INVOICE_KEY
+
+# Bump the version whenever parsing changes so the log is rebuilt
+EVENT_LOG_VERSION = 2
+EVENT_LOG_KEY = f'event_log_v{EVENT_LOG_VERSION}'
+EVENT_JOBS_KEY = f'event_log_jobs_v{EVENT_LOG_VERSION}'
+EVENT_LOG_DIR = os.path.join(PROJECT_ROOT, PROCESSED_DIR)
+
+# One log entry: timestamp, optional actor code, text up to the next entry
+ENTRY_PATTERN = re.compile(
+    r'^"?(?P<Date>\d{1,2}/\d{1,2}/\d{2}) (?P<Time>\d{1,2}:\d{2})(?: (?P<Actor>\w+))?: '
+    r'(?P<Text>.*?)"?\s*(?=^"?\d{1,2}/\d{1,2}/\d{2} \d{1,2}:\d{2}|\Z)',
+    re.MULTILINE | re.DOTALL
+)
+ENTRY_TIMESTAMP_FORMAT = '%m/%d/%y %H:%M'
+
+# Event actions, recognized by how the entry text starts (first match wins)
+CREATED = 'CREATED'
+SCHEDULED = 'SCHEDULED'
+RESCHEDULED = 'RESCHEDULED'
+APPOINTMENT_CANCELED = 'APPOINTMENT_CANCELED'
+CONFIRMED = 'CONFIRMED'
+DISPATCHED = 'DISPATCHED'
+ARRIVED = 'ARRIVED'
+VISIT = 'VISIT'
+PAYMENT = 'PAYMENT'
+REFUND = 'REFUND'
+RECORDED = 'RECORDED'
+INVOICED = 'INVOICED'
+PAID = 'PAID'
+CANCELED = 'CANCELED'
+PARTS = 'PARTS'
+TRIAGED = 'TRIAGED'
+NOTE = 'NOTE'
+
+ACTION_PATTERNS = {
+    CREATED: r'job created by',
+    SCHEDULED: r'schdld for|wp sched',
+    RESCHEDULED: r'chngd appmnt',
+    APPOINTMENT_CANCELED: r'appmnt cncld',
+    CONFIRMED: r'appmnt cnfrmd|sms to cnfm|robo-call to cnfm',
+    DISPATCHED: r'dsptchd to',
+    ARRIVED: r'tech arrived',
+    VISIT: r'\w+ there \d',
+    PAYMENT: r'rcvd \$|cllctd \$',
+    REFUND: r'rfndd',
+    RECORDED: r'rcrdd|manually marked as recorded',
+    INVOICED: r'emailed invoice',
+    PAID: r'job fully paid',
+    CANCELED: r'job canceled',
+    PARTS: r'chc?kd in|cstmr declined a |spcltvly tagged',
+    TRIAGED: r'chc?kd-off triage'
+}
+ACTIONS = list(ACTION_PATTERNS) + [NOTE]
+
+_ACTION_PATTERN = re.compile(
+    '^(?:' + '|'.join(f'(?P<{action}>{pattern})' for action, pattern in ACTION_PATTERNS.items()) + ')',
+    re.IGNORECASE
+)
+
+# Actor named in the text of system entries (the job's creator, the visiting tech)
+_TEXT_ACTOR_PATTERN = re.compile(r'^(?:job created by (\w+)|(\w+) there \d)', re.IGNORECASE)
+
+def _empty_events():
+    return pd.DataFrame({
+        INVOICE_KEY: pd.array([], dtype='Int64'), 'Seq': np.array([], dtype='int16'),
+        'Timestamp': np.array([], dtype='datetime64[ns]'),
+        'Actor': pd.Categorical([]), 'Action': pd.Categorical([], categories=ACTIONS),
+        'Text': np.array([], dtype=object)
+    })
+
+def parse_event_log(invoices, descriptions):
+    """
+    Split job descriptions into their log entries.
+
+    Args:
+        invoices: Series of invoice keys (see parsers.parse_invoice_keys()),
+            one per job
+        descriptions: Series of WorkDescription texts aligned with invoices
+
+    Returns:
+        DataFrame with InvoiceKey, Seq (entry number within the job),
+        Timestamp (local time), Actor (code, upper case) and Action
+        (categorical) and Text columns, in job and entry order
+    """
+    entries = pd.Series(descriptions.to_numpy(dtype=object)).str.extractall(ENTRY_PATTERN)
+    if entries.empty:
+        return _empty_events()
+
+    rows = entries.index.get_level_values(0).to_numpy()
+    text = entries['Text']
+
+    # Action from how the text starts; NOTE when nothing matches
+    matched = text.str.extract(_ACTION_PATTERN).notna().to_numpy()
+    actions = np.where(matched.any(axis=1), matched.argmax(axis=1), len(ACTIONS) - 1)
+
+    # Entries without an actor code take the one their text names
+    named = text.str.extract(_TEXT_ACTOR_PATTERN).bfill(axis=1)[0]
+    actors = entries['Actor'].fillna(named).str.upper()
+
+    events = pd.DataFrame({
+        INVOICE_KEY: pd.array(invoices.to_numpy()[rows], dtype='Int64'),
+        'Seq': entries.index.get_level_values(1).to_numpy(dtype='int16'),
+        'Timestamp': pd.to_datetime(entries['Date'] + ' ' + entries['Time'],
+                                    format=ENTRY_TIMESTAMP_FORMAT, errors='coerce').to_numpy(),
+        'Actor': pd.Categorical(actors.to_numpy()),
+        'Action': pd.Categorical.from_codes(actions, categories=ACTIONS),
+        'Text': text.to_numpy(dtype=object)
+    })
+    return events
+
+def load_event_log():
+    """
+    Load the event log.
+
+    Returns:
+        DataFrame from parse_event_log() of every job ingested so far
+        (empty if nothing was logged)
+    """
+    events = read_cached(EVENT_LOG_KEY, EVENT_LOG_DIR)
+    return _empty_events() if events is None else events
+
+def update_event_log(family, df, replace_changed=True):
+    """
+    Parse the histories of new or changed jobs into the event log.
+
+    Jobs are fingerprinted by their description's content hash; only jobs
+    the log does not hold, or holds with a different description, are
+    parsed, and their previous events are replaced.
+
+    Args:
+        family: Family of the loaded rows (only 'type6' is logged)
+        df: DataFrame loaded for the family
+        replace_changed: Re-parse jobs whose description changed (False only
+            adds new jobs, for exports older than what was ingested)
+
+    Returns:
+        Number of jobs parsed
+    """
+    if family != 'type6' or df is None or df.empty or not {INVOICE_KEY, 'WorkDescription'}.issubset(df.columns):
+        return 0
+
+    jobs = pd.DataFrame({
+        INVOICE_KEY: df[INVOICE_KEY].to_numpy(),
+        'Hash': pd.util.hash_pandas_object(df['WorkDescription'].astype(object), index=False).to_numpy(),
+        'Row': np.arange(len(df))
+    }).dropna(subset=[INVOICE_KEY]).drop_duplicates(INVOICE_KEY, keep='last')
+    jobs[INVOICE_KEY] = jobs[INVOICE_KEY].astype('int64')
+
+    known = read_cached(EVENT_JOBS_KEY, EVENT_LOG_DIR)
+    if known is None:
+        known = pd.DataFrame({INVOICE_KEY: np.array([], dtype='int64'), 'Hash': np.array([], dtype='uint64')})
+
+    position = pd.Index(known[INVOICE_KEY]).get_indexer(jobs[INVOICE_KEY])
+    found = position >= 0
+    changed = np.zeros(len(jobs), dtype=bool)
+    changed[found] = known['Hash'].to_numpy()[position[found]] != jobs['Hash'].to_numpy()[found]
+    fresh = jobs[~found | (changed & replace_changed)]
+    if fresh.empty:
+        return 0
+
+    rows = fresh['Row'].to_numpy()
+    parsed = parse_event_log(fresh[INVOICE_KEY], df['WorkDescription'].iloc[rows])
+
+    # Fresh jobs' events replace any they had
+    events = load_event_log()
+    events = events[~events[INVOICE_KEY].isin(fresh[INVOICE_KEY]).to_numpy()]
+    events = pd.concat([events, parsed], ignore_index=True)
+    events['Actor'] = events['Actor'].astype(object).astype('category')
+    events['Action'] = pd.Categorical(events['Action'].astype(object), categories=ACTIONS)
+    events = events.sort_values([INVOICE_KEY, 'Seq'], kind='stable').reset_index(drop=True)
+
+    known = pd.concat([known[~known[INVOICE_KEY].isin(fresh[INVOICE_KEY])], fresh[[INVOICE_KEY, 'Hash']]],
+                      ignore_index=True)
+    if not events.empty and not write_cached(EVENT_LOG_KEY, events, EVENT_LOG_DIR, max_mb=None):
+        return 0
+    write_cached(EVENT_JOBS_KEY, known, EVENT_LOG_DIR, max_mb=None)
+
+    print(f"Event log: parsed {len(fresh)} job histories into {len(parsed)} events")
+    return len(fresh)
+
+# First time of each lifecycle action, by output column
+LIFECYCLE_ACTIONS = {
+    'CreatedAt': CREATED,
+    'ScheduledAt': SCHEDULED,
+    'DispatchedAt': DISPATCHED,
+    'FirstVisitAt': VISIT,
+    'CanceledAt': CANCELED,
+    'PaidAt': PAID
+}
+
+def job_lifecycle(events):
+    """
+    Summarize each job's lifecycle from its events.
+
+    Args:
+        events: DataFrame from load_event_log()
+
+    Returns:
+        DataFrame indexed by InvoiceKey with the LIFECYCLE_ACTIONS times,
+        CreatedBy (the actor who created the job), Reschedules and Events
+        counts, and HoursToDispatch and DaysToFirstVisit from creation
+    """
+    first = events.groupby([INVOICE_KEY, 'Action'], observed=True)['Timestamp'].min().unstack()
+    lifecycle = pd.DataFrame(index=pd.Index(events[INVOICE_KEY].unique().dropna(), name=INVOICE_KEY))
+    for column, action in LIFECYCLE_ACTIONS.items():
+        lifecycle[column] = first[action] if action in first.columns else pd.Series(
+            np.datetime64('NaT'), index=lifecycle.index, dtype='datetime64[ns]'
+        )
+
+    created = events[(events['Action'] == CREATED).to_numpy()].drop_duplicates(INVOICE_KEY)
+    lifecycle['CreatedBy'] = created.set_index(INVOICE_KEY)['Actor'].astype(object)
+    lifecycle['Reschedules'] = (events['Action'] == RESCHEDULED).groupby(events[INVOICE_KEY]).sum() \
+        .reindex(lifecycle.index, fill_value=0).astype('int64')
+    lifecycle['Events'] = events.groupby(INVOICE_KEY).size().reindex(lifecycle.index, fill_value=0)
+    lifecycle['HoursToDispatch'] = (lifecycle['DispatchedAt'] - lifecycle['CreatedAt']) / pd.Timedelta(hours=1)
+    lifecycle['DaysToFirstVisit'] = (lifecycle['FirstVisitAt'] - lifecycle['CreatedAt']) / pd.Timedelta(days=1)
+    return lifecycle
+
+def lifecycle_columns(jobs_df, events=None):
+    """
+    Look up each job's lifecycle by invoice key.
+
+    Args:
+        jobs_df: DataFrame with an InvoiceKey column
+        events: DataFrame from load_event_log() (loaded if None)
+
+    Returns:
+        DataFrame on the job index with the job_lifecycle() columns
+        (missing for jobs not in the log)
+    """
+    lifecycle = job_lifecycle(load_event_log() if events is None else events)
+    lifecycle.index = lifecycle.index.astype('float64')
+    keys = jobs_df[INVOICE_KEY].to_numpy(dtype='float64', na_value=np.nan)
+    return lifecycle.reindex(keys).set_axis(jobs_df.index)
@@ -0,0 +1,245 @@
+"""
+Offline geocode gazetteer built from GPS history.
+
+Every GPS row pairs a reverse-geocoded address with the position it was
+recorded at. The gazetteer keeps the distinct positions seen for each street
+address (canonical street line plus ZIP code), so job addresses can be
+geocoded to the centroid of those positions without a network geocoder.
+Exports are absorbed once each, by content hash, as new files arrive.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import PROCESSED_DIR
+from src.data_processing.cache import PROJECT_ROOT, read_cached, write_cached, load_state, save_state
+from src.data_processing.addresses import address_keys, canonical_address, MISSING_ADDRESS
+from src.data_processing.importers import load_gps_tracking, GPS_LOADER_VERSION
+from src.data_processing.orchestrator import run_loads
+from src.data_processing.parsers import parse_coordinates
+from src.data_processing.schemas import GPS_COORDINATE_COLUMNS
+
+try:
+    from sklearn.neighbors import BallTree
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+GAZETTEER_KEY = 'gazetteer'
+GAZETTEER_DIR = os.path.join(PROJECT_ROOT, PROCESSED_DIR)
+
+# A new version rebuilds the gazetteer from every GPS export
+GAZETTEER_VERSION = 1
+
+# Mean earth radius, for converting haversine distances to meters
+EARTH_RADIUS_M = 6371008.8
+
+# ZIP code at the end of an address or a 'CITY ST ZIP' field
+ZIP_PATTERN = r'(\d{5})(?:-\d{4})?(?:\s*,\s*USA)?\s*$'
+
+# Positions are kept to about a meter
+COORDINATE_DECIMALS = 5
+
+# In-process memo of the centroid table: (file mtime, DataFrame)
+_centroids = None
+
+def street_keys(addresses, zips=None):
+    """
+    Reduce addresses to the canonical street line and ZIP code they name.
+
+    Args:
+        addresses: Series or array of raw addresses
+        zips: Series or array of text ending in the ZIP code, such as a
+            'CITY ST ZIP' field (None to take it from the addresses)
+
+    Returns:
+        DataFrame with Street and Zip columns ('' when missing); Street is
+        empty for addresses without a house number, which name no single place
+    """
+    keys = address_keys(addresses)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    lines = np.array([
+        canonical_address(key).split(',')[0].strip() if key != MISSING_ADDRESS else ''
+        for key in unique_keys
+    ], dtype=object)
+    streets = pd.Series(lines[inverse], dtype=object)
+    streets[~streets.str.match(r'\d')] = ''
+
+    zip_source = addresses if zips is None else zips
+    zip_codes = pd.Series(zip_source, dtype=object).astype(str).str.extract(ZIP_PATTERN)[0]
+    return pd.DataFrame({'Street': streets, 'Zip': zip_codes.fillna('').to_numpy()})
+
+def gps_positions(df, family):
+    """
+    Extract the distinct address positions recorded in one GPS export.
+
+    Args:
+        df: DataFrame loaded by load_gps_tracking()
+        family: GPS file type, a key of GPS_COORDINATE_COLUMNS
+
+    Returns:
+        DataFrame with Street, Zip, Latitude and Longitude columns
+    """
+    column = GPS_COORDINATE_COLUMNS.get(family)
+    if df is None or df.empty or column not in df.columns or 'Address' not in df.columns:
+        return pd.DataFrame(columns=['Street', 'Zip', 'Latitude', 'Longitude'])
+
+    latitude, longitude = parse_coordinates(df[column])
+    positions = street_keys(df['Address'].to_numpy())
+    positions['Latitude'] = latitude.round(COORDINATE_DECIMALS)
+    positions['Longitude'] = longitude.round(COORDINATE_DECIMALS)
+
+    located = (positions['Street'] != '') & positions['Latitude'].notna() & positions['Longitude'].notna()
+    return positions[located].drop_duplicates().reset_index(drop=True)
+
+def update_gazetteer(catalog):
+    """
+    Add the positions of GPS exports not absorbed yet to the gazetteer.
+
+    Args:
+        catalog: DataFrame from catalog.scan_catalog()
+
+    Returns:
+        Number of new distinct positions added
+    """
+    state = load_state(GAZETTEER_KEY, {})
+    version = [GAZETTEER_VERSION, GPS_LOADER_VERSION]
+    if state.get('Version') != version:
+        state = {'Version': version, 'Files': {}}
+        table = None
+    else:
+        table = read_cached(GAZETTEER_KEY, GAZETTEER_DIR)
+
+    files = catalog[catalog['Family'].isin(list(GPS_COORDINATE_COLUMNS))
+                    & ~catalog['Fingerprint'].isin(state['Files'])].drop_duplicates('Fingerprint')
+    if files.empty:
+        return 0
+
+    tasks = {
+        entry['Path']: (load_gps_tracking, (entry['Path'], entry['Family']), {})
+        for _, entry in files.iterrows()
+    }
+    loaded, _ = run_loads(tasks)
+
+    frames = [] if table is None else [table]
+    for _, entry in files.iterrows():
+        frames.append(gps_positions(loaded[entry['Path']], entry['Family']))
+    merged = pd.concat(frames, ignore_index=True).drop_duplicates().reset_index(drop=True)
+    added = len(merged) - (0 if table is None else len(table))
+
+    if not merged.empty and not write_cached(GAZETTEER_KEY, merged, GAZETTEER_DIR, max_mb=None):
+        return 0
+
+    for _, entry in files.iterrows():
+        state['Files'][entry['Fingerprint']] = {'Path': entry['Path'], 'Rows': len(loaded[entry['Path']])}
+    save_state(GAZETTEER_KEY, state)
+
+    print(f"Gazetteer: {added} new positions from {len(files)} GPS exports, {len(merged)} in total")
+    return added
+
+def load_gazetteer():
+    """
+    Load the geocode of each street address in the gazetteer.
+
+    Returns:
+        DataFrame with Street, Zip, Latitude, Longitude (centroid of the
+        positions seen) and Positions columns, or None if nothing has been
+        absorbed yet
+    """
+    global _centroids
+    path = os.path.join(GAZETTEER_DIR, GAZETTEER_KEY + '.parquet')
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.stat(path).st_mtime_ns
+    if _centroids is not None and _centroids[0] == mtime:
+        return _centroids[1]
+
+    table = read_cached(GAZETTEER_KEY, GAZETTEER_DIR)
+    if table is None or table.empty:
+        return None
+
+    centroids = table.groupby(['Street', 'Zip'], sort=True).agg(
+        Latitude=('Latitude', 'mean'),
+        Longitude=('Longitude', 'mean'),
+        Positions=('Latitude', 'size')
+    ).reset_index()
+    _centroids = (mtime, centroids)
+    return centroids
+
+def geocode_addresses(addresses, zips=None, gazetteer=None):
+    """
+    Geocode addresses through the gazetteer.
+
+    An address is looked up by street and ZIP code; if that misses, a street
+    known under a single ZIP code is taken on the street alone.
+
+    Args:
+        addresses: Series or array of raw addresses
+        zips: Series or array of text ending in the ZIP code (None to take it
+            from the addresses)
+        gazetteer: Table from load_gazetteer() (None to load it)
+
+    Returns:
+        Tuple of float64 arrays (latitude, longitude); NaN where unknown
+    """
+    gazetteer = load_gazetteer() if gazetteer is None else gazetteer
+    keys = street_keys(addresses, zips)
+    latitude = np.full(len(keys), np.nan)
+    longitude = np.full(len(keys), np.nan)
+    if gazetteer is None or gazetteer.empty:
+        return latitude, longitude
+
+    exact = pd.MultiIndex.from_frame(gazetteer[['Street', 'Zip']]).get_indexer(
+        pd.MultiIndex.from_frame(keys[['Street', 'Zip']])
+    )
+    unique_streets = gazetteer[~gazetteer['Street'].duplicated(keep=False)]
+    by_street = pd.Index(unique_streets['Street']).get_indexer(keys['Street'])
+    by_street = np.where(by_street >= 0, unique_streets.index.to_numpy()[by_street], -1)
+
+    position = np.where(exact >= 0, exact, by_street)
+    position[keys['Street'].to_numpy() == ''] = -1
+    found = position >= 0
+    latitude[found] = gazetteer['Latitude'].to_numpy()[position[found]]
+    longitude[found] = gazetteer['Longitude'].to_numpy()[position[found]]
+    return latitude, longitude
+
+def points_within(latitude, longitude, query_latitude, query_longitude, radius_m):
+    """
+    Find the points within a radius of each query position.
+
+    The points are indexed once in a haversine BallTree, so each query costs
+    O(log n) rather than a pass over every point. Points and queries with a
+    missing coordinate are left out.
+
+    Args:
+        latitude: Array of point latitudes in degrees
+        longitude: Array of point longitudes in degrees
+        query_latitude: Array of query latitudes in degrees
+        query_longitude: Array of query longitudes in degrees
+        radius_m: Search radius in meters
+
+    Returns:
+        Tuple of arrays (query positions, point positions, distances in
+        meters), one entry per point found near a query
+    """
+    points = np.flatnonzero(~np.isnan(latitude) & ~np.isnan(longitude))
+    queries = np.flatnonzero(~np.isnan(query_latitude) & ~np.isnan(query_longitude))
+    if not SKLEARN_AVAILABLE or len(points) == 0 or len(queries) == 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp), np.array([])
+
+    tree = BallTree(np.radians(np.column_stack([latitude[points], longitude[points]])), metric='haversine')
+    found, distances = tree.query_radius(
+        np.radians(np.column_stack([query_latitude[queries], query_longitude[queries]])),
+        r=radius_m / EARTH_RADIUS_M, return_distance=True
+    )
+
+    counts = np.array([len(points_found) for points_found in found])
+    if counts.sum() == 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp), np.array([])
+    return (np.repeat(queries, counts), points[np.concatenate(found)],
+            np.concatenate(distances) * EARTH_RADIUS_M)
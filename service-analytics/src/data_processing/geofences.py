@@ -0,0 +1,269 @@
+"""
+Geofences around known locations and customer addresses.
+
+The shop and technician homes in config.mapping.KNOWN_LOCATIONS, and every
+customer address the gazetteer can place, become circular fences. GPS stops
+and idle events are tagged by the fence they fall in (SHOP, HOME:<tech>,
+CUSTOMER, or OTHER when none) in one radius join over the distinct positions
+of all the exports, so time can be split by location class without comparing
+addresses row by row. Tags are cached by position and fence table, so a
+refresh only joins the positions it has not seen with the same fences.
+"""
+
+import os
+import sys
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.mapping import KNOWN_LOCATIONS
+from config.settings import GEOFENCE_RADIUS_M, GPS_MATCH_RADIUS_M
+from src.data_processing.cache import read_cached, write_cached
+from src.data_processing.gazetteer import geocode_addresses, points_within
+from src.data_processing.parsers import parse_coordinates
+from src.data_processing.schemas import GPS_COORDINATE_COLUMNS
+
+# Location tags and classes
+SHOP = 'SHOP'
+HOME = 'HOME'
+CUSTOMER = 'CUSTOMER'
+OTHER = 'OTHER'
+
+# Column holding the location tag of a GPS row
+LOCATION_TAG = 'LocationTag'
+
+# GPS exports whose rows are tagged
+GEOFENCE_FAMILIES = ['drives_stops', 'day_start_end', 'idle_time']
+
+# Cache of location tags by coordinate string; bump the version whenever
+# tagging changes
+LOCATION_TAGS_VERSION = 1
+
+def known_location_tag(name):
+    """
+    Tag of a KNOWN_LOCATIONS entry: <TECH>_HOME becomes HOME:<TECH>, other
+    names are used as they are.
+
+    Args:
+        name: KNOWN_LOCATIONS key
+
+    Returns:
+        Location tag string
+    """
+    name = name.strip().upper()
+    if name.endswith('_' + HOME):
+        return f"{HOME}:{name[:-len(HOME) - 1]}"
+    return name
+
+def location_classes(tags):
+    """
+    Reduce location tags to their class (HOME:JS becomes HOME).
+
+    Args:
+        tags: Series or array of location tags
+
+    Returns:
+        Categorical of location classes (missing where the tag is)
+    """
+    tags = pd.Categorical(tags)
+    classes = pd.Series(tags.categories, dtype=object).str.split(':').str[0]
+    categories = list(dict.fromkeys(classes))
+    codes = np.full(len(tags), -1, dtype=np.int16)
+    found = tags.codes >= 0
+    codes[found] = pd.Index(categories).get_indexer(classes.to_numpy()[tags.codes[found]])
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def load_known_locations(locations=KNOWN_LOCATIONS, gazetteer=None):
+    """
+    Place the known locations.
+
+    Args:
+        locations: Dictionary shaped like config.mapping.KNOWN_LOCATIONS
+        gazetteer: Table from gazetteer.load_gazetteer() for entries without
+            coordinates (None to load it)
+
+    Returns:
+        DataFrame with Tag, Latitude, Longitude and RadiusM columns, in the
+        order of the entries; entries that cannot be placed are left out
+    """
+    rows = []
+    for name, entry in locations.items():
+        if isinstance(entry, str):
+            entry = {'address': entry}
+
+        coordinates = entry.get('coordinates')
+        if coordinates is None and entry.get('address'):
+            latitude, longitude = geocode_addresses([entry['address']], gazetteer=gazetteer)
+            coordinates = (latitude[0], longitude[0])
+        if coordinates is None or np.isnan(np.asarray(coordinates, dtype=float)).any():
+            print(f"Known location {name} could not be placed; add its coordinates to KNOWN_LOCATIONS")
+            continue
+
+        rows.append({
+            'Tag': known_location_tag(name),
+            'Latitude': float(coordinates[0]),
+            'Longitude': float(coordinates[1]),
+            'RadiusM': float(entry.get('radius_m', GEOFENCE_RADIUS_M))
+        })
+    return pd.DataFrame(rows, columns=['Tag', 'Latitude', 'Longitude', 'RadiusM'])
+
+def build_geofences(jobs_df=None, gazetteer=None, locations=KNOWN_LOCATIONS,
+                    customer_radius_m=GPS_MATCH_RADIUS_M):
+    """
+    Build the geofence table of the known locations and customer addresses.
+
+    Args:
+        jobs_df: DataFrame of Type6 jobs with Address (and CityStateZip)
+            columns whose addresses are customer fences (None for none)
+        gazetteer: Table from gazetteer.load_gazetteer() (None to load it)
+        locations: Dictionary shaped like config.mapping.KNOWN_LOCATIONS
+        customer_radius_m: Radius of a customer fence in meters
+
+    Returns:
+        DataFrame with Tag, Latitude, Longitude, RadiusM and Priority columns;
+        a position inside several fences takes the lowest Priority, so known
+        locations win over customers
+    """
+    known = load_known_locations(locations, gazetteer)
+    known['Priority'] = np.arange(len(known))
+
+    customers = pd.DataFrame(columns=['Latitude', 'Longitude'])
+    if jobs_df is not None and not jobs_df.empty and 'Address' in jobs_df.columns:
+        columns = [col for col in ['Address', 'CityStateZip'] if col in jobs_df.columns]
+        addresses = jobs_df[columns].astype(object).drop_duplicates()
+        latitude, longitude = geocode_addresses(
+            addresses['Address'].to_numpy(),
+            addresses['CityStateZip'].to_numpy() if 'CityStateZip' in columns else None,
+            gazetteer
+        )
+        customers = pd.DataFrame({'Latitude': latitude, 'Longitude': longitude}).dropna().drop_duplicates()
+
+    customers = customers.assign(Tag=CUSTOMER, RadiusM=float(customer_radius_m), Priority=len(known))
+    fences = pd.concat([known, customers[known.columns]], ignore_index=True)
+    return fences.astype({'Latitude': float, 'Longitude': float, 'RadiusM': float, 'Priority': int})
+
+def location_tag_categories(geofences):
+    """Tags a geofence table can give, in priority order."""
+    return list(dict.fromkeys(list(geofences['Tag']) + [CUSTOMER, OTHER]))
+
+def tag_positions(geofences, latitude, longitude):
+    """
+    Tag positions by the geofence they fall in.
+
+    Args:
+        geofences: Table from build_geofences()
+        latitude: Array of latitudes in degrees
+        longitude: Array of longitudes in degrees
+
+    Returns:
+        Categorical of location tags: the tag of the highest-priority (then
+        nearest) fence containing each position, OTHER outside every fence,
+        and missing where the position is
+    """
+    categories = location_tag_categories(geofences)
+    codes = np.full(len(latitude), categories.index(OTHER), dtype=np.int16)
+    codes[np.isnan(latitude) | np.isnan(longitude)] = -1
+
+    if not geofences.empty:
+        radius = geofences['RadiusM'].to_numpy()
+        queries, fences, distances = points_within(
+            geofences['Latitude'].to_numpy(), geofences['Longitude'].to_numpy(),
+            latitude, longitude, radius.max()
+        )
+        inside = distances <= radius[fences]
+        queries, fences, distances = queries[inside], fences[inside], distances[inside]
+
+        # Best fence of each position first
+        order = np.lexsort((distances, geofences['Priority'].to_numpy()[fences], queries))
+        first = order[np.concatenate([[True], queries[order][1:] != queries[order][:-1]])[:len(order)]]
+        fence_codes = pd.Index(categories).get_indexer(geofences['Tag'].to_numpy())
+        codes[queries[first]] = fence_codes[fences[first]]
+
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def location_tags_key(geofences):
+    """Cache key of the location tags given by a geofence table."""
+    digest = hashlib.blake2b(
+        pd.util.hash_pandas_object(geofences, index=False).to_numpy().tobytes(), digest_size=8
+    ).hexdigest()
+    return f'location_tags_v{LOCATION_TAGS_VERSION}-{digest}'
+
+def tag_coordinates(geofences, coordinates, use_cache=True):
+    """
+    Tag GPS coordinate strings by the geofence they fall in.
+
+    Tags are cached by each string's content hash under the fence table's
+    key, so only strings not tagged with these fences before are parsed
+    and joined.
+
+    Args:
+        geofences: Table from build_geofences()
+        coordinates: Array of distinct coordinate strings
+        use_cache: Whether to use the persistent cache
+
+    Returns:
+        Categorical of location tags (see tag_positions())
+    """
+    categories = location_tag_categories(geofences)
+    coordinates = pd.Series(coordinates, dtype=object)
+    hashes = pd.util.hash_pandas_object(coordinates, index=False).to_numpy()
+    key = location_tags_key(geofences)
+    cached = read_cached(key) if use_cache else None
+    if cached is None:
+        cached = pd.DataFrame({'Hash': np.array([], dtype='uint64'), 'Tag': np.array([], dtype=object)})
+
+    # Join only the positions not tagged before
+    position = pd.Index(cached['Hash']).get_indexer(hashes)
+    new = np.flatnonzero(position < 0)
+    if len(new):
+        latitude, longitude = parse_coordinates(coordinates.iloc[new].reset_index(drop=True))
+        tags = tag_positions(geofences, latitude, longitude)
+        cached = pd.concat([cached, pd.DataFrame({'Hash': hashes[new], 'Tag': tags.astype(object)})],
+                           ignore_index=True)
+        if use_cache:
+            write_cached(key, cached)
+        position = pd.Index(cached['Hash']).get_indexer(hashes)
+
+    return pd.Categorical(cached['Tag'].to_numpy(dtype=object)[position], categories=categories)
+
+def tag_gps_frames(gps_data, geofences, use_cache=True):
+    """
+    Add the location tag of every stop and idle event to the GPS exports.
+
+    The distinct coordinate strings of all the tagged exports are tagged
+    once (see tag_coordinates()), and the tags spread back to the rows.
+
+    Args:
+        gps_data: Dictionary of GPS DataFrames by file type
+        geofences: Table from build_geofences()
+        use_cache: Whether to use the persistent tag cache
+
+    Returns:
+        Dictionary of the same DataFrames, with a categorical LocationTag
+        column on those in GEOFENCE_FAMILIES
+    """
+    families = [
+        family for family in GEOFENCE_FAMILIES
+        if gps_data.get(family) is not None and not gps_data[family].empty
+        and GPS_COORDINATE_COLUMNS[family] in gps_data[family].columns
+    ]
+    if not families:
+        return dict(gps_data)
+
+    values = [gps_data[family][GPS_COORDINATE_COLUMNS[family]].astype(object).to_numpy() for family in families]
+    codes, uniques = pd.factorize(np.concatenate(values))
+    unique_tags = tag_coordinates(geofences, uniques, use_cache)
+
+    tag_codes = np.full(len(codes), -1, dtype=np.int16)
+    found = codes >= 0
+    tag_codes[found] = unique_tags.codes[codes[found]]
+
+    tagged = dict(gps_data)
+    bounds = np.cumsum([0] + [len(value) for value in values])
+    for family, lo, hi in zip(families, bounds[:-1], bounds[1:]):
+        tagged[family] = gps_data[family].assign(**{
+            LOCATION_TAG: pd.Categorical.from_codes(tag_codes[lo:hi], categories=unique_tags.categories)
+        })
+    return tagged
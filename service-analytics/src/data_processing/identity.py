@@ -0,0 +1,166 @@
+"""
+Technician identity resolution.
+
+Technicians appear as ServiceDesk codes (Type6 TechCode, Sales Journal and
+TechRev Technician), as GPS device names, and by first name or nickname. The
+identity table built at import from config.mapping gives each technician a
+small integer id, and every alias a normalized spelling that resolves to it.
+Loaders store the id as an integer TechId column, so sources are joined and
+grouped on it directly; resolving raw values looks up each distinct value
+once (each category of a categorical column), not each row.
+"""
+
+import os
+import sys
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.mapping import TECH_MAPPING, STAFF_NO_GPS, TECH_ALIASES
+
+# Device name of technicians without a GPS device
+NO_DEVICE = 'UNKNOWN'
+
+def normalize_alias(value):
+    """
+    Normalize a technician code or name for lookup.
+
+    Args:
+        value: Raw code or name
+
+    Returns:
+        Upper-case string with whitespace collapsed ('' for missing values)
+    """
+    if pd.isna(value):
+        return ''
+    return ' '.join(str(value).split()).upper()
+
+def build_identity_table():
+    """
+    Build the technician identity table from config.mapping.
+
+    Technicians with a GPS device come first, in TECH_MAPPING order, then
+    staff without one. Each is known by its code, its device name and the
+    name without any parenthesized note ('Ricardo (NEW)' is also 'RICARDO'),
+    its staff name, and any TECH_ALIASES entry; an alias claimed twice keeps
+    its first owner.
+
+    Returns:
+        Tuple of (DataFrame with TechId, TechCode, Device and Name columns,
+        dict of normalized alias -> TechId)
+    """
+    rows = [(code, device, re.sub(r'\s*\(.*\)\s*', ' ', device).strip()) for device, code in TECH_MAPPING.items()]
+    rows += [(code, NO_DEVICE, name) for code, name in STAFF_NO_GPS.items() if code not in TECH_MAPPING.values()]
+    table = pd.DataFrame(rows, columns=['TechCode', 'Device', 'Name'])
+    table.insert(0, 'TechId', np.arange(len(table)))
+
+    aliases = {}
+    def claim(alias, tech_id):
+        alias = normalize_alias(alias)
+        owner = aliases.setdefault(alias, tech_id)
+        if alias and owner != tech_id:
+            print(f"Technician alias {alias} is claimed by {table['TechCode'][owner]} and "
+                  f"{table['TechCode'][tech_id]}; keeping {table['TechCode'][owner]}")
+
+    for tech_id, code, device, name in table.itertuples(index=False):
+        claim(code, tech_id)
+    for tech_id, code, device, name in table.itertuples(index=False):
+        if device != NO_DEVICE:
+            claim(device, tech_id)
+        claim(name, tech_id)
+    codes = dict(zip(table['TechCode'], table['TechId']))
+    for alias, code in TECH_ALIASES.items():
+        if code in codes:
+            claim(alias, codes[code])
+    aliases.pop('', None)
+    return table, aliases
+
+# Identity table and alias lookup, built once at startup
+IDENTITY, TECH_ALIAS_IDS = build_identity_table()
+TECH_CODES = list(IDENTITY['TechCode'])
+
+# Changes whenever the table does; part of the loader versions of data
+# carrying TechId, so cached ids are rebuilt after config.mapping is edited
+IDENTITY_VERSION = hashlib.blake2b(
+    repr(sorted(TECH_ALIAS_IDS.items()) + TECH_CODES).encode('utf-8'), digest_size=4
+).hexdigest()
+
+def tech_ids(values, unknown=None):
+    """
+    Resolve technician codes, device names or aliases to technician ids.
+
+    Args:
+        values: Series or array of raw values (categorical columns are
+            resolved once per category)
+        unknown: Dictionary shared by the calls whose results are compared;
+            values that resolve to no technician are numbered in it after
+            the identity table, so they still match their own spelling
+            (None gives them -1)
+
+    Returns:
+        Array of int64 ids (-1 for missing values, and unknown ones without
+        the unknown dictionary)
+    """
+    series = pd.Series(values)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series.astype(object))
+
+    unique_ids = np.full(len(uniques) + 1, -1, dtype=np.int64)
+    for i, value in enumerate(uniques):
+        alias = normalize_alias(value)
+        tech_id = TECH_ALIAS_IDS.get(alias)
+        if tech_id is None and unknown is not None and alias:
+            tech_id = unknown.setdefault(alias, len(IDENTITY) + len(unknown))
+        if tech_id is not None:
+            unique_ids[i] = tech_id
+    return unique_ids[codes]
+
+def tech_id_column(values):
+    """
+    Build the TechId column of a technician column.
+
+    Args:
+        values: Series or array of raw codes, device names or aliases
+
+    Returns:
+        Int16 array of technician ids, missing where a value names no known
+        technician
+    """
+    ids = tech_ids(values)
+    return pd.arrays.IntegerArray(np.maximum(ids, 0).astype(np.int16), ids < 0)
+
+def tech_codes(ids, default=None):
+    """
+    Look up the technician code of each id.
+
+    Args:
+        ids: Array of technician ids
+        default: Code for ids outside the identity table
+
+    Returns:
+        Array of codes
+    """
+    return _lookup(TECH_CODES, ids, default)
+
+def device_names(ids, default=NO_DEVICE):
+    """
+    Look up the GPS device name of each technician id.
+
+    Args:
+        ids: Array of technician ids
+        default: Name for ids without a device
+
+    Returns:
+        Array of device names
+    """
+    return _lookup(list(IDENTITY['Device']), ids, default)
+
+def _lookup(values, ids, default):
+    ids = np.asarray(ids, dtype=np.int64)
+    table = np.array(values + [default], dtype=object)
+    return table[np.where((ids >= 0) & (ids < len(values)), ids, len(values))]
@@ -3,211 +3,587 @@ Data import functions for various file formats.
 """
 
 import os
+import sys
+import csv
+import codecs
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 from datetime import datetime
 
-def load_type6_report(filepath):
+from src.data_processing.cache import (
+    cache_key, read_cached, write_cached, write_cached_batches, file_fingerprint,
+    load_state, save_state
+)
+from src.data_processing.parsers import parse_durations, parse_gps_times, parse_invoice_keys
+from src.data_processing.identity import tech_id_column, IDENTITY_VERSION
+from src.data_processing.schemas import (
+    CATEGORY, FLAG, TEXT, FLAG_VALUES, INVOICE_KEY, TECH_ID,
+    TYPE6_SCHEMA, SALES_SCHEMA, TECHREV_SCHEMA, GPS_SCHEMAS
+)
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import TYPE6_CHUNK_ROWS, SALES_DAT_CHUNK_ROWS
+
+# Bump a loader's version whenever its output changes so stale cache entries are
+# ignored; the TechId every loader adds also depends on the identity table
+TYPE6_LOADER_VERSION = f'6.{IDENTITY_VERSION}'
+SALES_LOADER_VERSION = f'6.{IDENTITY_VERSION}'
+TECHREV_LOADER_VERSION = f'4.{IDENTITY_VERSION}'
+GPS_LOADER_VERSION = f'6.{IDENTITY_VERSION}'
+
+# Encodings detected so far, keyed by file fingerprint
+_detected_encodings = None
+
+def detect_encoding(filepath):
     """
-    Load and preprocess Type6report.csv
+    Pick the text encoding of a file with a single pass over its bytes.
+    
+    Files with a UTF-8 byte order mark (the GPS exports) get 'utf-8-sig' so the
+    BOM is stripped from the first header. Otherwise the bytes are fed through
+    an incremental UTF-8 decoder, stopping at the first invalid sequence, in
+    which case 'latin1' is used since it can decode any byte. Results are
+    remembered per file fingerprint.
     
     Args:
-        filepath: Path to the Type6report CSV file
+        filepath: Path to the file
         
     Returns:
-        DataFrame with processed Type6 data
+        Encoding name to pass to pd.read_csv
+    """
+    global _detected_encodings
+    if _detected_encodings is None:
+        _detected_encodings = load_state('encodings', {})
+    
+    fingerprint = file_fingerprint(filepath)
+    if fingerprint in _detected_encodings:
+        return _detected_encodings[fingerprint]
+    
+    encoding = 'utf-8'
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(filepath, 'rb') as f:
+        block = f.read(1 << 20)
+        if block.startswith(codecs.BOM_UTF8):
+            encoding = 'utf-8-sig'
+        try:
+            while block:
+                decoder.decode(block)
+                block = f.read(1 << 20)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            encoding = 'latin1'
+    
+    _detected_encodings[fingerprint] = encoding
+    save_state('encodings', _detected_encodings)
+    return encoding
+
+def _schema_parse_types(schema):
+    """Split a schema into read_csv dtypes and the numeric columns among them."""
+    parse_types = {}
+    numeric_types = {}
+    for col, col_type in schema.items():
+        if col_type in (CATEGORY, FLAG):
+            parse_types[col] = 'category'
+        elif col_type == TEXT:
+            parse_types[col] = 'object'
+        else:
+            parse_types[col] = col_type
+            if col_type != 'str':
+                numeric_types[col] = col_type
+    return parse_types, numeric_types
+
+def _finish_typed(df, schema, coerce_types=None):
+    """Coerce text-parsed numeric columns and convert FLAG and TEXT columns."""
+    for col, col_type in (coerce_types or {}).items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            try:
+                df[col] = values.astype(col_type)
+            except (ValueError, TypeError):
+                df[col] = values
+    
+    for col, col_type in schema.items():
+        if col not in df.columns:
+            continue
+        if col_type == FLAG:
+            df[col] = map_categories(df[col], FLAG_VALUES).astype('boolean')
+        elif col_type == TEXT:
+            df[col] = df[col].astype(str).str.strip()
+    
+    return df
+
+def _projection(columns):
+    """Build a read_csv usecols argument that tolerates absent columns."""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda col: col in wanted
+
+def read_csv_typed(filepath, schema, encoding, columns=None, **kwargs):
+    """
+    Parse a CSV with the column types declared in a schema.
+    
+    Categorical, numeric and string columns are typed by the CSV parser itself.
+    If a declared numeric column holds values that do not fit its type, the
+    file is parsed again with those columns as text and coerced afterwards
+    (unparseable values become missing). FLAG columns are parsed as
+    categoricals and mapped to a nullable boolean through their categories,
+    and TEXT columns are stripped.
+    
+    Args:
+        filepath: Path to the CSV file
+        schema: Column -> type mapping from schemas.py
+        encoding: Text encoding of the file
+        columns: Columns to parse (None for all); absent columns are ignored
+        **kwargs: Extra arguments for pd.read_csv
+        
+    Returns:
+        Typed DataFrame
     """
+    parse_types, numeric_types = _schema_parse_types(schema)
+    usecols = _projection(columns)
+    
     try:
-        # Try different encodings
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        df = None
+        df = pd.read_csv(filepath, encoding=encoding, dtype=parse_types, usecols=usecols, **kwargs)
+        coerce_types = None
+    except (ValueError, TypeError, OverflowError) as e:
+        print(f"Declared types did not fit, coercing numeric columns: {e}")
+        text_types = {col: t for col, t in parse_types.items() if col not in numeric_types}
+        df = pd.read_csv(filepath, encoding=encoding, dtype=text_types, usecols=usecols, **kwargs)
+        coerce_types = numeric_types
+    
+    return _finish_typed(df, schema, coerce_types)
+
+def iter_csv_typed(filepath, schema, encoding, chunksize, columns=None, **kwargs):
+    """
+    Stream a CSV as typed DataFrame batches of at most chunksize rows.
+    
+    Types follow the same rules as read_csv_typed. If a declared numeric
+    column stops fitting its type partway through, the stream is read again
+    with numeric columns parsed as text and coerced, resuming after the rows
+    already yielded.
+    Categorical columns get the categories seen in each batch; use
+    concat_typed() to combine batches.
+    
+    Args:
+        filepath: Path to the CSV file
+        schema: Column -> type mapping from schemas.py
+        encoding: Text encoding of the file
+        chunksize: Maximum number of rows per batch
+        columns: Columns to parse (None for all); absent columns are ignored
+        **kwargs: Extra arguments for pd.read_csv
         
-        for encoding in encodings:
+    Yields:
+        Typed DataFrame batches
+    """
+    parse_types, numeric_types = _schema_parse_types(schema)
+    usecols = _projection(columns)
+    rows_done = 0
+    
+    with pd.read_csv(filepath, encoding=encoding, dtype=parse_types, usecols=usecols,
+                     chunksize=chunksize, **kwargs) as reader:
+        while True:
             try:
-                print(f"Attempting to load with {encoding} encoding...")
-                df = pd.read_csv(filepath, encoding=encoding, low_memory=False, on_bad_lines='skip')
-                print(f"Successfully loaded with {encoding} encoding")
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except (ValueError, TypeError, OverflowError) as e:
+                print(f"Declared types did not fit after {rows_done} rows, coercing numeric columns: {e}")
                 break
-            except Exception as e:
-                print(f"Failed with {encoding} encoding: {e}")
+            rows_done += len(chunk)
+            yield _finish_typed(chunk, schema)
+    
+    # Re-read from the start and drop the rows already yielded; skipping raw
+    # lines instead would miscount when on_bad_lines drops records
+    text_types = {col: t for col, t in parse_types.items() if col not in numeric_types}
+    with pd.read_csv(filepath, encoding=encoding, dtype=text_types, usecols=usecols,
+                     chunksize=chunksize, **kwargs) as reader:
+        for chunk in reader:
+            if rows_done >= len(chunk):
+                rows_done -= len(chunk)
                 continue
+            yield _finish_typed(chunk.iloc[rows_done:], schema, numeric_types)
+            rows_done = 0
+
+def concat_typed(batches):
+    """
+    Concatenate typed batches, merging categorical columns' categories.
+    
+    Plain pd.concat turns categoricals with differing categories into object
+    columns; here they stay categorical over the union of categories.
+    
+    Args:
+        batches: Iterable of DataFrames with the same columns
         
-        if df is None:
-            raise Exception("Failed to load file with any encoding")
+    Returns:
+        Combined DataFrame
+    """
+    batches = list(batches)
+    if not batches:
+        return pd.DataFrame()
+    
+    for col in batches[0].columns:
+        if isinstance(batches[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals(
+                [batch[col] for batch in batches], sort_categories=True
+            ).categories
+            for batch in batches:
+                batch[col] = batch[col].cat.set_categories(categories)
+    
+    return pd.concat(batches)
+
+def map_categories(series, mapping):
+    """
+    Map the values of a categorical column through a dict, once per category.
+    
+    Values missing from the mapping become missing.
+    
+    Args:
+        series: Categorical Series
+        mapping: Value -> new value mapping
         
+    Returns:
+        Series of mapped values
+    """
+    # One mapped value per category, plus None at the end for code -1 (missing)
+    mapped = [mapping.get(c) for c in series.cat.categories] + [None]
+    values = np.array(mapped, dtype=object)[series.cat.codes.to_numpy()]
+    return pd.Series(values, index=series.index, name=series.name)
+
+def strip_categories(series, upper=False):
+    """
+    Strip (and optionally upper-case) the labels of a categorical column.
+    
+    Only the categories are rewritten, not every row. Labels that collapse
+    into each other after stripping are merged.
+    
+    Args:
+        series: Categorical Series
+        upper: Also convert labels to upper case
+        
+    Returns:
+        Categorical Series with cleaned labels
+    """
+    labels = series.cat.categories.astype(str).str.strip()
+    if upper:
+        labels = labels.str.upper()
+    
+    if labels.is_unique:
+        return series.cat.rename_categories(labels)
+    
+    values = np.array(list(labels) + [None], dtype=object)[series.cat.codes.to_numpy()]
+    return pd.Series(values, index=series.index, name=series.name, dtype='category')
+
+def iter_type6_report(filepath, columns=None, chunksize=TYPE6_CHUNK_ROWS):
+    """
+    Stream Type6report.csv as typed, preprocessed batches
+    
+    Memory stays bounded by the batch size however large the report is.
+    
+    Args:
+        filepath: Path to the Type6report CSV file
+        columns: Columns to load (None for all); see load_type6_report
+        chunksize: Maximum number of rows per batch
+        
+    Yields:
+        DataFrames with processed Type6 data
+    """
+    encoding = detect_encoding(filepath)
+    print(f"Loading with {encoding} encoding...")
+    
+    # Codes, flags, numbers and text fields are typed from TYPE6_SCHEMA
+    batches = iter_csv_typed(filepath, TYPE6_SCHEMA, encoding, chunksize, columns=columns,
+                             low_memory=False, on_bad_lines='skip')
+    for df in batches:
         # Convert date columns to datetime
         date_columns = ['OriginDate', 'FirstAppmnt', 'CmpltnDate']
         for col in date_columns:
             if col in df.columns:
                 df[col] = pd.to_datetime(df[col], errors='coerce')
         
-        # Convert boolean columns
-        bool_columns = ['ShopJob?', 'CurrentAppmnt?', 'Triaged?', 'CompletedOnFirstTrip', 'JobCanceled']
-        for col in bool_columns:
-            if col in df.columns:
-                # Handle various representations of boolean values
-                df[col] = df[col].map({'True': True, 'False': False, 'Yes': True, 'No': False, 
-                                      'true': True, 'false': False, 'yes': True, 'no': False})
+        # Integer invoice key for joining with the Sales Journal
+        if 'InvNmbr' in df.columns and (columns is None or INVOICE_KEY in columns):
+            df[INVOICE_KEY] = parse_invoice_keys(df['InvNmbr'])
         
-        # Clean up text fields
-        text_columns = ['NmLst', 'NmFrst', 'Address', 'CityStateZip', 'WorkDescription']
-        for col in text_columns:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip()
+        # Categorical technician id for joining with the other sources
+        if 'TechCode' in df.columns and (columns is None or TECH_ID in columns):
+            df[TECH_ID] = tech_id_column(df['TechCode'])
+        
+        yield df
+
+def load_type6_report(filepath, use_cache=True, columns=None):
+    """
+    Load and preprocess Type6report.csv
+    
+    The report is parsed in batches of TYPE6_CHUNK_ROWS rows, so peak memory
+    is the result plus one batch. Passing columns (e.g. the union of the
+    TYPE6_COLUMNS declared by the processing stages) skips every other
+    column, including the Part1..Part5 details, at parse time.
+    
+    Args:
+        filepath: Path to the Type6report CSV file
+        use_cache: Read from and write to the columnar cache
+        columns: Columns to load (None for all); columns missing from the
+            report are ignored
+        
+    Returns:
+        DataFrame with processed Type6 data
+    """
+    try:
+        key = cache_key(filepath, 'type6', TYPE6_LOADER_VERSION, columns)
+        if use_cache:
+            # A full cached copy can serve any projection
+            df = read_cached(cache_key(filepath, 'type6', TYPE6_LOADER_VERSION), columns=columns)
+            if df is None and columns is not None:
+                df = read_cached(key)
+            if df is not None:
+                print(f"Loaded Type6 report with {len(df)} records from cache")
+                return df
+        
+        df = concat_typed(iter_type6_report(filepath, columns))
         
         print(f"Successfully loaded Type6 report with {len(df)} records")
+        if use_cache:
+            write_cached(key, df)
         return df
     
     except Exception as e:
         print(f"Error loading Type6 report: {e}")
         return pd.DataFrame()
 
-def load_sales_journal(filepath):
+def _finish_sales_journal(df):
+    """Convert dates and clean technician codes and invoice numbers."""
+    # Convert date columns to datetime (the DAT export wraps dates in '#')
+    if 'DateRecorded' in df.columns:
+        dates = df['DateRecorded']
+        if dates.dtype == object:
+            dates = dates.str.strip('#')
+        df['DateRecorded'] = pd.to_datetime(dates, errors='coerce')
+    
+    # Clean up technician codes and invoice numbers
+    if 'Technician' in df.columns:
+        df['Technician'] = strip_categories(df['Technician'], upper=True)
+        df[TECH_ID] = tech_id_column(df['Technician'])
+    
+    if 'InvoiceNumber' in df.columns:
+        df['InvoiceNumber'] = df['InvoiceNumber'].astype(str).str.strip()
+        df[INVOICE_KEY] = parse_invoice_keys(df['InvoiceNumber'])
+    
+    return df
+
+def is_sales_journal_dat(filepath):
+    """Check whether a path is a raw Sales Journal export (.Dat.str or .dat)."""
+    name = filepath.lower()
+    return name.endswith('.dat.str') or name.endswith('.dat')
+
+def sales_journal_dat_columns(filepath, encoding):
+    """
+    Read the column names of a Sales Journal DAT export.
+    
+    Data rows hold more values than the header names, so the extra positions
+    get Extra_1, Extra_2, ... names, counted from the first data row.
+    
+    Args:
+        filepath: Path to the DAT file
+        encoding: Text encoding of the file
+        
+    Returns:
+        List of column names
+    """
+    with open(filepath, 'r', encoding=encoding, newline='') as f:
+        header = next(csv.reader(f, skipinitialspace=True), [])
+        first_row = next(csv.reader(f), header)
+    
+    columns = [col.strip() for col in header]
+    extra = len(first_row) - len(columns)
+    return columns + [f'Extra_{n}' for n in range(1, extra + 1)]
+
+def iter_sales_journal_dat(filepath, chunksize=SALES_DAT_CHUNK_ROWS):
+    """
+    Stream a Sales Journal DAT export as typed, preprocessed batches
+    
+    The '#2024-01-29#' dates and quoted fields are parsed in a single pass by
+    the CSV parser, with column types from SALES_SCHEMA, so memory stays
+    bounded by the batch size. Rows with more values than the first data row
+    are skipped with a warning.
+    
+    Args:
+        filepath: Path to the DAT file
+        chunksize: Maximum number of rows per batch
+        
+    Yields:
+        DataFrames with processed Sales Journal data
+    """
+    encoding = detect_encoding(filepath)
+    print(f"Loading with {encoding} encoding...")
+    columns = sales_journal_dat_columns(filepath, encoding)
+    
+    batches = iter_csv_typed(filepath, SALES_SCHEMA, encoding, chunksize,
+                             header=0, names=columns, index_col=False,
+                             skipinitialspace=True, on_bad_lines='warn')
+    for df in batches:
+        # Quoted fields are padded with spaces in the export
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = strip_categories(df[col])
+            elif df[col].dtype == object:
+                df[col] = df[col].str.strip()
+        
+        yield _finish_sales_journal(df)
+
+def convert_sales_journal_dat(filepath):
+    """
+    Convert a Sales Journal DAT export straight into the importer cache
+    
+    Batches from iter_sales_journal_dat() are written to the cache entry
+    that load_sales_journal() reads, so no intermediate CSV is needed and the
+    journal never has to fit in memory.
+    
+    Args:
+        filepath: Path to the DAT file
+        
+    Returns:
+        Tuple of (cache key, number of rows written)
+    """
+    key = cache_key(filepath, 'sales', SALES_LOADER_VERSION)
+    rows = write_cached_batches(key, iter_sales_journal_dat(filepath))
+    return key, rows
+
+def load_sales_journal(filepath, use_cache=True):
     """
     Load and preprocess Sales Journal data
     
     Args:
-        filepath: Path to the Sales Journal CSV file
+        filepath: Path to the Sales Journal CSV file, or the raw DAT export
+        use_cache: Read from and write to the columnar cache
         
     Returns:
         DataFrame with processed Sales Journal data
     """
     try:
-        # Try different encodings
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        df = None
+        key = cache_key(filepath, 'sales', SALES_LOADER_VERSION)
+        if use_cache:
+            df = read_cached(key)
+            if df is not None:
+                print(f"Loaded Sales Journal with {len(df)} records from cache")
+                return df
         
-        for encoding in encodings:
-            try:
-                print(f"Attempting to load with {encoding} encoding...")
-                df = pd.read_csv(filepath, encoding=encoding, low_memory=False)
-                print(f"Successfully loaded with {encoding} encoding")
-                break
-            except Exception as e:
-                print(f"Failed with {encoding} encoding: {e}")
-                continue
+        if is_sales_journal_dat(filepath):
+            if use_cache and convert_sales_journal_dat(filepath)[1]:
+                df = read_cached(key)
+            else:
+                df = concat_typed(iter_sales_journal_dat(filepath))
+            print(f"Successfully loaded Sales Journal with {len(df)} records")
+            return df
         
-        if df is None:
-            raise Exception("Failed to load file with any encoding")
-            
-        # Convert date columns to datetime
-        if 'DateRecorded' in df.columns:
-            df['DateRecorded'] = pd.to_datetime(df['DateRecorded'], errors='coerce')
+        # Detect the encoding once, then parse once
+        encoding = detect_encoding(filepath)
+        print(f"Loading with {encoding} encoding...")
+        # Amounts, codes and invoice numbers are typed from SALES_SCHEMA
+        df = read_csv_typed(filepath, SALES_SCHEMA, encoding, low_memory=False)
+        df = _finish_sales_journal(df)
         
-        # Convert numeric columns
-        numeric_columns = ['MerchandiseSold', 'PartsSold', 'SCallSold', 'LaborSold', 
-                           'ImpliedTax', 'TotalSale']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+        print(f"Successfully loaded Sales Journal with {len(df)} records")
+        if use_cache:
+            write_cached(key, df)
+        return df
+    
+    except Exception as e:
+        print(f"Error loading Sales Journal: {e}")
+        return pd.DataFrame()
+
+def load_tech_revenue(filepath, use_cache=True):
+    """
+    Load and preprocess a TechRev export (revenue per invoice and technician)
+    
+    Args:
+        filepath: Path to the TechRev CSV file
+        use_cache: Read from and write to the columnar cache
+        
+    Returns:
+        DataFrame with processed TechRev data
+    """
+    try:
+        key = cache_key(filepath, 'techrev', TECHREV_LOADER_VERSION)
+        if use_cache:
+            df = read_cached(key)
+            if df is not None:
+                print(f"Loaded TechRev data with {len(df)} records from cache")
+                return df
+        
+        # Detect the encoding once, then parse once
+        encoding = detect_encoding(filepath)
+        print(f"Loading with {encoding} encoding...")
+        df = read_csv_typed(filepath, TECHREV_SCHEMA, encoding, low_memory=False)
+        
+        # Convert date columns to datetime
+        if 'EntryDate' in df.columns:
+            df['EntryDate'] = pd.to_datetime(df['EntryDate'], errors='coerce')
         
         # Clean up technician codes and invoice numbers
         if 'Technician' in df.columns:
-            df['Technician'] = df['Technician'].astype(str).str.strip().str.upper()
+            df['Technician'] = strip_categories(df['Technician'], upper=True)
+            df[TECH_ID] = tech_id_column(df['Technician'])
         
         if 'InvoiceNumber' in df.columns:
             df['InvoiceNumber'] = df['InvoiceNumber'].astype(str).str.strip()
+            df[INVOICE_KEY] = parse_invoice_keys(df['InvoiceNumber'])
         
-        print(f"Successfully loaded Sales Journal with {len(df)} records")
+        print(f"Successfully loaded TechRev data with {len(df)} records")
+        if use_cache:
+            write_cached(key, df)
         return df
     
     except Exception as e:
-        print(f"Error loading Sales Journal: {e}")
+        print(f"Error loading TechRev data: {e}")
         return pd.DataFrame()
 
-def load_gps_tracking(filepath, file_type):
+def load_gps_tracking(filepath, file_type, use_cache=True):
     """
     Load and preprocess GPS tracking data
     
     Args:
         filepath: Path to the GPS CSV file
-        file_type: Type of GPS data ('drives_stops', 'day_engine', 'idle_time', 'alert')
+        file_type: Type of GPS data ('day_start_end', 'drives_stops', 'day_engine', 'idle_time', 'alert')
+        use_cache: Read from and write to the columnar cache
         
     Returns:
         DataFrame with processed GPS data
     """
     try:
-        # Try different encodings
-        encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-        df = None
+        key = cache_key(filepath, f'gps_{file_type}', GPS_LOADER_VERSION)
+        if use_cache:
+            df = read_cached(key)
+            if df is not None:
+                print(f"Loaded GPS {file_type} data with {len(df)} records from cache")
+                return df
         
-        for encoding in encodings:
-            try:
-                print(f"Attempting to load with {encoding} encoding...")
-                df = pd.read_csv(filepath, encoding=encoding, low_memory=False)
-                print(f"Successfully loaded with {encoding} encoding")
-                break
-            except Exception as e:
-                print(f"Failed with {encoding} encoding: {e}")
-                continue
+        # Detect the encoding once, then parse once
+        encoding = detect_encoding(filepath)
+        print(f"Loading with {encoding} encoding...")
+        df = read_csv_typed(filepath, GPS_SCHEMAS.get(file_type, {}), encoding,
+                            low_memory=False)
         
-        if df is None:
-            raise Exception("Failed to load file with any encoding")
+        # Convert date and time columns with the explicit formats registered
+        # for this file type (time columns become tz-aware UTC instants)
+        df = parse_gps_times(df, file_type)
         
         # Process based on file type
-        if file_type == 'day_start_end':
-            # Process day start/end breakdown
-            time_columns = ['Start Time', 'End Time']
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            
-            # Convert time columns to datetime
-            for col in time_columns:
-                if col in df.columns:
-                    # Combine date and time
-                    df[col] = pd.to_datetime(
-                        df['Date'].dt.strftime('%Y-%m-%d') + ' ' + df[col],
-                        errors='coerce'
-                    )
-            
-        elif file_type == 'drives_stops':
-            # Process drives and stops data
-            time_columns = ['Start Time', 'End Time']
-            
-            # Convert time columns to datetime
-            for col in time_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-            # Convert numeric columns
-            numeric_columns = ['Length (mi)', 'Top speed (mph)', 'Avg Speed (mph)', 'Odometer (mi)']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-        elif file_type == 'day_engine':
-            # Process engine hours data
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            
+        if file_type == 'day_engine':
             # Convert duration columns to seconds
             if 'Daily Hours Accumulated' in df.columns:
-                df['Daily Hours Accumulated'] = df['Daily Hours Accumulated'].apply(
-                    lambda x: convert_duration_to_seconds(x)
-                )
+                df['Daily Hours Accumulated'] = parse_durations(df['Daily Hours Accumulated'])
             
             if 'Lifetime Hours' in df.columns:
-                df['Lifetime Hours'] = df['Lifetime Hours'].apply(
-                    lambda x: convert_duration_to_seconds(x)
-                )
+                df['Lifetime Hours'] = parse_durations(df['Lifetime Hours'])
             
         elif file_type == 'idle_time':
-            # Process idle time data
-            time_columns = ['Start Time', 'End Time']
-            
-            # Convert time columns to datetime
-            for col in time_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
             # Convert duration column to seconds
             if 'Duration' in df.columns:
-                df['Duration Seconds'] = df['Duration'].apply(
-                    lambda x: convert_duration_to_seconds(x)
-                )
+                df['Duration Seconds'] = parse_durations(df['Duration'])
                 
         elif file_type == 'alert':
-            # Process alert data
-            if 'Date & Time' in df.columns:
-                df['Date & Time'] = pd.to_datetime(df['Date & Time'], errors='coerce')
-            
             # Convert speed columns to numeric
             speed_columns = ['Posted Speed', 'Speed']
             for col in speed_columns:
@@ -216,9 +592,12 @@ def load_gps_tracking(filepath, file_type):
         
         # Clean up Device column for all GPS data types
         if 'Device' in df.columns:
-            df['Device'] = df['Device'].astype(str).str.strip()
+            df['Device'] = strip_categories(df['Device'])
+            df[TECH_ID] = tech_id_column(df['Device'])
         
         print(f"Successfully loaded GPS {file_type} data with {len(df)} records")
+        if use_cache:
+            write_cached(key, df)
         return df
     
     except Exception as e:
@@ -227,24 +606,14 @@ def load_gps_tracking(filepath, file_type):
 
 def convert_duration_to_seconds(duration_str):
     """
-    Convert a duration string like '2:30:15' to seconds
+    Convert a single duration string like '2:30:15' or '13h 36m 13s' to seconds
+    
+    Use parse_durations() for whole columns.
     
     Args:
-        duration_str: Duration string in format 'HH:MM:SS' or 'MM:SS'
+        duration_str: Duration string ('HH:MM:SS', 'MM:SS' or 'XXh XXm XXs')
         
     Returns:
         Duration in seconds
     """
-    try:
-        if not isinstance(duration_str, str):
-            return 0
-            
-        parts = duration_str.split(':')
-        if len(parts) == 3:  # HH:MM:SS
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-        elif len(parts) == 2:  # MM:SS
-            return int(parts[0]) * 60 + int(parts[1])
-        else:
-            return 0
-    except Exception:
-        return 0 
\ No newline at end of file
+    return int(parse_durations([duration_str]).iloc[0])
@@ -4,15 +4,63 @@ Functions to integrate data from different sources.
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import sys
 import os
 
 # Add the project root to the path so we can import config
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from config.mapping import TECH_MAPPING, TECH_REVERSE_MAPPING
-from config.settings import GPS_MATCH_THRESHOLD, DEFAULT_TIME_WINDOW
-from src.data_processing.cleaner import match_address_confidence, standardize_address
+from config.settings import GPS_MATCH_THRESHOLD, GPS_MATCH_RADIUS_M, GPS_ONE_TO_ONE, DEFAULT_TIME_WINDOW
+from src.data_processing.cleaner import standardize_address
+from src.data_processing.addresses import address_keys, address_key_scores
+from src.data_processing.assignment import assign_pairs
+from src.data_processing.gazetteer import geocode_addresses, points_within, SKLEARN_AVAILABLE
+from src.data_processing.identity import tech_ids, tech_id_column, device_names, IDENTITY, NO_DEVICE
+from src.data_processing.parsers import to_local_time, parse_coordinates
+from src.data_processing.schemas import GPS_COORDINATE_COLUMNS, INVOICE_KEY, TECH_ID
+from src.data_processing.timeline import time_in_status, STOPPED
+
+# Type6 report columns read when joining jobs with sales and GPS data
+TYPE6_COLUMNS = [
+    'TechCode', TECH_ID, 'JobNumber', 'InvNmbr', INVOICE_KEY, 'Address', 'CityStateZip', 'FirstAppmnt',
+    'TotalLaborInSale', 'TotalMateriaInSale'
+]
+
+def tech_device_columns(df, tech_col='TechCode'):
+    """
+    Map technician codes in ServiceDesk data to GPS device names.
+    
+    Devices are looked up by the TechId the loaders add; frames without it
+    have their codes resolved through the identity table once per distinct
+    value.
+    
+    Args:
+        df: DataFrame containing technician codes
+        tech_col: Column name containing technician codes
+        
+    Returns:
+        DataFrame on the job index with a 'Device' column ('UNKNOWN' for
+        technicians without a GPS device), and TechId if df lacks it
+    """
+    tech_id = df[TECH_ID] if TECH_ID in df.columns else pd.Series(tech_id_column(df[tech_col]), index=df.index)
+    result_df = pd.DataFrame({'Device': device_names(tech_id.to_numpy(dtype=np.int64, na_value=-1))}, index=df.index)
+    if TECH_ID not in df.columns:
+        result_df[TECH_ID] = tech_id
+    
+    return result_df
+
+def _row_tech_ids(df, tech_col, unknown=None):
+    """Technician ids of df's rows, from its TechId column when present and tech_col otherwise."""
+    if TECH_ID not in df.columns:
+        return tech_ids(df[tech_col], unknown)
+    ids = df[TECH_ID].to_numpy(dtype=np.int64, na_value=-1)
+    
+    # TechId is missing for values outside the identity table; number those
+    # by their spelling when the caller compares them
+    missing = ids < 0
+    if unknown is not None and tech_col in df.columns and missing.any():
+        ids[missing] = tech_ids(df[tech_col][missing], unknown)
+    return ids
 
 def map_tech_codes_to_devices(df, tech_col='TechCode'):
     """
@@ -23,89 +71,314 @@ def map_tech_codes_to_devices(df, tech_col='TechCode'):
         tech_col: Column name containing technician codes
         
     Returns:
-        DataFrame with added 'Device' column
+        DataFrame with added 'Device' column (see tech_device_columns())
     """
-    # Create a copy to avoid modifying the original
-    result_df = df.copy()
+    return df.assign(**tech_device_columns(df, tech_col))
+
+def index_stops_by_device(gps_df, devices=None):
+    """
+    Sort each device's GPS stops by start time, for binary-search lookups.
     
-    # Add Device column based on TechCode mapping
-    result_df['Device'] = result_df[tech_col].apply(
-        lambda x: TECH_REVERSE_MAPPING.get(x, 'UNKNOWN') if x in TECH_REVERSE_MAPPING else 'UNKNOWN'
-    )
+    Args:
+        gps_df: DataFrame with GPS stop data (must have Device and Start Time columns)
+        devices: Array of device keys to group the stops by, such as
+            technician ids (None groups by the Device column)
+        
+    Returns:
+        Dictionary of device -> (sorted start times, row positions in gps_df);
+        stops without a start time are left out
+    """
+    starts = gps_df['Start Time'].to_numpy()
+    has_start = ~pd.isna(starts)
+    devices = gps_df['Device'] if devices is None else pd.Series(devices)
     
-    return result_df
+    index = {}
+    for device, positions in devices.groupby(devices, observed=True, sort=False).indices.items():
+        positions = positions[has_start[positions]]
+        positions = positions[np.argsort(starts[positions], kind='stable')]
+        index[device] = (starts[positions], positions)
+    return index
 
-def match_jobs_to_gps_stops(job_df, gps_df, time_window_minutes=DEFAULT_TIME_WINDOW):
+def _stop_coordinates(gps_df):
+    """Parse the recorded position of each stop (NaN if the export has none)."""
+    for column in dict.fromkeys(GPS_COORDINATE_COLUMNS.values()):
+        if column in gps_df.columns:
+            return parse_coordinates(gps_df[column])
+    missing = np.full(len(gps_df), np.nan)
+    return missing, missing.copy()
+
+def gps_match_columns(job_df, gps_df, time_window_minutes=DEFAULT_TIME_WINDOW, gazetteer=None,
+                      one_to_one=GPS_ONE_TO_ONE, timeline=None):
     """
     Match service jobs to GPS stops based on location and time.
     
+    Candidate stops are those of the job's device starting within the time
+    window. Jobs whose address the gazetteer can geocode take candidates
+    within GPS_MATCH_RADIUS_M, found with a BallTree radius query. Other jobs
+    take candidates whose address matches, found by binary search over each
+    device's stops sorted by start time and scored in one batch.
+    
+    With one_to_one, each device-day's jobs and candidate stops are assigned
+    one-to-one at least total cost (time offset plus distance or address
+    mismatch), so no stop is attributed to two jobs. Otherwise each job takes
+    its nearest or best-matching candidate independently (the first in gps_df
+    order on ties).
+    
     Args:
-        job_df: DataFrame with job data (must have Device, Address, FirstAppmnt columns)
-        gps_df: DataFrame with GPS stop data (must have Device, Address, Start Time, End Time columns)
+        job_df: DataFrame with job data (must have Device, Address, FirstAppmnt columns;
+            CityStateZip is used for geocoding when present)
+        gps_df: DataFrame with GPS stop data (must have Device, Address, Start Time, End Time columns,
+            and a position column for spatial matching)
         time_window_minutes: Minutes before/after scheduled time to look for GPS stops
+        gazetteer: Table from gazetteer.load_gazetteer() (None matches every job by address)
+        one_to_one: Assign each stop to at most one job
+        timeline: Device timeline from timeline.build_timeline(); when given,
+            GPS_StoppedMinutes holds the minutes the job's device was stopped
+            within the job's time window
         
     Returns:
-        DataFrame with job data and matched GPS stop information
+        DataFrame on the job index with the matched GPS stop information;
+        GPS_MatchDistance holds the meters between a spatially matched job
+        and its stop
     """
-    # Create a copy of the job DataFrame to store results
-    result_df = job_df.copy()
+    # Matched stop columns, aligned with the jobs
+    result_df = pd.DataFrame(index=job_df.index)
     
-    # Add columns for GPS match data
-    result_df['GPS_StartTime'] = pd.NaT
-    result_df['GPS_EndTime'] = pd.NaT
-    result_df['GPS_Duration'] = np.nan
-    result_df['GPS_Address'] = ''
-    result_df['GPS_MatchConfidence'] = 0.0
-    
-    # Process each job
-    for idx, job in result_df.iterrows():
-        # Skip if no device assigned or no appointment time
-        if job['Device'] == 'UNKNOWN' or pd.isna(job['FirstAppmnt']):
+    # Compare GPS instants with appointment times as local wall-clock times
+    stop_starts = to_local_time(gps_df['Start Time']).to_numpy()
+    stop_ends = to_local_time(gps_df['End Time']).to_numpy()
+    stop_addresses = gps_df['Address'].to_numpy()
+    stop_keys = address_keys(gps_df['Address'])
+    
+    # Jobs and stops are joined on technician ids, so every spelling of a
+    # device name matches; jobs without a device match nothing
+    devices = {}
+    job_techs = _row_tech_ids(job_df, 'Device', devices)
+    job_techs[job_df['Device'].astype(object).to_numpy() == NO_DEVICE] = -1
+    stop_techs = _row_tech_ids(gps_df, 'Device', devices)
+    stops_by_device = index_stops_by_device(gps_df.assign(**{'Start Time': stop_starts}), stop_techs)
+    
+    # GPS match data, filled in per matched job
+    matched_starts = np.full(len(job_df), np.datetime64('NaT'), dtype='datetime64[ns]')
+    matched_ends = matched_starts.copy()
+    matched_addresses = np.full(len(job_df), '', dtype=object)
+    confidences = np.zeros(len(job_df))
+    distances = np.full(len(job_df), np.nan)
+    
+    scheduled = job_df['FirstAppmnt'].to_numpy(dtype='datetime64[ns]')
+    job_keys = address_keys(job_df['Address'])
+    window = np.timedelta64(pd.Timedelta(minutes=time_window_minutes))
+    threshold = GPS_MATCH_THRESHOLD * 100
+    
+    # Candidate pairs: job, stop, confidence, distance (NaN for address
+    # matches) and place cost (0 at the job's location, 1 at the limit)
+    pairs = []
+    
+    # Geocode jobs through the gazetteer; jobs it cannot place are matched by address
+    geocoded = np.zeros(len(job_df), dtype=bool)
+    if gazetteer is not None and SKLEARN_AVAILABLE and len(job_df):
+        zips = job_df['CityStateZip'].to_numpy() if 'CityStateZip' in job_df.columns else None
+        job_latitude, job_longitude = geocode_addresses(job_df['Address'].to_numpy(), zips, gazetteer)
+        geocoded = ~np.isnan(job_latitude)
+        
+        # Stops near each job, kept if on the job's device and within its time window
+        stop_latitude, stop_longitude = _stop_coordinates(gps_df)
+        pair_jobs, pair_stops, pair_distances = points_within(
+            stop_latitude, stop_longitude, job_latitude, job_longitude, GPS_MATCH_RADIUS_M
+        )
+        offsets = stop_starts[pair_stops] - scheduled[pair_jobs]
+        keep = ((job_techs[pair_jobs] == stop_techs[pair_stops]) & (job_techs[pair_jobs] >= 0)
+                & ~np.isnat(offsets) & (np.abs(offsets) <= window))
+        pairs.append((pair_jobs[keep], pair_stops[keep], np.full(keep.sum(), 100.0),
+                      pair_distances[keep], pair_distances[keep] / GPS_MATCH_RADIUS_M))
+    
+    # Stops starting within each job's time window, in gps_df order
+    candidate_jobs = []
+    candidates = []
+    for device, jobs in pd.Series(job_techs).groupby(job_techs, sort=False).indices.items():
+        # Skip jobs with no device assigned or no appointment time
+        if device < 0 or device not in stops_by_device:
             continue
+        jobs = jobs[~np.isnat(scheduled[jobs]) & ~geocoded[jobs]]
         
-        # Get scheduled time and create time window
-        scheduled_time = job['FirstAppmnt']
-        time_window_start = scheduled_time - timedelta(minutes=time_window_minutes)
-        time_window_end = scheduled_time + timedelta(minutes=time_window_minutes)
+        times, positions = stops_by_device[device]
+        first = np.searchsorted(times, scheduled[jobs] - window, side='left')
+        last = np.searchsorted(times, scheduled[jobs] + window, side='right')
+        for job, lo, hi in zip(jobs, first, last):
+            if lo < hi:
+                candidate_jobs.append(job)
+                candidates.append(np.sort(positions[lo:hi]))
+    
+    if candidates:
+        # Score every job/stop address pair in one batch; pairs that cannot
+        # reach the threshold score 0 and are dropped
+        counts = np.array([len(stops) for stops in candidates])
+        pair_stops = np.concatenate(candidates)
+        pair_jobs = np.repeat(candidate_jobs, counts)
+        scores = address_key_scores(job_keys[pair_jobs], stop_keys[pair_stops], threshold)
+        keep = (scores > 0) & (scores >= threshold)
+        pairs.append((pair_jobs[keep], pair_stops[keep], scores[keep], np.full(keep.sum(), np.nan),
+                      (100 - scores[keep]) / max(100 - threshold, 1)))
+    
+    if pairs:
+        pair_jobs, pair_stops, pair_confidences, pair_distances, place_costs = (
+            np.concatenate(column) for column in zip(*pairs)
+        )
+        pair_jobs = pair_jobs.astype(np.intp)
+        pair_stops = pair_stops.astype(np.intp)
         
-        # Filter GPS data for the matching device and within time window
-        device_stops = gps_df[
-            (gps_df['Device'] == job['Device']) & 
-            (gps_df['Start Time'] >= time_window_start) & 
-            (gps_df['Start Time'] <= time_window_end)
-        ]
+        if one_to_one:
+            # Least total cost per device and day of the appointment
+            offsets = np.abs(stop_starts[pair_stops] - scheduled[pair_jobs]) / window
+            days = scheduled.astype('datetime64[D]')
+            partitions = pd.DataFrame({'Device': job_techs, 'Day': days}) \
+                .groupby(['Device', 'Day'], sort=False, dropna=False).ngroup().to_numpy()
+            chosen = np.flatnonzero(assign_pairs(pair_jobs, pair_stops, offsets + place_costs,
+                                                 partitions[pair_jobs]))
+        else:
+            # Nearest or best-scoring stop per job, the first in gps_df order on ties
+            rank = np.where(np.isnan(pair_distances), -pair_confidences, pair_distances)
+            order = np.lexsort((pair_stops, rank, pair_jobs))
+            _, first = np.unique(pair_jobs[order], return_index=True)
+            chosen = order[first]
         
-        # Skip if no stops found in time window
-        if len(device_stops) == 0:
-            continue
-        
-        # Find best address match among stops in time window
-        best_match = None
-        best_confidence = 0
+        # Update the records of the matched jobs
+        jobs = pair_jobs[chosen]
+        stops = pair_stops[chosen]
+        matched_starts[jobs] = stop_starts[stops]
+        matched_ends[jobs] = stop_ends[stops]
+        matched_addresses[jobs] = stop_addresses[stops]
+        confidences[jobs] = pair_confidences[chosen]
+        distances[jobs] = pair_distances[chosen]
+    
+    # Add columns for GPS match data
+    result_df['GPS_StartTime'] = matched_starts
+    result_df['GPS_EndTime'] = matched_ends
+    result_df['GPS_Duration'] = (matched_ends - matched_starts) / np.timedelta64(1, 'm')  # Minutes
+    result_df['GPS_Address'] = matched_addresses
+    result_df['GPS_MatchConfidence'] = confidences
+    result_df['GPS_MatchDistance'] = distances
+    
+    if timeline is not None:
+        # The timeline names devices as the GPS exports spell them
+        names = dict(zip(tech_ids(timeline['devices'], devices), timeline['devices']))
+        job_devices = pd.Series(job_techs).map(names).fillna('').to_numpy(dtype=object)
+        stopped = time_in_status(timeline, job_devices, scheduled - window, scheduled + window, STOPPED)
+        result_df['GPS_StoppedMinutes'] = np.where(np.isnat(scheduled), np.nan, stopped / 60)
+    
+    return result_df
+
+def match_jobs_to_gps_stops(job_df, gps_df, time_window_minutes=DEFAULT_TIME_WINDOW, gazetteer=None,
+                            one_to_one=GPS_ONE_TO_ONE, timeline=None):
+    """
+    Match service jobs to GPS stops based on location and time.
+    
+    Args:
+        job_df: DataFrame with job data (see gps_match_columns())
+        gps_df: DataFrame with GPS stop data
+        time_window_minutes: Minutes before/after scheduled time to look for GPS stops
+        gazetteer: Table from gazetteer.load_gazetteer() (None matches every job by address)
+        one_to_one: Assign each stop to at most one job
+        timeline: Device timeline from timeline.build_timeline()
         
-        for _, stop in device_stops.iterrows():
-            # Calculate address match confidence
-            confidence = match_address_confidence(job['Address'], stop['Address'])
-            
-            # Update best match if this is better
-            if confidence > best_confidence and confidence >= GPS_MATCH_THRESHOLD * 100:
-                best_match = stop
-                best_confidence = confidence
+    Returns:
+        DataFrame with job data and matched GPS stop information
+    """
+    return job_df.assign(**gps_match_columns(job_df, gps_df, time_window_minutes, gazetteer,
+                                             one_to_one, timeline))
+
+# Sales Journal revenue columns attributed to jobs
+SALES_REVENUE_COLUMNS = ['LaborSold', 'PartsSold', 'SCallSold', 'MerchandiseSold', 'TotalSale']
+
+def sales_revenue_columns(jobs_df, sales_df):
+    """
+    Attribute Sales Journal revenue to jobs by integer invoice key.
+    
+    Each job takes the revenue of the first sales line with the same
+    technician and InvoiceKey, found with one integer index lookup. Jobs
+    without one get missing revenue. The Type6 revenue columns are zeroed so
+    revenue is not counted twice.
+    
+    Type6 jobs take their InvoiceKey from InvNmbr. The string path of
+    merge_sales_with_jobs() joins on JobNumber, which the Type6 report does
+    not have, so for that data it falls back to summing sales per
+    technician; per-job attribution here gives different per-technician
+    totals from that fallback.
+    
+    Args:
+        jobs_df: DataFrame with job data (must have TechCode and InvoiceKey columns)
+        sales_df: DataFrame with sales data (must have TechCode or Technician, and
+            InvoiceKey columns)
         
-        # If a match was found, update the job record
-        if best_match is not None:
-            result_df.at[idx, 'GPS_StartTime'] = best_match['Start Time']
-            result_df.at[idx, 'GPS_EndTime'] = best_match['End Time']
-            result_df.at[idx, 'GPS_Duration'] = (best_match['End Time'] - best_match['Start Time']).total_seconds() / 60  # Minutes
-            result_df.at[idx, 'GPS_Address'] = best_match['Address']
-            result_df.at[idx, 'GPS_MatchConfidence'] = best_confidence
+    Returns:
+        DataFrame on the job index with the revenue columns, and the zeroed
+        Type6 revenue columns
+    """
+    sales_tech_col = 'TechCode' if 'TechCode' in sales_df.columns else 'Technician'
+    revenue_cols = [col for col in SALES_REVENUE_COLUMNS if col in sales_df.columns]
+    
+    # Resolve technicians to ids (codes outside the identity table numbered
+    # jointly) so (technician, invoice) becomes one integer
+    unknown = {}
+    job_techs = _row_tech_ids(jobs_df, 'TechCode', unknown)
+    sale_techs = _row_tech_ids(sales_df, sales_tech_col, unknown)
+    tech_count = len(IDENTITY) + len(unknown)
+    
+    def pair_keys(invoice_keys, techs):
+        keys = invoice_keys.to_numpy(dtype='float64', na_value=np.nan)
+        return np.where(np.isnan(keys) | (techs < 0), -1, np.nan_to_num(keys).astype(np.int64) * tech_count + techs)
+    
+    # The first sales line of each technician and invoice supplies the revenue
+    sale_pairs = pair_keys(sales_df[INVOICE_KEY], sale_techs)
+    first_lines = np.flatnonzero(~pd.Series(sale_pairs).duplicated().to_numpy() & (sale_pairs >= 0))
+    position = pd.Index(sale_pairs[first_lines]).get_indexer(pair_keys(jobs_df[INVOICE_KEY], job_techs))
+    found = position >= 0
+    lines = np.where(found, first_lines[np.maximum(position, 0)], 0)
+    print(f"Matched {found.sum()} of {len(jobs_df)} jobs to sales records")
+    
+    # Sales revenue replaces any revenue columns the jobs carry
+    result_df = pd.DataFrame(index=jobs_df.index)
+    if revenue_cols:
+        for col in ['TotalLaborInSale', 'TotalMaterialInSale', 'TotalMateriaInSale']:
+            if col in jobs_df.columns:
+                result_df[col] = 0
+    
+    for col in revenue_cols:
+        result_df[col] = np.where(found, sales_df[col].to_numpy(dtype='float64', na_value=np.nan)[lines], np.nan)
+    
+    # Fix the Total Material column name typo if needed
+    if 'TotalMateriaInSale' in jobs_df.columns and 'TotalMaterialInSale' not in jobs_df.columns:
+        result_df['TotalMaterialInSale'] = (result_df['TotalMateriaInSale'] if 'TotalMateriaInSale' in result_df.columns
+                                            else jobs_df['TotalMateriaInSale'])
     
     return result_df
 
+def attribute_sales_by_invoice(jobs_df, sales_df):
+    """
+    Attribute Sales Journal revenue to jobs by integer invoice key.
+    
+    Args:
+        jobs_df: DataFrame with job data (must have TechCode and InvoiceKey columns)
+        sales_df: DataFrame with sales data (see sales_revenue_columns())
+        
+    Returns:
+        DataFrame with job data and revenue columns
+    """
+    return jobs_df.assign(**sales_revenue_columns(jobs_df, sales_df))
+
+def joinable_by_invoice(jobs_cols, sales_cols):
+    """Whether jobs and sales with these columns can be joined by sales_revenue_columns()."""
+    return (INVOICE_KEY in jobs_cols and INVOICE_KEY in sales_cols and 'TechCode' in jobs_cols
+            and ('TechCode' in sales_cols or 'Technician' in sales_cols))
+
 def merge_sales_with_jobs(jobs_df, sales_df):
     """
     Merge sales journal data with job data.
     
+    Frames carrying the loaders' InvoiceKey are joined by integer lookup
+    (see attribute_sales_by_invoice()); others by string job/invoice numbers,
+    or by technician as a last resort.
+    
     Args:
         jobs_df: DataFrame with job data
         sales_df: DataFrame with sales data
@@ -115,6 +388,9 @@ def merge_sales_with_jobs(jobs_df, sales_df):
     """
     print(f"Beginning merge with {len(jobs_df)} job records and {len(sales_df)} sales records")
     
+    if joinable_by_invoice(jobs_df.columns, sales_df.columns):
+        return attribute_sales_by_invoice(jobs_df, sales_df)
+    
     # Create copies to avoid modifying the originals
     jobs_df = jobs_df.copy()
     sales_df = sales_df.copy()
@@ -211,19 +487,19 @@ def merge_sales_with_jobs(jobs_df, sales_df):
                 print(f"Removing {col} from jobs data to prevent double-counting")
                 jobs_df = jobs_df.drop(columns=[col])
         
-        # Group sales by technician and sum key metrics
-        sales_summary = sales_df.groupby('TechCode').agg({
+        # Group sales by technician id and sum key metrics
+        unknown = {}
+        sale_techs = _row_tech_ids(sales_df, 'TechCode', unknown)
+        job_techs = _row_tech_ids(jobs_df, 'TechCode', unknown)
+        sales_summary = sales_df.groupby(sale_techs).agg({
             col: 'sum' for col in ['LaborSold', 'PartsSold', 'SCallSold', 'MerchandiseSold', 'TotalSale'] 
             if col in sales_cols
-        }).reset_index()
+        }).drop(index=-1, errors='ignore')
         
         # Merge the sales summary with jobs based only on technician
-        merged_df = pd.merge(
-            jobs_df,
-            sales_summary,
-            on='TechCode',
-            how='left'
-        )
+        merged_df = jobs_df.copy()
+        for col in sales_summary.columns:
+            merged_df[col] = sales_summary[col].reindex(job_techs).to_numpy()
         
         return merged_df
     
@@ -231,10 +507,40 @@ def merge_sales_with_jobs(jobs_df, sales_df):
     print("Warning: Could not determine how to merge sales with jobs. Returning job data only.")
     return jobs_df
 
+def alert_count_table(alert_df):
+    """
+    Count alerts by device and alert type in one grouped pivot.
+    
+    Args:
+        alert_df: DataFrame with alert data (must have Device, Alert columns)
+        
+    Returns:
+        DataFrame indexed by device with one Alert_<type> column per alert type,
+        in order of first appearance
+    """
+    alert_types = list(alert_df['Alert'].dropna().unique())
+    
+    counts = alert_df.groupby(['Device', 'Alert'], observed=True).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=alert_types, fill_value=0)
+    counts.index = counts.index.astype(object)
+    counts.columns = [f'Alert_{alert_type.replace(" ", "_")}' for alert_type in alert_types]
+    return counts
+
+def _device_counts(tech_df, counts):
+    """Line up per-device alert counts with the technician rows by technician id (0 where none)."""
+    devices = {}
+    count_techs = tech_ids(counts.index, devices)
+    row_techs = _row_tech_ids(tech_df, 'Device', devices)
+    return counts.groupby(count_techs).sum().reindex(row_techs).fillna(0).astype('int64')
+
 def add_alert_data_to_techs(tech_df, alert_df):
     """
     Add alert summary data to technician records.
     
+    Alert counts are pivoted by device and alert type once and joined onto
+    the technician rows. An alert column already present keeps its value for
+    technicians without alerts of that type; Total_Alerts is always replaced.
+    
     Args:
         tech_df: DataFrame with technician data (must have Device column)
         alert_df: DataFrame with alert data (must have Device, Time, Alert columns)
@@ -245,31 +551,42 @@ def add_alert_data_to_techs(tech_df, alert_df):
     # Create a copy to avoid modifying the original
     result_df = tech_df.copy()
     
-    # Create columns for alert counts if they don't exist
-    alert_types = alert_df['Alert'].unique()
-    for alert_type in alert_types:
-        col_name = f'Alert_{alert_type.replace(" ", "_")}'
-        if col_name not in result_df.columns:
-            result_df[col_name] = 0
+    counts = _device_counts(result_df, alert_count_table(alert_df))
+    for col in counts.columns:
+        values = counts[col].to_numpy()
+        if col in result_df.columns:
+            result_df[col] = np.where(values > 0, values, result_df[col].to_numpy())
+        else:
+            result_df[col] = values
     
-    # Add total alerts column
-    if 'Total_Alerts' not in result_df.columns:
-        result_df['Total_Alerts'] = 0
+    # Total alerts is the row sum of the device's counts
+    result_df['Total_Alerts'] = counts.sum(axis=1).to_numpy()
     
-    # Group alerts by device and type
-    alert_counts = alert_df.groupby(['Device', 'Alert']).size().reset_index(name='count')
+    return result_df
+
+def add_alert_batch_to_techs(result_df, alert_batch):
+    """
+    Add the alerts of a new batch to technician alert counts.
     
-    # Update technician records with alert counts
-    for idx, tech in result_df.iterrows():
-        # Get device alerts
-        device_alerts = alert_counts[alert_counts['Device'] == tech['Device']]
-        
-        # Update alert counts
-        for _, alert in device_alerts.iterrows():
-            col_name = f'Alert_{alert["Alert"].replace(" ", "_")}'
-            result_df.at[idx, col_name] = alert['count']
+    Only the batch is counted, so a running summary of a long alert log can
+    be kept up to date without recounting its history.
+    
+    Args:
+        result_df: DataFrame from add_alert_data_to_techs() or an earlier call
+        alert_batch: DataFrame with the new alerts (must have Device, Alert columns)
         
-        # Update total alerts
-        result_df.at[idx, 'Total_Alerts'] = device_alerts['count'].sum() if len(device_alerts) > 0 else 0
+    Returns:
+        DataFrame with the batch's counts added
+    """
+    # Create a copy to avoid modifying the original
+    result_df = result_df.copy()
     
-    return result_df 
\ No newline at end of file
+    counts = _device_counts(result_df, alert_count_table(alert_batch))
+    for col in counts.columns:
+        existing = result_df[col].to_numpy() if col in result_df.columns else 0
+        result_df[col] = existing + counts[col].to_numpy()
+    
+    existing = result_df['Total_Alerts'].to_numpy() if 'Total_Alerts' in result_df.columns else 0
+    result_df['Total_Alerts'] = existing + counts.sum(axis=1).to_numpy()
+    
+    return result_df
@@ -0,0 +1,132 @@
+"""
+Persistent job <-> invoice index.
+
+Type6 jobs and Sales Journal lines carry the integer InvoiceKey their loaders
+derive from the invoice number. The index records, for every (InvoiceKey,
+TechCode) pair seen on either side, whether a job and a sale exist for it, and
+is updated with each new export's keys as it is ingested, so the match status
+of the whole history is known without joining the full tables again.
+
+The index reports match status ('prepare_data.py ingest'); revenue is
+attributed from the loaded frames by integrator.sales_revenue_columns().
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import PROCESSED_DIR
+from src.data_processing.cache import PROJECT_ROOT, read_cached, write_cached
+from src.data_processing.schemas import INVOICE_KEY
+
+INVOICE_INDEX_KEY = 'invoice_index'
+INVOICE_INDEX_DIR = os.path.join(PROJECT_ROOT, PROCESSED_DIR)
+
+# Match status of an index entry
+MATCHED = 'MATCHED'
+JOB_ONLY = 'JOB_ONLY'
+SALE_ONLY = 'SALE_ONLY'
+INVOICE_STATUSES = [MATCHED, JOB_ONLY, SALE_ONLY]
+
+# Technician column of each side: family -> (column, index flag)
+INVOICE_SIDES = {
+    'type6': ('TechCode', 'HasJob'),
+    'sales': ('Technician', 'HasSale')
+}
+
+def invoice_pairs(df, tech_col):
+    """
+    List the distinct (InvoiceKey, TechCode) pairs of a frame.
+
+    Args:
+        df: DataFrame with an InvoiceKey column
+        tech_col: Technician code column
+
+    Returns:
+        DataFrame with InvoiceKey (int64) and TechCode (upper-case text)
+        columns; rows without a key are left out
+    """
+    if df is None or df.empty or INVOICE_KEY not in df.columns or tech_col not in df.columns:
+        return pd.DataFrame({INVOICE_KEY: np.array([], dtype='int64'), 'TechCode': np.array([], dtype=object)})
+
+    keys = df[INVOICE_KEY]
+    has_key = keys.notna().to_numpy()
+    techs = df[tech_col].astype(object).to_numpy()[has_key]
+    pairs = pd.DataFrame({
+        INVOICE_KEY: keys.to_numpy()[has_key].astype('int64'),
+        'TechCode': pd.Series(techs, dtype=object).fillna('').astype(str).str.strip().str.upper().to_numpy()
+    })
+    return pairs.drop_duplicates().reset_index(drop=True)
+
+def _empty_index():
+    return pd.DataFrame({
+        INVOICE_KEY: np.array([], dtype='int64'), 'TechCode': np.array([], dtype=object),
+        'HasJob': np.array([], dtype=bool), 'HasSale': np.array([], dtype=bool),
+        'Status': pd.Categorical([], categories=INVOICE_STATUSES)
+    })
+
+def load_invoice_index():
+    """
+    Load the job <-> invoice index.
+
+    Returns:
+        DataFrame with InvoiceKey, TechCode, HasJob, HasSale and Status columns,
+        sorted by InvoiceKey and TechCode (empty if nothing was indexed)
+    """
+    index = read_cached(INVOICE_INDEX_KEY, INVOICE_INDEX_DIR)
+    return _empty_index() if index is None else index
+
+def update_invoice_index(family, df):
+    """
+    Record the invoice pairs of newly loaded rows in the index.
+
+    Only pairs the index does not hold yet, or holds without this side, change
+    it; the index is rewritten only when something changed.
+
+    Args:
+        family: 'type6' or 'sales'
+        df: DataFrame loaded for the family
+
+    Returns:
+        Number of index entries added or updated
+    """
+    if family not in INVOICE_SIDES:
+        return 0
+    tech_col, flag = INVOICE_SIDES[family]
+    pairs = invoice_pairs(df, tech_col)
+    if pairs.empty:
+        return 0
+
+    index = load_invoice_index()
+    position = pd.MultiIndex.from_frame(index[[INVOICE_KEY, 'TechCode']]).get_indexer(
+        pd.MultiIndex.from_frame(pairs)
+    )
+    known = position >= 0
+    changed = position[known][~index[flag].to_numpy()[position[known]]]
+    new = pairs[~known]
+    if len(changed) == 0 and new.empty:
+        return 0
+
+    index[flag] = index[flag].to_numpy() | np.isin(np.arange(len(index)), changed)
+    new = new.assign(HasJob=flag == 'HasJob', HasSale=flag == 'HasSale')
+    index = pd.concat([index.drop(columns='Status'), new], ignore_index=True)
+    index = index.sort_values([INVOICE_KEY, 'TechCode'], kind='stable').reset_index(drop=True)
+    index['Status'] = pd.Categorical(
+        np.select([index['HasJob'] & index['HasSale'], index['HasJob']], [MATCHED, JOB_ONLY], SALE_ONLY),
+        categories=INVOICE_STATUSES
+    )
+
+    write_cached(INVOICE_INDEX_KEY, index, INVOICE_INDEX_DIR, max_mb=None)
+    return len(changed) + len(new)
+
+def invoice_status_counts():
+    """
+    Count the index entries by match status.
+
+    Returns:
+        Series of entry counts indexed by status
+    """
+    return load_invoice_index()['Status'].value_counts().reindex(INVOICE_STATUSES, fill_value=0)
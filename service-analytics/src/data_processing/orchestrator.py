@@ -0,0 +1,146 @@
+"""
+Parallel orchestration of independent file loads.
+
+Each load runs an importer function in a worker process. The worker writes
+its result to a temporary Arrow IPC file and only the file name goes back
+through the pipe, so nothing large is pickled. A cold start then takes about
+as long as the slowest file rather than the sum of all of them.
+"""
+
+import os
+import sys
+import time
+import atexit
+import tempfile
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import LOADER_WORKERS
+from src.data_processing.cache import PARQUET_AVAILABLE, write_frame_ipc, read_frame_ipc
+
+# Worker pool shared by every run_loads() call in this process
+_executor = None
+_executor_workers = None
+
+def _get_executor(workers):
+    """Return the shared process pool, (re)creating it for a new worker count."""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+def _shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+atexit.register(_shutdown_executor)
+
+def _run_load(func, args, kwargs):
+    """Worker side of a load: run the importer, time it and write the result."""
+    start = time.perf_counter()
+    df = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    
+    fd, path = tempfile.mkstemp(prefix='load-', suffix='.arrow')
+    os.close(fd)
+    write_frame_ipc(df, path)
+    return path, seconds
+
+def _collect_load(path):
+    """Parent side of a load: read the worker's result and remove its file."""
+    try:
+        return read_frame_ipc(path)
+    finally:
+        os.remove(path)
+
+def run_loads(tasks, workers=LOADER_WORKERS):
+    """
+    Run independent load tasks, in parallel when more than one worker is allowed.
+
+    Args:
+        tasks: Dictionary of name -> (function, args, kwargs); the function must
+            be importable at module level (e.g. an importer from importers.py)
+        workers: Number of worker processes, capped at the CPU count (1 or less
+            loads in this process)
+
+    Returns:
+        Tuple of (dictionary of name -> DataFrame, DataFrame of per-file timings
+        with Name, Seconds and Rows columns)
+    """
+    results = {}
+    seconds = {}
+    start = time.perf_counter()
+
+    # Results travel as Arrow IPC files, so the pool needs pyarrow
+    workers = min(workers, os.cpu_count() or 1)
+    use_pool = PARQUET_AVAILABLE and workers > 1 and len(tasks) > 1
+    if use_pool:
+        try:
+            executor = _get_executor(workers)
+            futures = {
+                name: executor.submit(_run_load, func, args, kwargs)
+                for name, (func, args, kwargs) in tasks.items()
+            }
+            for name, future in futures.items():
+                try:
+                    path, seconds[name] = future.result()
+                    results[name] = _collect_load(path)
+                except Exception as e:
+                    print(f"Parallel load of {name} failed, loading in process: {e}")
+        except Exception as e:
+            print(f"Could not start the loader pool, loading in process: {e}")
+            _shutdown_executor()
+
+    # Sequential path, also used for anything the pool could not load
+    for name, (func, args, kwargs) in tasks.items():
+        if name not in results:
+            task_start = time.perf_counter()
+            results[name] = func(*args, **kwargs)
+            seconds[name] = time.perf_counter() - task_start
+
+    timings = pd.DataFrame({
+        'Name': list(tasks),
+        'Seconds': [seconds[name] for name in tasks],
+        'Rows': [len(results[name]) for name in tasks]
+    })
+
+    total = time.perf_counter() - start
+    if len(timings):
+        slowest = timings.loc[timings['Seconds'].idxmax()]
+        print(f"Loaded {len(tasks)} files in {total:.2f}s with {workers if use_pool else 1} worker(s); "
+              f"slowest {slowest['Name']} took {slowest['Seconds']:.2f}s")
+
+    return results, timings
+
+def map_chunks(func, chunks, workers=LOADER_WORKERS):
+    """
+    Apply a function to chunks of work on the shared worker pool.
+
+    Meant for many small CPU-bound problems batched into a few chunks, whose
+    arguments and results pickle cheaply.
+
+    Args:
+        func: Function of one chunk; must be importable at module level
+        chunks: List of chunk arguments
+        workers: Number of worker processes, capped at the CPU count (1 or less
+            runs in this process)
+
+    Returns:
+        List of results, in chunk order
+    """
+    workers = min(workers, os.cpu_count() or 1)
+    if workers > 1 and len(chunks) > 1:
+        try:
+            executor = _get_executor(workers)
+            return list(executor.map(func, chunks))
+        except Exception as e:
+            print(f"Parallel run failed, running in process: {e}")
+            _shutdown_executor()
+    return [func(chunk) for chunk in chunks]
@@ -0,0 +1,335 @@
+"""
+Vectorized parsers for the value formats used in the source exports.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import LOCAL_TIMEZONE
+
+# Matches GPS unit durations ('13h 36m 13s', '5m 26s', '0s'), colon durations
+# ('2:30:15', '30:15') and bare second counts ('45')
+DURATION_PATTERN = re.compile(
+    r'^\s*(?:'
+    r'(?:(?P<days>\d+)\s*d)?\s*(?:(?P<hours>\d+)\s*h)?\s*(?:(?P<minutes>\d+)\s*m)?\s*(?:(?P<seconds>\d+)\s*s)?'
+    r'|(?P<colon_a>\d+):(?P<colon_b>\d+)(?::(?P<colon_c>\d+(?:\.\d*)?))?'
+    r'|(?P<bare>\d+(?:\.\d*)?)'
+    r')\s*$',
+    re.IGNORECASE
+)
+
+# Matches invoice numbers, ignoring a leading '#', leading zeros and a '.0'
+# left by a float round trip ('08804', '#8804', '8804.0')
+INVOICE_PATTERN = r'^\s*#?\s*0*(\d+)(?:\.0*)?\s*$'
+
+# Matches GPS positions ('38.342537°, -122.707999°')
+COORDINATE_PATTERN = r'^\s*(-?\d+(?:\.\d+)?)\s*°?\s*,\s*(-?\d+(?:\.\d+)?)\s*°?\s*$'
+
+def parse_durations(values):
+    """
+    Convert a column of duration strings to whole seconds.
+
+    Each distinct string is parsed once with a single regex extraction and the
+    parts are combined with integer arithmetic. Missing or unrecognized values
+    become 0.
+
+    Args:
+        values: Series or array-like of duration strings
+
+    Returns:
+        int32 Series of seconds (aligned to the input index if a Series)
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).to_numpy())
+
+    seconds = np.zeros(len(uniques), dtype=np.int64)
+    if len(uniques) > 0:
+        parts = pd.Series(uniques, dtype=object).astype(str).str.extract(DURATION_PATTERN)
+
+        # Colon durations are HH:MM:SS with three parts and MM:SS with two
+        colon_hms = parts['colon_c'].notna().to_numpy()
+        parts = parts.apply(pd.to_numeric, errors='coerce').fillna(0)
+
+        unit_seconds = (parts['days'] * 86400 + parts['hours'] * 3600 +
+                        parts['minutes'] * 60 + parts['seconds'])
+        colon_seconds = np.where(
+            colon_hms,
+            parts['colon_a'] * 3600 + parts['colon_b'] * 60 + parts['colon_c'],
+            parts['colon_a'] * 60 + parts['colon_b']
+        )
+
+        seconds = np.floor(unit_seconds + colon_seconds + parts['bare']).to_numpy().astype(np.int64)
+
+    # Missing values have code -1, which picks up the trailing zero
+    result = np.append(seconds, 0)[codes].astype(np.int32)
+    return pd.Series(result, index=index, name=getattr(values, 'name', None))
+
+# Timestamp formats used by each GPS export, keyed by load_gps_tracking file type.
+# CLOCK_TIME columns hold a zone-suffixed time of day ('07:45:41 AM PST') that is
+# combined with the row's Date; LOCAL_TIMESTAMP columns hold a full local
+# timestamp without a zone ('12/31/2024 06:09:28 PM').
+GPS_DATE_FORMAT = '%m/%d/%Y'
+GPS_CLOCK_FORMAT = '%I:%M:%S %p'
+GPS_TIMESTAMP_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+DATE, CLOCK_TIME, LOCAL_TIMESTAMP = 'date', 'clock_time', 'local_timestamp'
+
+GPS_TIME_FORMATS = {
+    'day_start_end': {'Date': DATE, 'Start Time': CLOCK_TIME, 'End Time': CLOCK_TIME},
+    'drives_stops': {'Start Time': LOCAL_TIMESTAMP, 'End Time': LOCAL_TIMESTAMP},
+    'day_engine': {'Date': DATE},
+    'idle_time': {'Start Time': LOCAL_TIMESTAMP, 'End Time': LOCAL_TIMESTAMP},
+    'alert': {'Time': LOCAL_TIMESTAMP}
+}
+
+# UTC offsets of the zone suffixes found in GPS exports
+ZONE_OFFSETS = {
+    'PST': pd.Timedelta(hours=-8),
+    'PDT': pd.Timedelta(hours=-7)
+}
+
+def parse_invoice_keys(values):
+    """
+    Normalize invoice numbers to integer keys.
+
+    Spellings of the same invoice ('08804', ' 8804', '8804.0') get the same
+    key, so ServiceDesk jobs and journal lines join on integers. Each distinct
+    value is parsed once.
+
+    Args:
+        values: Series or array-like of invoice numbers (text or numeric)
+
+    Returns:
+        Int64 Series of keys, <NA> where the value is missing or not a number
+        (aligned to the input index if a Series)
+    """
+    index = values.index if isinstance(values, pd.Series) else None
+    if pd.api.types.is_integer_dtype(values):
+        return pd.Series(values, index=index).astype('Int64')
+
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).to_numpy())
+    digits = pd.Series(uniques, dtype=object).astype(str).str.extract(INVOICE_PATTERN)[0]
+    unique_keys = pd.to_numeric(digits, errors='coerce').astype('Int64').array
+
+    keys = unique_keys.take(codes, allow_fill=True)
+    return pd.Series(keys, index=index, dtype='Int64')
+
+def parse_coordinates(values):
+    """
+    Split a column of GPS position strings into latitude and longitude.
+
+    Args:
+        values: Series or array-like of position strings
+
+    Returns:
+        Tuple of float64 arrays (latitude, longitude) in degrees; missing or
+        unrecognized positions are NaN
+    """
+    parts = pd.Series(values, dtype=object).astype(str).str.extract(COORDINATE_PATTERN)
+    latitude = pd.to_numeric(parts[0], errors='coerce').to_numpy(dtype='float64')
+    longitude = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype='float64')
+    return latitude, longitude
+
+def _fixed_width_codes(values, width):
+    """
+    View strings of an exact width as a matrix of character codes.
+
+    Returns:
+        Tuple of (mask of rows with the exact width, int matrix of codes)
+    """
+    # One spare column tells strings of exactly `width` characters from longer ones
+    codes = np.asarray(pd.Series(values, dtype=object).to_numpy(), dtype=f'U{width + 1}')
+    codes = codes.view(np.int32).reshape(-1, width + 1)
+    fits = (codes[:, width] == 0) & (codes[:, width - 1] != 0)
+    return fits, codes[:, :width]
+
+def _digits(codes, positions):
+    """Read the decimal number spelled by the digits at the given positions."""
+    number = np.zeros(len(codes), dtype=np.int64)
+    valid = np.ones(len(codes), dtype=bool)
+    for pos in positions:
+        digit = codes[:, pos] - ord('0')
+        valid &= (digit >= 0) & (digit <= 9)
+        number = number * 10 + digit
+    return number, valid
+
+def _parse_date_codes(codes, start=0):
+    """Parse 'MM/DD/YYYY' at a column offset into datetime64[D] and a validity mask."""
+    month, ok_m = _digits(codes, [start, start + 1])
+    day, ok_d = _digits(codes, [start + 3, start + 4])
+    year, ok_y = _digits(codes, [start + 6, start + 7, start + 8, start + 9])
+    valid = (ok_m & ok_d & ok_y &
+             (codes[:, start + 2] == ord('/')) & (codes[:, start + 5] == ord('/')) &
+             (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31))
+
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    # Reject days past the end of the month (e.g. 02/30)
+    valid &= dates.astype('datetime64[M]') == months
+    return dates, valid
+
+def _parse_clock_codes(codes, start=0):
+    """Parse 'HH:MM:SS AM' at a column offset into timedelta64[s] and a validity mask."""
+    hour, ok_h = _digits(codes, [start, start + 1])
+    minute, ok_m = _digits(codes, [start + 3, start + 4])
+    second, ok_s = _digits(codes, [start + 6, start + 7])
+    meridiem = codes[:, start + 9]
+    valid = (ok_h & ok_m & ok_s &
+             (codes[:, start + 2] == ord(':')) & (codes[:, start + 5] == ord(':')) &
+             (codes[:, start + 8] == ord(' ')) & (codes[:, start + 10] == ord('M')) &
+             ((meridiem == ord('A')) | (meridiem == ord('P'))) &
+             (hour >= 1) & (hour <= 12) & (minute <= 59) & (second <= 59))
+
+    hour = hour % 12 + np.where(meridiem == ord('P'), 12, 0)
+    return (hour * 3600 + minute * 60 + second).astype('timedelta64[s]'), valid
+
+def parse_local_timestamps(values, fmt=GPS_TIMESTAMP_FORMAT, timezone=LOCAL_TIMEZONE):
+    """
+    Parse zone-less local timestamps into tz-aware UTC instants.
+
+    Values in the fixed-width GPS layout ('12/31/2024 06:09:28 PM') are decoded
+    with integer arithmetic on their character codes; anything else falls back
+    to pd.to_datetime with the given format. Nonexistent times in the
+    spring-forward gap are shifted forward; ambiguous times in the fall-back
+    hour are read as the first (daylight) occurrence.
+
+    Args:
+        values: Series of timestamp strings
+        fmt: strftime format of the strings
+        timezone: Time zone the timestamps were recorded in
+
+    Returns:
+        Series of datetime64[ns, UTC]
+    """
+    values = pd.Series(values, dtype=object)
+    local = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    fast = np.zeros(len(values), dtype=bool)
+    if fmt == GPS_TIMESTAMP_FORMAT:
+        fits, codes = _fixed_width_codes(values, 22)
+        dates, date_ok = _parse_date_codes(codes, 0)
+        clock, clock_ok = _parse_clock_codes(codes, 11)
+        fast = fits & date_ok & clock_ok & (codes[:, 10] == ord(' '))
+        local[fast] = dates[fast] + clock[fast]
+
+    slow = ~fast & values.notna().to_numpy()
+    if slow.any():
+        local[slow] = pd.to_datetime(values[slow], format=fmt, errors='coerce').to_numpy()
+
+    local = pd.Series(local, index=values.index).dt.tz_localize(
+        timezone,
+        ambiguous=np.ones(len(local), dtype=bool),
+        nonexistent='shift_forward'
+    )
+    return local.dt.tz_convert('UTC')
+
+def parse_clock_times(dates, values, fmt=GPS_CLOCK_FORMAT, timezone=LOCAL_TIMEZONE):
+    """
+    Combine dates with zone-suffixed clock times into tz-aware UTC instants.
+
+    The time of day is parsed as an offset from midnight and added to the date
+    arithmetically; the PST/PDT suffix then gives the exact UTC offset. Values
+    without a recognized suffix are localized to the given time zone.
+
+    Args:
+        dates: Series of dates (datetime64, midnight)
+        values: Series of clock time strings like '07:45:41 AM PST'
+        fmt: strftime format of the clock time without the zone suffix
+        timezone: Time zone for values without a recognized suffix
+
+    Returns:
+        Series of datetime64[ns, UTC]
+    """
+    values = pd.Series(values, dtype=object)
+    time_of_day = np.full(len(values), np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    offset = np.full(len(values), np.timedelta64('NaT'), dtype='timedelta64[ns]')
+
+    # Fast path for the fixed-width GPS layout
+    fast = np.zeros(len(values), dtype=bool)
+    if fmt == GPS_CLOCK_FORMAT:
+        fits, codes = _fixed_width_codes(values, 15)
+        clock, clock_ok = _parse_clock_codes(codes, 0)
+        fast = fits & clock_ok & (codes[:, 11] == ord(' '))
+        time_of_day[fast] = clock[fast]
+        for zone, zone_offset in ZONE_OFFSETS.items():
+            in_zone = fast & (codes[:, 12] == ord(zone[0])) & (codes[:, 13] == ord(zone[1])) & (codes[:, 14] == ord(zone[2]))
+            offset[in_zone] = zone_offset.to_timedelta64()
+
+    slow = ~fast & values.notna().to_numpy()
+    if slow.any():
+        stripped = values[slow].astype(str).str.strip()
+        parts = stripped.str.rpartition(' ')
+        zone = parts[2].str.upper()
+        has_zone = zone.isin(list(ZONE_OFFSETS))
+        clock = parts[0].where(has_zone, stripped)
+        time_of_day[slow] = (pd.to_datetime(clock, format=fmt, errors='coerce') - pd.Timestamp('1900-01-01')).to_numpy()
+        offset[slow] = zone.where(has_zone).map(ZONE_OFFSETS).astype('timedelta64[ns]').to_numpy()
+
+    local = pd.Series(pd.to_datetime(dates).to_numpy() + time_of_day, index=values.index)
+    has_zone = ~np.isnat(offset)
+
+    result = (local - offset).dt.tz_localize('UTC')
+    if not has_zone.all():
+        localized = parse_local_timestamps(
+            local[~has_zone].dt.strftime('%Y-%m-%d %H:%M:%S'), '%Y-%m-%d %H:%M:%S', timezone
+        )
+        result = result.where(has_zone, localized)
+    return result
+
+def parse_gps_times(df, file_type):
+    """
+    Convert a GPS export's date and time columns using the format registry.
+
+    Date columns become naive calendar dates; time columns become tz-aware UTC
+    instants. In day_start_end rows, an End Time earlier than its Start Time
+    is taken to fall on the following day.
+
+    Args:
+        df: DataFrame with raw GPS columns (modified in place)
+        file_type: GPS file type key from GPS_TIME_FORMATS
+
+    Returns:
+        The DataFrame with converted columns
+    """
+    formats = GPS_TIME_FORMATS.get(file_type, {})
+
+    for col, kind in formats.items():
+        if col in df.columns and kind == DATE:
+            df[col] = pd.to_datetime(df[col], format=GPS_DATE_FORMAT, errors='coerce')
+
+    for col, kind in formats.items():
+        if col not in df.columns:
+            continue
+        if kind == CLOCK_TIME and 'Date' in df.columns:
+            df[col] = parse_clock_times(df['Date'], df[col])
+        elif kind == LOCAL_TIMESTAMP:
+            df[col] = parse_local_timestamps(df[col])
+
+    if formats.get('End Time') == CLOCK_TIME and 'Start Time' in df.columns and 'End Time' in df.columns:
+        wraps = df['End Time'] < df['Start Time']
+        df.loc[wraps, 'End Time'] = df.loc[wraps, 'End Time'] + pd.Timedelta(days=1)
+
+    return df
+
+def to_local_time(values, timezone=LOCAL_TIMEZONE):
+    """
+    Express timestamps as naive local wall-clock times.
+
+    Use this before comparing GPS instants with ServiceDesk dates or sidebar
+    filters, which are naive local times. Naive input is returned unchanged.
+
+    Args:
+        values: Series of datetime64 values
+        timezone: Local time zone
+
+    Returns:
+        Series of naive datetime64[ns]
+    """
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert(timezone).dt.tz_localize(None)
+    return values
@@ -0,0 +1,156 @@
+"""
+Declared column types for each data source.
+
+Loaders pass these to pd.read_csv so columns come out typed at parse time:
+categoricals for low-cardinality codes, downcast numerics where the values
+allow it, and nullable booleans for Yes/No flags. Columns that are not listed
+keep pandas' default inference.
+"""
+
+# Integer invoice key the loaders add next to each invoice number column
+INVOICE_KEY = 'InvoiceKey'
+
+# Categorical technician id the loaders add next to each technician column
+TECH_ID = 'TechId'
+
+# Special schema types
+CATEGORY = 'category'
+FLAG = 'flag'  # Yes/No or True/False text read as a nullable boolean
+TEXT = 'text'  # Free text, stripped, with missing values kept as the string 'nan'
+
+# Text values accepted for FLAG columns (anything else becomes <NA>)
+FLAG_VALUES = {
+    'True': True, 'False': False, 'Yes': True, 'No': False,
+    'true': True, 'false': False, 'yes': True, 'no': False
+}
+
+TYPE6_SCHEMA = {
+    'InvNmbr': 'Int32',
+    'Status': CATEGORY,
+    'ShopJob?': FLAG,
+    'CurrentAppmnt?': FLAG,
+    'Triaged?': FLAG,
+    'NmLst': TEXT,
+    'NmFrst': TEXT,
+    'Address': TEXT,
+    'CityStateZip': TEXT,
+    'Type': CATEGORY,
+    'Make': CATEGORY,
+    'Department': CATEGORY,
+    'TechCode': CATEGORY,
+    'OriginDesk': CATEGORY,
+    'DysOrgnToPrsntIfNotCmplt': 'float32',
+    'DysOrgnToFrstAppmnt': 'float32',
+    'DysOrgnToCmpltn': 'float32',
+    'DysFrstAppmntToCmpltn': 'float32',
+    'HowManyVisits': CATEGORY,
+    'CompletedOnFirstTrip': FLAG,
+    'JobCanceled': FLAG,
+    'QtyOfTimesAppmntChanged': 'Int16',
+    'TtlPartQty': 'Int16',
+    'TotalMateriaInSale': 'float64',
+    'TotalLaborInSale': 'float64',
+    'WorkDescription': TEXT
+}
+
+# Part1..Part5 line items
+for _n in range(1, 6):
+    TYPE6_SCHEMA.update({
+        f'Part{_n}Qty': 'float32',
+        f'Part{_n}QtdWhlsl': 'float64',
+        f'Part{_n}QtdRtl': 'float64',
+        f'Part{_n}Cost': 'float64',
+        f'Part{_n}BinLoc': CATEGORY,
+        f'Usage{_n}': CATEGORY
+    })
+
+SALES_SCHEMA = {
+    'Technician': CATEGORY,
+    'CustomerName': 'str',
+    'InvoiceNumber': 'str',
+    'MerchandiseSold': 'float64',
+    'PartsSold': 'float64',
+    'SCallSold': 'float64',
+    'LaborSold': 'float64',
+    'ImpliedTax': 'float64',
+    'TotalSale': 'float64',
+    'PayCode': 'float64',
+    'Department': 'Int8',
+    'ZipCode': CATEGORY,
+    'Extra_1': CATEGORY  # Journal rows carry one value more than the header
+}
+
+TECHREV_SCHEMA = {
+    'InvoiceNumber': 'str',
+    'Technician': CATEGORY,
+    'Customer': 'str',
+    'Merchandise': 'float64',
+    'Parts': 'float64',
+    'S.Call': 'float64',
+    'Labor': 'float64',
+    'Total': 'float64',
+    'PayCode': 'Int8',
+    'Dept (if applicable)': CATEGORY
+}
+
+# GPS exports, keyed by load_gps_tracking file type. Date and time columns are
+# converted separately by parsers.parse_gps_times.
+GPS_SCHEMAS = {
+    'day_start_end': {
+        'Device': CATEGORY,
+        'Status': CATEGORY,
+        'Duration': CATEGORY,
+        'Distance (mi)': 'float32',
+        'Top Speed (mph)': 'float32',
+        'Average Speed (mph)': 'float32',
+        'Zone Name(s)': CATEGORY,
+        'Stopped Engine Idle': CATEGORY,
+        'Odometer (mi)': 'float64'
+    },
+    'drives_stops': {
+        'Device': CATEGORY,
+        'Status': CATEGORY,
+        'Duration': CATEGORY,
+        'Length (mi)': 'float32',
+        'Top speed (mph)': 'float32',
+        'Avg Speed (mph)': 'float32',
+        'Zone name': CATEGORY,
+        'Engine idle': CATEGORY,
+        'Odometer (mi)': 'float64'
+    },
+    'day_engine': {
+        'Device': CATEGORY
+    },
+    'idle_time': {
+        'Device': CATEGORY,
+        'Driver(s)': CATEGORY,
+        'Duration': CATEGORY,
+        'Zone(s)': CATEGORY
+    },
+    'alert': {
+        'Device': CATEGORY,
+        'Alert': CATEGORY,
+        'Driver(s)': CATEGORY,
+        'Speed (mph)': 'float32'
+    }
+}
+
+# Column holding each GPS export's recorded position ('38.342537°, -122.707999°')
+GPS_COORDINATE_COLUMNS = {
+    'day_start_end': 'Lat/Lng',
+    'drives_stops': 'Lat lng',
+    'idle_time': 'Position',
+    'alert': 'Lat/Lng'
+}
+
+def merge_projections(*column_lists):
+    """
+    Combine the column lists declared by several processing stages.
+    
+    Args:
+        *column_lists: Lists of column names
+        
+    Returns:
+        List of the distinct columns, in first-seen order
+    """
+    return list(dict.fromkeys(col for columns in column_lists for col in columns))
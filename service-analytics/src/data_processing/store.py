@@ -0,0 +1,332 @@
+"""
+Persistent row store for incremental ingestion of overlapping exports.
+
+Monthly exports repeat most of the previous month's rows. Each family keeps
+one store of the rows ingested so far, fingerprinted by the family's natural
+key (see catalog.FAMILIES). Ingesting an export appends only its new or
+changed rows as a new Parquet part, and files already ingested are skipped by
+content hash, so a refresh costs about as much as the new data rather than
+the whole history.
+"""
+
+import os
+import sys
+import shutil
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from config.settings import PROCESSED_DIR, STORE_MAX_PARTS
+from src.data_processing.cache import PROJECT_ROOT, read_cached, write_cached, load_state, save_state
+from src.data_processing.catalog import FAMILIES, GPS_FAMILIES
+from src.data_processing.importers import (
+    load_type6_report, load_sales_journal, load_tech_revenue, load_gps_tracking, concat_typed,
+    TYPE6_LOADER_VERSION, SALES_LOADER_VERSION, TECHREV_LOADER_VERSION, GPS_LOADER_VERSION
+)
+from src.data_processing.invoices import update_invoice_index
+from src.data_processing.events import update_event_log
+from src.data_processing.orchestrator import run_loads
+from src.data_processing.parsers import to_local_time
+
+STORE_DIR = os.path.join(PROJECT_ROOT, PROCESSED_DIR, 'store')
+
+# Bookkeeping columns stored with every row
+KEY_COLUMN = '_RowKey'
+HASH_COLUMN = '_RowHash'
+
+# Importer for each family: (function, extra args after the path, loader version).
+# A new loader version rebuilds the family's store from its files.
+FAMILY_LOADERS = {
+    'type6': (load_type6_report, (), TYPE6_LOADER_VERSION),
+    'sales': (load_sales_journal, (), SALES_LOADER_VERSION),
+    'techrev': (load_tech_revenue, (), TECHREV_LOADER_VERSION)
+}
+for _family in GPS_FAMILIES:
+    FAMILY_LOADERS[_family] = (load_gps_tracking, (_family,), GPS_LOADER_VERSION)
+
+def row_keys(df, key_columns):
+    """
+    Fingerprint each row by its natural key.
+
+    Rows repeating a key within one export are told apart by their occurrence
+    number, so none of them is lost.
+
+    Args:
+        df: DataFrame of one export
+        key_columns: Natural key columns
+
+    Returns:
+        Array of uint64 key hashes, one per row
+    """
+    keys = df[key_columns].reset_index(drop=True)
+    keys['Occurrence'] = keys.groupby(key_columns, observed=True, dropna=False, sort=False).cumcount()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+def row_hashes(df):
+    """
+    Fingerprint each row by all of its values, to detect changed rows.
+
+    Args:
+        df: DataFrame of one export
+
+    Returns:
+        Array of uint64 row hashes, one per row
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def _family_dir(family):
+    return os.path.join(STORE_DIR, family)
+
+def _part_names(family):
+    """List a family's store parts, oldest first."""
+    family_dir = _family_dir(family)
+    if not os.path.isdir(family_dir):
+        return []
+    return sorted(name[:-len('.parquet')] for name in os.listdir(family_dir) if name.endswith('.parquet'))
+
+def _read_index(family, parts):
+    """
+    Read the key and row hashes of every stored row.
+
+    Returns:
+        DataFrame with KEY_COLUMN, HASH_COLUMN, Part (position in parts) and
+        Latest (the row is the newest version of its key) columns
+    """
+    frames = []
+    for number, part in enumerate(parts):
+        frame = read_cached(part, _family_dir(family), columns=[KEY_COLUMN, HASH_COLUMN])
+        if frame is None:
+            raise IOError(f"Store part {part} of {family} is unreadable")
+        frames.append(frame.assign(Part=number))
+
+    if not frames:
+        return pd.DataFrame({KEY_COLUMN: np.array([], dtype='uint64'),
+                             HASH_COLUMN: np.array([], dtype='uint64'),
+                             'Part': np.array([], dtype=int), 'Latest': np.array([], dtype=bool)})
+
+    index = pd.concat(frames, ignore_index=True)
+    index['Latest'] = ~index[KEY_COLUMN].duplicated(keep='last')
+    return index
+
+def _write_part(family, df, parts):
+    """Write rows as the family's next store part; returns True if written."""
+    number = int(parts[-1].split('-')[1]) + 1 if parts else 1
+    return write_cached(f"part-{number:05d}", df, _family_dir(family), max_mb=None)
+
+def ingest_frame(family, df, replace_changed=True):
+    """
+    Append the new and changed rows of one export to a family's store.
+
+    Args:
+        family: Family name from FAMILIES
+        df: DataFrame loaded from one export of the family
+        replace_changed: Store new versions of rows whose key is already
+            stored (False only adds rows with new keys)
+
+    Returns:
+        Number of rows appended
+    """
+    key_columns = FAMILIES[family]['key']
+    if df is None or df.empty or not set(key_columns).issubset(df.columns):
+        return 0
+
+    keys = row_keys(df, key_columns)
+    hashes = row_hashes(df)
+
+    parts = _part_names(family)
+    index = _read_index(family, parts)
+    latest = index[index['Latest']]
+
+    # Look every row up among the latest stored versions
+    position = pd.Index(latest[KEY_COLUMN].to_numpy()).get_indexer(keys)
+    known = position >= 0
+    changed = np.zeros(len(df), dtype=bool)
+    changed[known] = latest[HASH_COLUMN].to_numpy()[position[known]] != hashes[known]
+    fresh = ~known | (changed & replace_changed)
+
+    if not fresh.any():
+        return 0
+
+    rows = df[fresh].reset_index(drop=True)
+    rows[KEY_COLUMN] = keys[fresh]
+    rows[HASH_COLUMN] = hashes[fresh]
+    return int(fresh.sum()) if _write_part(family, rows, parts) else 0
+
+def _read_parts(family, parts, start=None, end=None, columns=None):
+    """Read the latest version of each stored row, optionally within a date range."""
+    index = _read_index(family, parts)
+    date_column = FAMILIES[family]['date_column'][0]
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + [date_column, KEY_COLUMN, HASH_COLUMN]))
+
+    # A date-only end covers that whole day
+    if end is not None:
+        end = pd.Timestamp(end)
+        if end == end.normalize():
+            end += pd.Timedelta(days=1)
+
+    frames = []
+    for number, part in enumerate(parts):
+        df = read_cached(part, _family_dir(family), columns=columns)
+        if df is None:
+            raise IOError(f"Store part {part} of {family} is unreadable")
+
+        keep = index.loc[index['Part'] == number, 'Latest'].to_numpy()
+        if date_column in df.columns and pd.api.types.is_datetime64_any_dtype(df[date_column]):
+            dates = to_local_time(df[date_column])
+            if start is not None:
+                keep &= (dates >= pd.Timestamp(start)).to_numpy()
+            if end is not None:
+                keep &= (dates < end).to_numpy()
+        frames.append(df[keep])
+
+    return concat_typed(frames).reset_index(drop=True)
+
+def read_store(family, start=None, end=None, columns=None):
+    """
+    Read the ingested rows of a family.
+
+    Args:
+        family: Family name from FAMILIES
+        start: Start of the date range (None for unbounded)
+        end: End of the date range, inclusive (None for unbounded)
+        columns: Columns to read (None for all)
+
+    Returns:
+        DataFrame with the latest version of each row dated within the range,
+        or None if nothing has been ingested for the family
+    """
+    parts = _part_names(family)
+    if not parts:
+        return None
+
+    try:
+        df = _read_parts(family, parts, start, end, columns)
+    except Exception as e:
+        print(f"Error reading the {family} store: {e}")
+        return None
+
+    dropped = [KEY_COLUMN, HASH_COLUMN]
+    if columns is not None:
+        dropped += [col for col in df.columns if col not in columns]
+    return df.drop(columns=dropped, errors='ignore')
+
+def compact_store(family):
+    """
+    Rewrite a family's store as one part holding only the latest row versions.
+
+    Args:
+        family: Family name from FAMILIES
+
+    Returns:
+        Number of parts removed
+    """
+    parts = _part_names(family)
+    if len(parts) <= 1:
+        return 0
+
+    # The compacted part is numbered last, so it wins even if removal fails
+    if not _write_part(family, _read_parts(family, parts), parts):
+        return 0
+    for part in parts:
+        os.remove(os.path.join(_family_dir(family), part + '.parquet'))
+    return len(parts)
+
+def reset_store(family=None):
+    """
+    Remove the ingested rows and ingestion history of one or every family.
+
+    Args:
+        family: Family name from FAMILIES (None for all)
+    """
+    state = load_state('ingest', {})
+    for name in ([family] if family else list(FAMILY_LOADERS)):
+        shutil.rmtree(_family_dir(name), ignore_errors=True)
+        state.pop(name, None)
+    save_state('ingest', state)
+
+def ingest_catalog(catalog, families=None):
+    """
+    Ingest the cataloged files that are not in the store yet.
+
+    Files are ingested oldest range first so newer exports supply the latest
+    version of a changed row. Each family records a high-water mark, the end
+    of the newest range ingested; a file ending before it only adds rows with
+    new keys, so adding an old archive never overrides newer data.
+
+    Args:
+        catalog: DataFrame from catalog.scan_catalog()
+        families: Family names to ingest (None for all)
+
+    Returns:
+        DataFrame with Family, Path, Rows and Added columns, one row per file
+        ingested
+    """
+    state = load_state('ingest', {})
+    families = families or list(FAMILY_LOADERS)
+
+    pending = []
+    tasks = {}
+    for family in families:
+        loader, extra_args, version = FAMILY_LOADERS[family]
+        if state.get(family, {}).get('Version') != version:
+            # The loader's output changed, so rebuild from every file
+            shutil.rmtree(_family_dir(family), ignore_errors=True)
+            state[family] = {'Version': version, 'HighWater': None, 'Files': {}}
+
+        files = catalog[(catalog['Family'] == family) & ~catalog['Fingerprint'].isin(state[family]['Files'])]
+        files = files.sort_values(['End', 'Start', 'Archived'])
+        for _, entry in files.drop_duplicates('Fingerprint').iterrows():
+            pending.append((family, entry))
+            tasks[entry['Path']] = (loader, (entry['Path'],) + extra_args, {})
+
+    loaded, _ = run_loads(tasks) if tasks else ({}, None)
+
+    ingested = []
+    for family, entry in pending:
+        df = loaded[entry['Path']]
+        if df.empty:
+            print(f"Skipping {entry['Path']}: no rows loaded")
+            continue
+
+        family_state = state[family]
+        high_water = family_state['HighWater']
+        replace_changed = high_water is None or entry['End'] >= pd.Timestamp(high_water)
+        added = ingest_frame(family, df, replace_changed)
+        update_invoice_index(family, df)
+        update_event_log(family, df, replace_changed)
+
+        family_state['Files'][entry['Fingerprint']] = {
+            'Path': entry['Path'], 'Rows': len(df), 'Added': added
+        }
+        if replace_changed:
+            family_state['HighWater'] = entry['End'].isoformat()
+        save_state('ingest', state)
+        ingested.append({'Family': family, 'Path': entry['Path'], 'Rows': len(df), 'Added': added})
+
+        if len(_part_names(family)) > STORE_MAX_PARTS:
+            compact_store(family)
+
+    if ingested:
+        print(f"Ingested {len(ingested)} files, "
+              f"{sum(entry['Added'] for entry in ingested)} new or changed rows")
+    return pd.DataFrame(ingested, columns=['Family', 'Path', 'Rows', 'Added'])
+
+def ingest_status():
+    """
+    Summarize what has been ingested for each family.
+
+    Returns:
+        DataFrame with Family, Files, Added (rows appended) and HighWater columns
+    """
+    state = load_state('ingest', {})
+    status = []
+    for family, family_state in state.items():
+        status.append({
+            'Family': family,
+            'Files': len(family_state['Files']),
+            'Added': sum(entry['Added'] for entry in family_state['Files'].values()),
+            'HighWater': pd.Timestamp(family_state['HighWater']) if family_state['HighWater'] else pd.NaT
+        })
+    return pd.DataFrame(status, columns=['Family', 'Files', 'Added', 'HighWater'])
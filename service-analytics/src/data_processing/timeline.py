@@ -0,0 +1,236 @@
+"""
+Per-device interval timeline built from the GPS Driving/Stopped breakdowns.
+
+The day_start_end and drives_stops exports describe what each device was
+doing as a sequence of Driving and Stopped intervals. The timeline holds them
+as flat numpy arrays sorted by device and start time, with per-device offsets
+and per-status prefix sums of interval lengths, so time-in-status queries
+are binary searches rather than scans of the frames. One timeline is built
+per refresh and shared by job matching, idle analysis and utilization
+reporting.
+
+Times are naive local wall-clock times (see parsers.to_local_time) stored as
+int64 nanoseconds.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add the project root to the path so we can import config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from src.data_processing.addresses import address_keys, MISSING_ADDRESS
+from src.data_processing.parsers import to_local_time
+from src.data_processing.geofences import LOCATION_TAG, location_classes
+
+# Statuses in the GPS breakdowns
+DRIVING = 'Driving'
+STOPPED = 'Stopped'
+
+# Integer value of NaT
+NAT = np.iinfo(np.int64).min
+
+def _timestamps_ns(values):
+    """Convert datetime-like values to int64 local nanoseconds (NaT becomes NAT)."""
+    if isinstance(values, pd.Series):
+        values = to_local_time(values)
+    return np.asarray(pd.to_datetime(values), dtype='datetime64[ns]').astype(np.int64)
+
+def build_timeline(*frames):
+    """
+    Build the interval timeline of every device.
+
+    Where intervals overlap, the one starting first is kept whole (the one
+    from the earlier frame on equal starts) and the other is clipped, so
+    each device's intervals never overlap.
+
+    Args:
+        *frames: DataFrames with Device, Status, Start Time and End Time
+            columns (and Address and LocationTag when available), such as
+            drives_stops and day_start_end; None or empty frames are skipped
+
+    Returns:
+        Dictionary of arrays: 'devices' (sorted names), 'offsets' (device i
+        holds intervals offsets[i]:offsets[i + 1]), 'start' and 'end' (int64
+        ns), 'status' (codes into 'statuses'), 'location' (address keys,
+        MISSING_ADDRESS while driving), 'place' (location class codes into
+        'places', -1 where untagged), and 'prefix' (status -> cumulative
+        nanoseconds before each interval)
+    """
+    parts = []
+    for priority, df in enumerate(frames):
+        if df is None or df.empty or not {'Device', 'Status', 'Start Time', 'End Time'}.issubset(df.columns):
+            continue
+        parts.append(pd.DataFrame({
+            'Device': df['Device'].astype(object).to_numpy(),
+            'Status': df['Status'].astype(object).to_numpy(),
+            'Start': _timestamps_ns(df['Start Time']),
+            'End': _timestamps_ns(df['End Time']),
+            'Location': address_keys(df['Address']) if 'Address' in df.columns
+                        else np.full(len(df), MISSING_ADDRESS, dtype=np.int32),
+            'Place': np.asarray(location_classes(df[LOCATION_TAG]), dtype=object) if LOCATION_TAG in df.columns
+                     else np.full(len(df), None, dtype=object),
+            'Priority': priority
+        }))
+
+    if not parts:
+        parts.append(pd.DataFrame({
+            'Device': np.array([], dtype=object), 'Status': np.array([], dtype=object),
+            'Start': np.array([], dtype=np.int64), 'End': np.array([], dtype=np.int64),
+            'Location': np.array([], dtype=np.int32), 'Place': np.array([], dtype=object),
+            'Priority': np.array([], dtype=int)
+        }))
+    intervals = pd.concat(parts, ignore_index=True)
+    intervals = intervals[intervals['Device'].notna() & intervals['Status'].notna()
+                          & (intervals['Start'] != NAT) & (intervals['End'] != NAT)
+                          & (intervals['End'] > intervals['Start'])]
+    intervals = intervals.sort_values(['Device', 'Start', 'Priority'], kind='stable')
+
+    # Clip each interval to start after everything before it on its device
+    start = intervals['Start'].to_numpy(dtype=np.int64)
+    end = intervals['End'].to_numpy(dtype=np.int64)
+    device_names = intervals['Device'].to_numpy()
+    covered = intervals.groupby('Device', sort=False)['End'].cummax().to_numpy(dtype=np.int64)
+    previous = np.concatenate([[NAT], covered[:-1]])[:len(covered)]
+    same_device = np.concatenate([[False], device_names[1:] == device_names[:-1]])[:len(covered)]
+    start = np.where(same_device, np.maximum(start, previous), start)
+    keep = end > start
+    intervals = intervals[keep]
+    start, end = start[keep], end[keep]
+
+    devices, first = np.unique(intervals['Device'].to_numpy(dtype=object), return_index=True)
+    statuses, status = np.unique(intervals['Status'].to_numpy(dtype=object), return_inverse=True)
+    place, places = pd.factorize(intervals['Place'].to_numpy(dtype=object), sort=True)
+
+    prefix = {}
+    for code, name in enumerate(statuses):
+        lengths = np.where(status == code, end - start, 0)
+        prefix[name] = np.concatenate([[0], np.cumsum(lengths)])
+
+    return {
+        'devices': devices,
+        'offsets': np.append(first, len(intervals)).astype(np.intp),
+        'start': start,
+        'end': end,
+        'status': status.astype(np.int8),
+        'statuses': list(statuses),
+        'location': intervals['Location'].to_numpy(dtype=np.int32),
+        'place': place.astype(np.int8),
+        'places': list(places),
+        'prefix': prefix
+    }
+
+def _device_slices(timeline, devices):
+    """Group query positions by device: yields (positions, lo, hi) for known devices."""
+    names = pd.Series(devices, dtype=object)
+    for device, positions in names.groupby(names, sort=False).indices.items():
+        slot = np.searchsorted(timeline['devices'], device)
+        if slot < len(timeline['devices']) and timeline['devices'][slot] == device:
+            yield positions, timeline['offsets'][slot], timeline['offsets'][slot + 1]
+
+def time_in_status(timeline, devices, starts, ends, status=STOPPED):
+    """
+    Total the time each device spent in a status within each window.
+
+    Whole intervals come from the status prefix sums; only the two intervals
+    cut by the window's edges are clipped.
+
+    Args:
+        timeline: Dictionary from build_timeline()
+        devices: Array of device names
+        starts: Array of window starts (naive local time)
+        ends: Array of window ends (naive local time)
+        status: Status to total
+
+    Returns:
+        Array of float seconds (0 for unknown devices or empty windows)
+    """
+    starts = _timestamps_ns(starts)
+    ends = _timestamps_ns(ends)
+    totals = np.zeros(len(starts), dtype=np.int64)
+    if status not in timeline['prefix']:
+        return totals.astype(float)
+
+    code = timeline['statuses'].index(status)
+    prefix = timeline['prefix'][status]
+    interval_start, interval_end = timeline['start'], timeline['end']
+    in_status = timeline['status'] == code
+    for positions, lo, hi in _device_slices(timeline, devices):
+        a, b = starts[positions], ends[positions]
+        # Intervals ending after a and starting before b; within a device
+        # both starts and ends are sorted
+        first = lo + np.searchsorted(interval_end[lo:hi], a, side='right')
+        last = lo + np.searchsorted(interval_start[lo:hi], b, side='left')
+        some = (last > first) & (b > a) & (a != NAT) & (b != NAT)
+        first, last, a, b = first[some], last[some], a[some], b[some]
+
+        total = prefix[last] - prefix[first]
+        head_cut = np.maximum(a - interval_start[first], 0)
+        tail_cut = np.maximum(interval_end[last - 1] - b, 0)
+        total -= np.where(in_status[first], head_cut, 0)
+        total -= np.where(in_status[last - 1], tail_cut, 0)
+        totals[positions[some]] = total
+    return totals / 1e9
+
+def time_by_place(timeline, start, end, status=STOPPED):
+    """
+    Total the time each device spent in a status at each location class
+    within a date range.
+
+    Args:
+        timeline: Dictionary from build_timeline()
+        start: Start of the range (naive local time)
+        end: End of the range (naive local time)
+        status: Status to total
+
+    Returns:
+        DataFrame of float seconds with one row per device and one column per
+        location class in timeline['places']
+    """
+    a, b = _timestamps_ns([start, end])
+    devices, places = timeline['devices'], timeline['places']
+    totals = np.zeros(len(devices) * len(places))
+    if status in timeline['statuses'] and len(places) > 0:
+        device = np.repeat(np.arange(len(devices)), np.diff(timeline['offsets']))
+        overlap = np.minimum(timeline['end'], b) - np.maximum(timeline['start'], a)
+        counted = ((timeline['status'] == timeline['statuses'].index(status))
+                   & (timeline['place'] >= 0) & (overlap > 0))
+        totals = np.bincount(
+            device[counted] * len(places) + timeline['place'][counted],
+            weights=overlap[counted], minlength=len(totals)
+        )
+    return pd.DataFrame(totals.reshape(len(devices), len(places)) / 1e9, index=devices, columns=places)
+
+def device_utilization(timeline, start, end):
+    """
+    Summarize how each device's time was spent within a date range.
+
+    Args:
+        timeline: Dictionary from build_timeline()
+        start: Start of the range (naive local time)
+        end: End of the range (naive local time)
+
+    Returns:
+        DataFrame with Device, DrivingHours, StoppedHours and DrivingShare
+        (driving as a fraction of the tracked time) columns, plus the stopped
+        hours at each location class (ShopHours, CustomerHours, ...) when
+        the intervals were tagged
+    """
+    devices = timeline['devices']
+    starts = np.full(len(devices), pd.Timestamp(start).to_datetime64())
+    ends = np.full(len(devices), pd.Timestamp(end).to_datetime64())
+    driving = time_in_status(timeline, devices, starts, ends, DRIVING) / 3600
+    stopped = time_in_status(timeline, devices, starts, ends, STOPPED) / 3600
+    tracked = driving + stopped
+    utilization = pd.DataFrame({
+        'Device': devices,
+        'DrivingHours': driving,
+        'StoppedHours': stopped,
+        'DrivingShare': np.divide(driving, tracked, out=np.zeros_like(driving), where=tracked > 0)
+    })
+
+    by_place = time_by_place(timeline, start, end, STOPPED) / 3600
+    for place in by_place.columns:
+        utilization[f"{place.title()}Hours"] = by_place[place].to_numpy()
+    return utilization
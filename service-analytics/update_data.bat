@@ -27,6 +27,11 @@ copy "%DOWNLOAD_DIR%\day_engine_*.csv" "%APP_DATA_DIR%\"
 copy "%DOWNLOAD_DIR%\idle_time_*.csv" "%APP_DATA_DIR%\"
 copy "%DOWNLOAD_DIR%\alert_summary_*.csv" "%APP_DATA_DIR%\"
 
+REM Ingest only the new or changed rows into the row store
+pushd "%APP_DATA_DIR%\.."
+python prepare_data.py ingest
+popd
+
 echo Data update complete.
 echo Files archived to: %ARCHIVE_DIR%
 echo.